@@ -0,0 +1,4 @@
+"""Headless benchmarks for the load, search, import, write and reporting paths.
+
+Run with `python -m benchmarks --help`.
+"""
@@ -0,0 +1,47 @@
+import sys
+import json
+import logging
+import argparse
+from benchmarks.runner import (SIZES, DEFAULT_SIZES, DEFAULT_DATA_DIR, BENCHMARK_NAMES, compare,
+                               format_report, parse_size, run_suite, save_report)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description="Benchmark the hot paths against synthetic databases")
+    parser.add_argument('--sizes', default=','.join(DEFAULT_SIZES),
+                        help=f"comma-separated database sizes: {', '.join(SIZES)} or a row count "
+                             f"(default: %(default)s)")
+    parser.add_argument('--benchmarks', default=','.join(BENCHMARK_NAMES),
+                        help="comma-separated benchmarks to run (default: all)")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR,
+                        help="where synthetic databases are built and cached (default: %(default)s)")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the synthetic data")
+    parser.add_argument('--output', help="JSON results file (default: benchmarks/results/results-<time>.json)")
+    parser.add_argument('--baseline', help="earlier JSON results to compare against")
+    parser.add_argument('--max-regression', type=float, default=0.25,
+                        help="fail when a metric is worse than the baseline by more than this "
+                             "fraction (default: %(default)s)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    sizes = [parse_size(size) for size in args.sizes.split(',')]
+    report = run_suite(sizes, args.benchmarks.split(','), args.data_dir, args.seed)
+    output = save_report(report, args.output)
+    print(format_report(report))
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        if regressions:
+            print("Regressions against the baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+
+if __name__ == '__main__':
+    main()
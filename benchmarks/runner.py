@@ -0,0 +1,161 @@
+"""Runs the benchmarks, records the results as JSON and checks for regressions.
+
+Every benchmark runs in a fresh process so its peak RSS is its own.
+Benchmarks that write get a private copy of the synthetic database.
+Nothing here imports the application at module level; the database
+location is only known once a benchmark's process has started.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import platform
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Same order as suite.BENCHMARKS, listed here so choosing benchmarks does not
+# import the application
+BENCHMARK_NAMES = ['table_population', 'sorted_paging', 'search_keystrokes', 'import_csv', 'import_xlsx',
+                   'add_customer', 'update_customer', 'delete_customer', 'aggregate_queries']
+SIZES = {'10k': 10000, '100k': 100000, '1m': 1000000, '5m': 5000000}
+DEFAULT_SIZES = ['10k', '100k']
+DEFAULT_DATA_DIR = os.path.join('benchmarks', 'data')
+DEFAULT_RESULTS_DIR = os.path.join('benchmarks', 'results')
+# Metrics compared against a baseline; higher is worse for both
+COMPARED_METRICS = ['wall_time', 'peak_rss_mb']
+# Differences smaller than these are noise, whatever the ratio
+MINIMUM_DELTAS = {'wall_time': 0.005, 'peak_rss_mb': 5.0}
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    if text in SIZES:
+        return SIZES[text]
+    return int(text)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process, or None if it cannot be measured"""
+    # ru_maxrss survives fork and exec on Linux, so a benchmark process would
+    # report the runner's own peak; VmHWM starts over with the new program
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # KiB on Linux, bytes on macOS
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+
+
+def _run_in_process(name, size, database, workdir):
+    """Benchmark entry point inside the benchmark's own process"""
+    os.environ['GOLD_DATABASE_URL'] = f'sqlite:///{database}'
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    logging.basicConfig(level=logging.WARNING)
+    from benchmarks.suite import BENCHMARKS
+    function, _ = BENCHMARKS[name]
+    result = function(size, workdir)
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def run_benchmark(name, size, database, workdir):
+    from benchmarks.suite import BENCHMARKS
+    _, writes = BENCHMARKS[name]
+    if writes:
+        copy = os.path.join(workdir, 'benchmark.db')
+        shutil.copyfile(database, copy)
+        database = copy
+    try:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+            result = executor.submit(_run_in_process, name, size, database, workdir).result()
+    finally:
+        for leftover in os.listdir(workdir):
+            os.remove(os.path.join(workdir, leftover))
+    result['rows_per_second'] = result['rows'] / result['wall_time'] if result['wall_time'] else None
+    return {'benchmark': name, 'size': size, **result}
+
+
+def run_suite(sizes, names, data_dir=DEFAULT_DATA_DIR, seed=0):
+    """Run the `names` benchmarks against a synthetic database of every size"""
+    from benchmarks.suite import BENCHMARKS
+    from benchmarks.synthetic import build_database, database_path
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'seed': seed,
+        'databases': [],
+        'results': [],
+    }
+    workdir = os.path.join(data_dir, 'work')
+    os.makedirs(workdir, exist_ok=True)
+    for size in sizes:
+        cached = os.path.exists(database_path(data_dir, size, seed))
+        started = time.perf_counter()
+        database = build_database(data_dir, size, seed)
+        report['databases'].append({'size': size, 'path': database, 'cached': cached,
+                                    'build_seconds': time.perf_counter() - started})
+        for name in names:
+            if name not in BENCHMARKS:
+                raise ValueError(f"Unknown benchmark '{name}', expected one of {', '.join(BENCHMARKS)}")
+            logger.info(f"Running {name} on {size} rows...")
+            report['results'].append(run_benchmark(name, size, database, workdir))
+    return report
+
+
+def compare(report, baseline, max_regression):
+    """Regressions of `report` against `baseline`, as human-readable lines"""
+    previous = {(r['benchmark'], r['size']): r for r in baseline.get('results', [])}
+    regressions = []
+    for result in report['results']:
+        before = previous.get((result['benchmark'], result['size']))
+        if before is None:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            if new > old * (1 + max_regression) and new - old > MINIMUM_DELTAS[metric]:
+                regressions.append(f"{result['benchmark']} ({result['size']} rows): {metric} "
+                                   f"{old:.3f} -> {new:.3f} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def format_report(report):
+    lines = [f"{'benchmark':<20}{'rows in db':>12}{'wall (s)':>11}{'rows/s':>13}{'peak RSS (MB)':>15}"]
+    for r in report['results']:
+        rate = f"{r['rows_per_second']:,.0f}" if r['rows_per_second'] else '-'
+        rss = f"{r['peak_rss_mb']:.0f}" if r['peak_rss_mb'] is not None else '-'
+        lines.append(f"{r['benchmark']:<20}{r['size']:>12,}{r['wall_time']:>11.3f}{rate:>13}{rss:>15}")
+    return '\n'.join(lines)
+
+
+def save_report(report, output=None):
+    if output is None:
+        os.makedirs(DEFAULT_RESULTS_DIR, exist_ok=True)
+        output = os.path.join(DEFAULT_RESULTS_DIR, f"results-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    return output
@@ -0,0 +1,220 @@
+"""The benchmarked hot paths.
+
+Each benchmark runs in its own process against a prepared database (see
+runner.py) and returns a dict with at least `wall_time` (seconds of the
+timed section) and `rows` (rows it processed); anything else it measures
+(per-operation latencies) is recorded alongside.
+"""
+import os
+import time
+import statistics
+from datetime import date
+import numpy as np
+
+SEARCH_TERMS = ['priya sharma', 'rajesh', 'gmail', 'mumbai']
+SCROLL_PAGES = 50
+SORT_COLUMNS = ['customer_name', 'purchase_date', 'final_amount']
+WRITE_OPERATIONS = 200
+IMPORT_CSV_ROWS = 50000
+IMPORT_XLSX_ROWS = 10000
+QUERY_REPEATS = 5
+
+
+def latency_stats(samples):
+    """Summary of per-operation latencies, in milliseconds"""
+    ordered = sorted(samples)
+    return {
+        'operations': len(ordered),
+        'mean_ms': statistics.fmean(ordered) * 1000,
+        'p50_ms': ordered[len(ordered) // 2] * 1000,
+        'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        'max_ms': ordered[-1] * 1000,
+    }
+
+
+def _qt_model():
+    # The model loads on worker threads; each step below wait()s for its rows
+    from PyQt5.QtCore import QCoreApplication
+    from src.ui.customer_table_model import CustomerTableModel
+    app = QCoreApplication.instance() or QCoreApplication([])
+    return app, CustomerTableModel()
+
+
+def table_population(size, workdir):
+    """First page of the customer table, then scrolling through SCROLL_PAGES pages"""
+    app, model = _qt_model()
+    started = time.perf_counter()
+    model.refresh()
+    model.wait()
+    first_page = time.perf_counter() - started
+    pages = []
+    for _ in range(SCROLL_PAGES):
+        if not model.canFetchMore():
+            break
+        page_started = time.perf_counter()
+        model.fetchMore()
+        model.wait()
+        pages.append(time.perf_counter() - page_started)
+    wall_time = time.perf_counter() - started
+    return {'wall_time': wall_time, 'rows': model.rowCount(), 'first_page_ms': first_page * 1000,
+            'pages': latency_stats(pages)}
+
+
+def sorted_paging(size, workdir):
+    """Re-sort the table by each of SORT_COLUMNS, descending, and scroll SCROLL_PAGES pages"""
+    from PyQt5.QtCore import Qt
+    from src.ui.customer_table_model import COLUMNS
+    app, model = _qt_model()
+    model.refresh()
+    model.wait()
+    attributes = [attribute for _, attribute, _ in COLUMNS]
+    sorts, pages, shown = [], [], 0
+    started = time.perf_counter()
+    for attribute in SORT_COLUMNS:
+        sort_started = time.perf_counter()
+        model.sort(attributes.index(attribute), Qt.DescendingOrder)
+        model.wait()
+        sorts.append(time.perf_counter() - sort_started)
+        for _ in range(SCROLL_PAGES):
+            if not model.canFetchMore():
+                break
+            page_started = time.perf_counter()
+            model.fetchMore()
+            model.wait()
+            pages.append(time.perf_counter() - page_started)
+        shown += model.rowCount()
+    wall_time = time.perf_counter() - started
+    return {'wall_time': wall_time, 'rows': shown, 'sorts': latency_stats(sorts), 'pages': latency_stats(pages)}
+
+
+def search_keystrokes(size, workdir):
+    """Type each of SEARCH_TERMS one keystroke at a time, as the search box does"""
+    app, model = _qt_model()
+    model.refresh()
+    model.wait()
+    samples = []
+    shown = 0
+    for term in SEARCH_TERMS:
+        for end in range(1, len(term) + 1):
+            started = time.perf_counter()
+            model.set_search(term[:end])
+            model.wait()
+            samples.append(time.perf_counter() - started)
+            shown += model.rowCount()
+    return {'wall_time': sum(samples), 'rows': shown, 'keystrokes': latency_stats(samples)}
+
+
+def _import(workdir, rows, extension, format):
+    import generate_sample_data as sample
+    from benchmarks.synthetic import import_file_frame
+    from src.importer.engine import import_file
+    file_name = os.path.join(workdir, f"import{extension}")
+    sample.WRITERS[format]([import_file_frame(rows, 12345)], file_name)
+    result = import_file(file_name)
+    return {'wall_time': result.elapsed, 'rows': result.rows_read, 'inserted': result.inserted,
+            'rejected': result.rejected}
+
+
+def import_csv(size, workdir):
+    """Import a CSV of new purchases into the database"""
+    return _import(workdir, min(size, IMPORT_CSV_ROWS), '.csv', 'csv')
+
+
+def import_xlsx(size, workdir):
+    """Import an .xlsx workbook of new purchases into the database"""
+    return _import(workdir, min(size, IMPORT_XLSX_ROWS), '.xlsx', 'xlsx')
+
+
+def _new_customers(count):
+    from benchmarks.synthetic import import_file_frame
+    frame = import_file_frame(count, 54321)
+    frame['purchase_date'] = frame['purchase_date'].map(date.fromisoformat)
+    return frame.to_dict('records')
+
+
+def _timed_writes(operation, arguments):
+    samples = []
+    for argument in arguments:
+        started = time.perf_counter()
+        operation(*argument)
+        samples.append(time.perf_counter() - started)
+    return {'wall_time': sum(samples), 'rows': len(samples), 'latency': latency_stats(samples)}
+
+
+def add_customer(size, workdir):
+    """Add WRITE_OPERATIONS customers one at a time through the repository"""
+    from src.database.repository import CustomerRepository
+    repository = CustomerRepository()
+    return _timed_writes(repository.add, [(data,) for data in _new_customers(WRITE_OPERATIONS)])
+
+
+def update_customer(size, workdir):
+    """Update WRITE_OPERATIONS random customers one at a time"""
+    from src.database.repository import CustomerRepository
+    repository = CustomerRepository()
+    rng = np.random.default_rng(1)
+    ids = rng.choice(np.arange(1, size + 1), WRITE_OPERATIONS, replace=False).tolist()
+    changes = [(customer_id, {'notes': f"benchmark update {customer_id}", 'gold_weight': 10.5,
+                              'total_amount': 1.0, 'discount_amount': 0.0, 'final_amount': 1.0})
+               for customer_id in ids]
+    return _timed_writes(repository.update, changes)
+
+
+def delete_customer(size, workdir):
+    """Delete WRITE_OPERATIONS random customers one at a time"""
+    from src.database.repository import CustomerRepository
+    repository = CustomerRepository()
+    rng = np.random.default_rng(2)
+    ids = rng.choice(np.arange(1, size + 1), WRITE_OPERATIONS, replace=False).tolist()
+    return _timed_writes(repository.delete, [(customer_id,) for customer_id in ids])
+
+
+def _timed_queries(queries):
+    timings = {}
+    for name, query in queries.items():
+        samples = []
+        for _ in range(QUERY_REPEATS):
+            started = time.perf_counter()
+            rows = query()
+            samples.append(time.perf_counter() - started)
+        timings[name] = {'median_ms': statistics.median(samples) * 1000, 'result_rows': len(rows)}
+    return timings
+
+
+def aggregate_queries(size, workdir):
+    """Sales totals from the summary tables and straight from purchases"""
+    from src.database.models import engine
+    from src.database.reports import sales_summary
+
+    def raw(sql):
+        def run():
+            with engine.connect() as conn:
+                return conn.exec_driver_sql(sql).fetchall()
+        return run
+
+    queries = {
+        'daily_by_state': lambda: sales_summary('day', group_by=('period', 'state')),
+        'monthly_by_gold_type': lambda: sales_summary('month', group_by=('period', 'gold_type')),
+        'total_by_payment_mode': lambda: sales_summary('month', group_by=('payment_mode',)),
+        'raw_state_totals_last_90_days': raw(
+            "SELECT state, sum(gold_weight), sum(final_amount) FROM purchases "
+            "WHERE state IS NOT NULL AND purchase_date >= date('now', '-90 days') GROUP BY state"),
+        'raw_count': raw("SELECT count(*) FROM purchases"),
+    }
+    timings = _timed_queries(queries)
+    return {'wall_time': sum(t['median_ms'] for t in timings.values()) / 1000, 'rows': size,
+            'queries': timings}
+
+
+# name -> (function, whether it changes the database)
+BENCHMARKS = {
+    'table_population': (table_population, False),
+    'sorted_paging': (sorted_paging, False),
+    'search_keystrokes': (search_keystrokes, False),
+    'import_csv': (import_csv, True),
+    'import_xlsx': (import_xlsx, True),
+    'add_customer': (add_customer, True),
+    'update_customer': (update_customer, True),
+    'delete_customer': (delete_customer, True),
+    'aggregate_queries': (aggregate_queries, False),
+}
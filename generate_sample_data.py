@@ -1,10 +1,27 @@
 #!/usr/bin/env python3
+"""Generate sample customer purchases for testing and load tests.
+
+    python generate_sample_data.py                      # 2000 rows -> sample_customer_data.csv
+    python generate_sample_data.py --rows 10000000 --format parquet --output load.parquet
+    python generate_sample_data.py --rows 1000000 --format sqlite    # straight into the app database
+
+Rows are produced in chunks by a pool of worker processes and written as
+they arrive, so memory stays bounded by a few chunks. Chunk i is generated
+from the seed and i alone, so the same arguments always produce the same
+rows, whatever the number of workers. Numeric columns are drawn with NumPy.
+Names, addresses and notes come from pools generated once with Faker;
+--faker-per-row calls Faker for every row instead (slower).
+"""
 
 import sys
 import os
 import csv
-import random
-from datetime import datetime, timedelta
+import argparse
+from datetime import date, datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from src.pricing import calculate_amounts_array
 
 try:
     from faker import Faker
@@ -14,100 +31,321 @@ except ImportError:
     subprocess.check_call([sys.executable, "-m", "pip", "install", "Faker==20.1.0"])
     from faker import Faker
 
-def generate_sample_data(num_records=2000):
+# Possible values and ranges for the generated fields
+GOLD_TYPES = ['24K', '22K', '18K']
+GOLD_QUALITIES = ['Pure', 'Standard', 'Premium']
+PAYMENT_MODES = ['Cash', 'UPI', 'Bank Transfer', 'Card']
+STATES = ['Karnataka', 'Maharashtra', 'Tamil Nadu', 'Kerala', 'Andhra Pradesh',
+          'Telangana', 'Gujarat', 'Delhi', 'West Bengal', 'Rajasthan']
+DAYS_BACK = 730                  # purchases within the last 2 years
+WEIGHT_RANGE = (1, 1000)         # grams
+PRICE_RANGE = (5000, 7000)       # per gram
+DISCOUNT_RANGE = (0, 5)          # percent
+NOTES_PROBABILITY = 0.3
+
+# Column headers of the generated file, in the order the importer documents them
+FIELDNAMES = [
+    'customer_name', 'phone_number', 'email', 'address', 'state',
+    'purchase_date', 'gold_type', 'gold_quality', 'gold_weight',
+    'price_per_gram', 'total_amount', 'discount_percentage',
+    'discount_amount', 'final_amount', 'payment_mode', 'notes'
+]
+
+FORMATS = ['csv', 'xlsx', 'parquet', 'sqlite']
+DEFAULT_CHUNK_SIZE = 100000
+XLSX_MAX_ROWS = 1048575  # one sheet, below the header row
+
+# Pre-generated Faker values that rows are drawn from
+NAME_POOL_SIZE = 1000
+ADDRESS_POOL_SIZE = 5000
+SENTENCE_POOL_SIZE = 200
+EMAIL_DOMAINS = ['gmail.com', 'yahoo.co.in', 'hotmail.com', 'example.org', 'example.com']
+
+def name_pools(seed=0):
+    """Pools of Faker (en_IN) first names, last names, addresses and sentences"""
+    fake = Faker('en_IN')  # Using Indian locale for more realistic Indian names and addresses
+    fake.seed_instance(seed)
+    first_names = sorted({fake.first_name() for _ in range(NAME_POOL_SIZE * 2)})[:NAME_POOL_SIZE]
+    last_names = sorted({fake.last_name() for _ in range(NAME_POOL_SIZE * 2)})[:NAME_POOL_SIZE]
+    return {
+        'first_names': np.array(first_names, dtype=object),
+        'last_names': np.array(last_names, dtype=object),
+        'addresses': np.array([fake.address().replace('\n', ', ') for _ in range(ADDRESS_POOL_SIZE)],
+                              dtype=object),
+        'sentences': np.array([fake.sentence() for _ in range(SENTENCE_POOL_SIZE)], dtype=object),
+    }
+
+def _pick(rng, values, rows):
+    values = np.asarray(values, dtype=object)
+    return values[rng.integers(0, len(values), rows)]
+
+def _pooled_people(rows, rng, pools):
+    first = pd.Series(_pick(rng, pools['first_names'], rows))
+    last = pd.Series(_pick(rng, pools['last_names'], rows))
+    numbers = pd.Series(rng.integers(1, 1000, rows)).astype(str)
+    phones = pd.Series(rng.integers(6000000000, 9999999999, rows, dtype=np.int64)).astype(str)
+    return {
+        'customer_name': first + ' ' + last,
+        'phone_number': pd.Series(np.where(rng.random(rows) < 0.5, '+91 ', '0'), dtype=object) + phones,
+        'email': (first + '.' + last + numbers).str.lower().str.replace(' ', '', regex=False)
+                 + '@' + _pick(rng, EMAIL_DOMAINS, rows),
+        'address': _pick(rng, pools['addresses'], rows),
+        'notes': _pick(rng, pools['sentences'], rows),
+    }
+
+def _faker_people(rows, fake):
+    return {
+        'customer_name': [fake.name() for _ in range(rows)],
+        'phone_number': [fake.phone_number() for _ in range(rows)],
+        'email': [fake.email() for _ in range(rows)],
+        'address': [fake.address().replace('\n', ', ') for _ in range(rows)],
+        'notes': [fake.sentence() for _ in range(rows)],
+    }
+
+def generate_frame(rows, rng, pools=None, fake=None, end_date=None):
+    """A DataFrame of `rows` purchases with the FIELDNAMES columns.
+
+    People come from `pools` (see name_pools) or, without pools, from a
+    Faker instance per row. purchase_date is a 'YYYY-MM-DD' string within
+    DAYS_BACK days before `end_date` (default today).
+    """
+    end_date = end_date or date.today()
+    people = _pooled_people(rows, rng, pools) if pools is not None else _faker_people(rows, fake)
+
+    days = [(end_date - timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(DAYS_BACK + 1)]
+    gold_weight = np.round(rng.uniform(*WEIGHT_RANGE, rows), 3)
+    price_per_gram = np.round(rng.uniform(*PRICE_RANGE, rows), 2)
+    discount_percentage = np.round(rng.uniform(*DISCOUNT_RANGE, rows), 2)
+    total_amount, discount_amount, final_amount = calculate_amounts_array(
+        gold_weight, price_per_gram, discount_percentage)
+
+    return pd.DataFrame({
+        'customer_name': people['customer_name'],
+        'phone_number': people['phone_number'],
+        'email': people['email'],
+        'address': people['address'],
+        'state': _pick(rng, STATES, rows),
+        'purchase_date': _pick(rng, days, rows),
+        'gold_type': _pick(rng, GOLD_TYPES, rows),
+        'gold_quality': _pick(rng, GOLD_QUALITIES, rows),
+        'gold_weight': gold_weight,
+        'price_per_gram': price_per_gram,
+        'total_amount': total_amount,
+        'discount_percentage': discount_percentage,
+        'discount_amount': discount_amount,
+        'final_amount': final_amount,
+        'payment_mode': _pick(rng, PAYMENT_MODES, rows),
+        'notes': np.where(rng.random(rows) < NOTES_PROBABILITY, np.asarray(people['notes'], dtype=object), ''),
+    }, columns=FIELDNAMES)
+
+# Pools handed to each worker process once, instead of with every chunk
+_worker_pools = None
+
+def _init_worker(pools):
+    global _worker_pools
+    _worker_pools = pools
+
+def generate_chunk(index, rows, seed=0, end_date=None, pools=None):
+    """Chunk `index` of a generated data set; depends only on its arguments"""
+    rng = np.random.default_rng([seed, index])
+    pools = pools if pools is not None else _worker_pools
+    fake = None
+    if pools is None:
+        fake = Faker('en_IN')
+        fake.seed_instance(f"{seed}-{index}")
+    return generate_frame(rows, rng, pools, fake, end_date)
+
+def generate_chunks(num_records, chunk_size=DEFAULT_CHUNK_SIZE, seed=0, workers=None,
+                    use_pools=True, end_date=None):
+    """Yield DataFrames of at most `chunk_size` rows, in order, `num_records` rows in total.
+
+    Chunks are generated by `workers` processes (default: one per CPU; 1
+    generates in this process). At most two chunks per worker are in flight,
+    so memory does not grow with num_records.
+    """
+    end_date = end_date or date.today()
+    pools = name_pools(seed) if use_pools else None
+    chunks = [(index, min(chunk_size, num_records - start))
+              for index, start in enumerate(range(0, num_records, chunk_size))]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(chunks) == 1:
+        for index, rows in chunks:
+            yield generate_chunk(index, rows, seed, end_date, pools)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(pools,)) as executor:
+        pending = []
+        for index, rows in chunks:
+            pending.append(executor.submit(generate_chunk, index, rows, seed, end_date))
+            if len(pending) >= workers * 2:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+def _report(written, total):
+    if total is None:
+        print(f"Generated {written} records...")
+    else:
+        print(f"Generated {written} of {total} records...")
+
+def write_csv(chunks, filename, total=None):
+    """Write chunks to one CSV file with a header row; returns the number of rows"""
+    written = 0
+    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+        for chunk in chunks:
+            chunk.to_csv(csvfile, header=written == 0, index=False)
+            written += len(chunk)
+            _report(written, total)
+    return written
+
+def write_xlsx(chunks, filename, total=None):
+    """Write chunks to a single-sheet .xlsx workbook without holding it in memory"""
+    from openpyxl import Workbook
+    if total is not None and total > XLSX_MAX_ROWS:
+        raise ValueError(f"An .xlsx sheet holds at most {XLSX_MAX_ROWS} records, not {total}")
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(FIELDNAMES)
+    written = 0
+    for chunk in chunks:
+        for row in chunk.itertuples(index=False, name=None):
+            sheet.append(row)
+        written += len(chunk)
+        _report(written, total)
+    workbook.save(filename)
+    return written
+
+def write_parquet(chunks, filename, total=None):
+    """Write chunks as row groups of one Parquet file (needs pyarrow)"""
     try:
-        # Initialize Faker for generating realistic data
-        fake = Faker('en_IN')  # Using Indian locale for more realistic Indian names and addresses
-
-        # Define possible values for various fields
-        gold_types = ['24K', '22K', '18K']
-        gold_qualities = ['Pure', 'Standard', 'Premium']
-        payment_modes = ['Cash', 'UPI', 'Bank Transfer', 'Card']
-        states = ['Karnataka', 'Maharashtra', 'Tamil Nadu', 'Kerala', 'Andhra Pradesh', 
-                'Telangana', 'Gujarat', 'Delhi', 'West Bengal', 'Rajasthan']
-        
-        print("Generating sample data...")
-        # Generate data
-        data = []
-        for i in range(num_records):
-            if i % 200 == 0:  # Progress indicator
-                print(f"Generated {i} records...")
-                
-            # Generate a random date within the last 2 years
-            random_days = random.randint(0, 730)  # 730 days = 2 years
-            purchase_date = (datetime.now() - timedelta(days=random_days)).strftime('%Y-%m-%d')
-            
-            # Generate random gold weight between 1 and 1000 grams
-            gold_weight = round(random.uniform(1, 1000), 3)
-            
-            # Generate random price per gram between 5000 and 7000
-            price_per_gram = round(random.uniform(5000, 7000), 2)
-            
-            # Calculate total amount
-            total_amount = round(gold_weight * price_per_gram, 2)
-            
-            # Generate random discount between 0 and 5%
-            discount_percentage = round(random.uniform(0, 5), 2)
-            discount_amount = round(total_amount * (discount_percentage / 100), 2)
-            final_amount = round(total_amount - discount_amount, 2)
-            
-            # Generate customer data
-            customer_data = {
-                'customer_name': fake.name(),
-                'phone_number': fake.phone_number(),
-                'email': fake.email(),
-                'address': fake.address().replace('\n', ', '),
-                'state': random.choice(states),
-                'purchase_date': purchase_date,
-                'gold_type': random.choice(gold_types),
-                'gold_quality': random.choice(gold_qualities),
-                'gold_weight': gold_weight,
-                'price_per_gram': price_per_gram,
-                'total_amount': total_amount,
-                'discount_percentage': discount_percentage,
-                'discount_amount': discount_amount,
-                'final_amount': final_amount,
-                'payment_mode': random.choice(payment_modes),
-                'notes': fake.sentence() if random.random() < 0.3 else ''  # 30% chance of having notes
-            }
-            data.append(customer_data)
-        
-        return data
-    except Exception as e:
-        print(f"Error generating data: {str(e)}")
-        raise
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Writing Parquet needs the pyarrow package: pip install pyarrow")
+    written = 0
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(filename, table.schema)
+            writer.write_table(table)
+            written += len(chunk)
+            _report(written, total)
+    finally:
+        if writer is not None:
+            writer.close()
+    return written
+
+def insert_rows(frame):
+    """Positional rows for the importer's insert_purchases(), fingerprints included"""
+    from src.database.fingerprint import purchase_fingerprints
+    from src.importer.engine import INSERT_COLUMNS
+    columns = {column: frame[column] for column in frame.columns}
+    columns['purchase_date'] = frame['purchase_date'] + ' 00:00:00.000000'
+    columns['row_hash'] = purchase_fingerprints(columns)
+    return list(pd.DataFrame(columns, columns=INSERT_COLUMNS).itertuples(index=False, name=None))
+
+def write_sqlite(chunks, engine=None, total=None):
+    """Insert chunks straight into the application database.
+
+    The schema is migrated first. When the purchases table starts out
+    empty every purchase index is dropped during the load and the name
+    index suspended; both are built once at the end (see bulk.py), even
+    when the load fails or is interrupted. The customers indexes stay, as
+    resolving customers looks them up.
+    """
+    from src.database.models import Purchase, engine as default_engine
+    from src.database.bulk import restore_indexes, suspend_indexes
+    from src.database.migrations import migrate
+    from src.database.search import bulk_indexing
+    from src.database.summaries import bulk_summaries
+    from src.importer.engine import insert_purchases, insert_statement
+
+    engine = engine or default_engine
+    migrate(engine)
+    with engine.begin() as conn:
+        empty = conn.exec_driver_sql("SELECT NOT EXISTS (SELECT 1 FROM purchases)").scalar()
+        if empty:
+            suspend_indexes(conn, Purchase.__table__.indexes)
+        sql = insert_statement(conn)
+
+    written = 0
+    try:
+        for chunk in chunks:
+            rows = insert_rows(chunk)
+            with engine.begin() as conn, bulk_indexing(conn), bulk_summaries(conn):
+                insert_purchases(conn, rows, sql)
+            written += len(chunk)
+            _report(written, total)
+    finally:
+        if empty:
+            print("Building indexes...")
+            with engine.begin() as conn:
+                restore_indexes(conn)
+    return written
+
+WRITERS = {'csv': write_csv, 'xlsx': write_xlsx, 'parquet': write_parquet}
+
+def generate_sample_data(num_records=2000, seed=0):
+    """Generated records as a list of dicts; meant for small data sets"""
+    frames = list(generate_chunks(num_records, seed=seed, workers=1))
+    if not frames:
+        return []
+    return pd.concat(frames, ignore_index=True).to_dict('records')
 
 def save_to_csv(data, filename='sample_customer_data.csv'):
     try:
-        # Define the field names (column headers)
-        fieldnames = [
-            'customer_name', 'phone_number', 'email', 'address', 'state',
-            'purchase_date', 'gold_type', 'gold_quality', 'gold_weight',
-            'price_per_gram', 'total_amount', 'discount_percentage',
-            'discount_amount', 'final_amount', 'payment_mode', 'notes'
-        ]
-        
         print(f"Writing data to {filename}...")
         # Write to CSV file
         with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
             writer.writeheader()
             writer.writerows(data)
-        
+
         print(f"Successfully generated {len(data)} records in {filename}")
         print(f"File location: {os.path.abspath(filename)}")
     except Exception as e:
         print(f"Error saving to CSV: {str(e)}")
         raise
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate sample customer purchases")
+    parser.add_argument('--rows', type=int, default=2000, help="number of records (default: %(default)s)")
+    parser.add_argument('--format', choices=FORMATS, default='csv', help="output format (default: %(default)s)")
+    parser.add_argument('--output', help="output file (default: sample_customer_data.<format>); "
+                                         "for sqlite, a database URL (default: the app database)")
+    parser.add_argument('--seed', type=int, default=0, help="seed; the same seed gives the same data")
+    parser.add_argument('--end-date', type=date.fromisoformat,
+                        help="latest purchase date, YYYY-MM-DD (default: today)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="records per chunk (default: %(default)s)")
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument('--faker-per-row', action='store_true',
+                        help="call Faker for every record instead of drawing from pre-generated pools")
+    return parser.parse_args(argv)
+
 if __name__ == '__main__':
     try:
+        args = parse_args()
         print("Starting data generation...")
-        # Generate 2000 records
-        sample_data = generate_sample_data(2000)
-        
-        # Save to CSV
-        save_to_csv(sample_data)
+        started = datetime.now()
+        chunks = generate_chunks(args.rows, args.chunk_size, args.seed, args.workers,
+                                 use_pools=not args.faker_per_row, end_date=args.end_date)
+        if args.format == 'sqlite':
+            engine = None
+            if args.output:
+                from src.database.config import create_configured_engine
+                engine = create_configured_engine(args.output)
+            written = write_sqlite(chunks, engine, total=args.rows)
+            target = args.output or 'the application database'
+        else:
+            target = args.output or f"sample_customer_data.{args.format}"
+            written = WRITERS[args.format](chunks, target, total=args.rows)
+            target = os.path.abspath(target)
+        elapsed = (datetime.now() - started).total_seconds()
+        print(f"Successfully generated {written} records in {target} "
+              f"({elapsed:.1f}s, {written / elapsed if elapsed else 0:,.0f} records/s)")
     except Exception as e:
         print(f"An error occurred: {str(e)}")
-        sys.exit(1) 
\ No newline at end of file
+        sys.exit(1)
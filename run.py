@@ -1,6 +1,10 @@
 #!/usr/bin/env python3
 import os
 import sys
+import time
+import multiprocessing
+
+started = time.perf_counter()
 
 # Add the project root directory to Python path
 project_root = os.path.dirname(os.path.abspath(__file__))
@@ -9,4 +13,21 @@ sys.path.insert(0, project_root)
 from src.main import main
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    # Imports read files in worker processes, which a frozen .exe must let start
+    multiprocessing.freeze_support()
+    # --profile-startup prints per-phase startup timings and exits
+    profile_startup = '--profile-startup' in sys.argv
+    if profile_startup:
+        sys.argv.remove('--profile-startup')
+    # --server URL works against a purchase server (python -m src.server)
+    server_url = None
+    if '--server' in sys.argv:
+        position = sys.argv.index('--server')
+        server_url = sys.argv[position + 1] if position + 1 < len(sys.argv) else None
+        del sys.argv[position:position + 2]
+    # --diagnostics collects timings from the start (see src/diagnostics.py)
+    collect_diagnostics = '--diagnostics' in sys.argv
+    if collect_diagnostics:
+        sys.argv.remove('--diagnostics')
+    main(profile_startup=profile_startup, started=started, server_url=server_url,
+         collect_diagnostics=collect_diagnostics)
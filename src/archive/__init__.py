@@ -0,0 +1 @@
+"""Month-partitioned Parquet archive of old purchases, queried together with the database"""
@@ -0,0 +1,231 @@
+import os
+import time
+import uuid
+import logging
+from datetime import date, datetime
+from sqlalchemy import DateTime, Float, Integer, String, delete, func, insert, select, type_coerce
+from src.database.config import archive_dir as default_archive_dir
+from src.database.customers import CUSTOMER_DETAILS
+from src.database.models import ArchivedFile, Customer, Purchase, engine as default_engine
+from src.database.summaries import keep_summaries
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 50000  # rows per Parquet row group
+DEFAULT_KEEP_MONTHS = 24
+COMPRESSION = 'zstd'
+PARTITION_FORMAT = 'purchase_month={month}'
+
+# Every purchases column is archived together with the customer's details,
+# so an archived purchase can be read back as the customer list showed it
+ARCHIVE_COLUMNS = (['id', 'customer_id'] + CUSTOMER_DETAILS
+                   + [column.name for column in Purchase.__table__.columns if column.name not in ('id', 'customer_id')])
+
+
+def _column(name):
+    return (Customer if name in CUSTOMER_DETAILS else Purchase).__table__.c[name]
+
+
+class ArchiveError(Exception):
+    """Raised when purchases cannot be archived"""
+
+
+class ArchiveResult:
+    """Counters for a single archive run"""
+
+    def __init__(self, before):
+        self.before = before
+        self.total = 0
+        self.archived = 0
+        self.months = 0
+        self.files = []
+        self.bytes = 0
+        self.elapsed = 0.0
+        self.cancelled = False
+
+    @property
+    def rows_per_second(self):
+        return self.archived / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self):
+        return f"<ArchiveResult(before={self.before}, archived={self.archived} of {self.total})>"
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ArchiveError("The purchase archive needs the pyarrow package: pip install pyarrow")
+    return pa, pq
+
+
+def archive_schema():
+    """Arrow schema of the archive files, following ARCHIVE_COLUMNS"""
+    pa, _ = _pyarrow()
+    types = {Integer: pa.int64(), Float: pa.float64(), DateTime: pa.timestamp('us')}
+    fields = []
+    for name in ARCHIVE_COLUMNS:
+        column = _column(name)
+        arrow_type = next((t for sql_type, t in types.items() if isinstance(column.type, sql_type)), pa.string())
+        # Files archived before customers were split out have no customer_id
+        nullable = column.nullable or name == 'customer_id'
+        fields.append(pa.field(name, arrow_type, nullable=nullable))
+    return pa.schema(fields)
+
+
+def cutoff_date(before=None, keep_months=None):
+    """First purchase time that stays in the database.
+
+    `before` is a date or 'YYYY-MM-DD'; otherwise everything older than the
+    last `keep_months` whole months (default DEFAULT_KEEP_MONTHS) is archived.
+    """
+    if before is not None:
+        if isinstance(before, str):
+            before = date.fromisoformat(before[:10])
+        if isinstance(before, datetime):
+            before = before.date()
+        return datetime.combine(before, datetime.min.time())
+    keep_months = DEFAULT_KEEP_MONTHS if keep_months is None else keep_months
+    if keep_months < 0:
+        raise ValueError("keep_months cannot be negative")
+    today = date.today()
+    months = today.year * 12 + today.month - 1 - keep_months
+    return datetime(months // 12, months % 12 + 1, 1)
+
+
+def _next_month(start):
+    return datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+
+def _to_table(pa, schema, rows):
+    arrays = []
+    for values, field in zip(zip(*rows), schema):
+        if field.name == 'purchase_date':
+            # Selected as the stored text; Arrow parses it faster than Python
+            arrays.append(pa.array(values, pa.string()).cast(field.type))
+        else:
+            arrays.append(pa.array(values, field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def _write_partition(conn, directory, month, where, batch_size):
+    """Write the purchases matching `where` to a new file of `month`'s partition.
+
+    Returns (path relative to `directory`, rows, first date, last date).
+    """
+    pa, pq = _pyarrow()
+    import pyarrow.compute as pc
+    schema = archive_schema()
+    columns = [type_coerce(Purchase.purchase_date, String).label('purchase_date') if name == 'purchase_date'
+               else _column(name) for name in ARCHIVE_COLUMNS]
+    query = (select(*columns).join_from(Purchase, Customer).where(*where)
+             .order_by(Purchase.purchase_date, Purchase.id))
+
+    relative = (f"{PARTITION_FORMAT.format(month=month)}/"
+                f"part-{datetime.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}.parquet")
+    path = os.path.join(directory, *relative.split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    rows, first_date, last_date = 0, None, None
+    writer = pq.ParquetWriter(path + '.tmp', schema, compression=COMPRESSION)
+    try:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+        for batch in result.partitions():
+            table = _to_table(pa, schema, batch)
+            writer.write_table(table, row_group_size=batch_size)
+            dates = pc.min_max(table.column('purchase_date')).as_py()
+            first_date = first_date or dates['min']
+            last_date = dates['max']
+            rows += len(batch)
+        result.close()
+    finally:
+        writer.close()
+    os.replace(path + '.tmp', path)
+    return relative, rows, first_date, last_date
+
+
+def _remove_orphans(conn, directory):
+    """Delete files left by runs that never committed (they are not registered)"""
+    if not os.path.isdir(directory):
+        return
+    registered = set(conn.execute(select(ArchivedFile.path)).scalars())
+    for folder, _, file_names in os.walk(directory):
+        for file_name in file_names:
+            if not file_name.endswith(('.parquet', '.parquet.tmp')):
+                continue
+            path = os.path.join(folder, file_name)
+            if os.path.relpath(path, directory).replace(os.sep, '/') not in registered:
+                logger.warning(f"Removing unregistered archive file {path}")
+                os.remove(path)
+
+
+def archive_purchases(before=None, keep_months=None, directory=None, engine=None,
+                      batch_size=DEFAULT_BATCH_SIZE, progress=None, cancelled=None):
+    """Move purchases older than the cutoff (see cutoff_date) into the Parquet archive.
+
+    Each month goes to a new zstd-compressed file in its purchase_month=YYYY-MM
+    partition of `directory` (default: config.archive_dir()). A month's file
+    is written, registered in archived_files and its rows deleted from
+    purchases in one transaction, so a purchase is always either in the
+    database or in the archive; files of an interrupted run are removed by
+    the next one. The sales summaries keep counting archived purchases.
+
+    `progress(result)` is called after every month; `cancelled()` is checked
+    before each one.
+    """
+    engine = engine or default_engine
+    directory = directory or default_archive_dir(engine.url)
+    cutoff = cutoff_date(before, keep_months)
+    result = ArchiveResult(cutoff)
+    started = time.perf_counter()
+    _pyarrow()
+
+    month_key = func.strftime('%Y-%m', Purchase.purchase_date)
+    with engine.connect() as conn:
+        months = conn.execute(select(month_key, func.count()).where(Purchase.purchase_date < cutoff)
+                              .group_by(month_key).order_by(month_key)).all()
+    result.total = sum(count for _, count in months)
+
+    for month, _ in months:
+        if cancelled is not None and cancelled():
+            result.cancelled = True
+            break
+        month_start = datetime.strptime(month, '%Y-%m')
+        where = [Purchase.purchase_date >= month_start,
+                 Purchase.purchase_date < min(_next_month(month_start), cutoff)]
+        with engine.begin() as conn:
+            # A write first, so the transaction holds the write lock before it
+            # reads: nothing can change the month between writing and deleting
+            with keep_summaries(conn):
+                if result.months == 0:
+                    _remove_orphans(conn, directory)
+                relative, rows, first_date, last_date = _write_partition(
+                    conn, directory, month, where, batch_size)
+                path = os.path.join(directory, *relative.split('/'))
+                size = os.path.getsize(path)
+                try:
+                    deleted = conn.execute(delete(Purchase).where(*where)).rowcount
+                    if deleted != rows:
+                        raise ArchiveError(f"{month}: wrote {rows} purchases but deleted {deleted}")
+                    conn.execute(insert(ArchivedFile).values(
+                        path=relative, month=month, rows=rows, first_date=first_date,
+                        last_date=last_date, size=size))
+                except Exception:
+                    os.remove(path)
+                    raise
+        result.months += 1
+        result.archived += rows
+        result.files.append(path)
+        result.bytes += size
+        result.elapsed = time.perf_counter() - started
+        logger.info(f"Archived {rows} purchases of {month} to {relative}")
+        if progress is not None:
+            progress(result)
+
+    result.elapsed = time.perf_counter() - started
+    if result.cancelled:
+        logger.info(f"Archiving cancelled after {result.archived} purchases")
+    else:
+        logger.info(f"Archived {result.archived} purchases older than {cutoff:%Y-%m-%d} "
+                    f"in {result.elapsed:.1f}s")
+    return result
@@ -0,0 +1,140 @@
+"""Reading the purchase archive.
+
+Queries pick the files to open from the archived_files registry, by the
+date range each file covers, so a date-limited query never touches other
+months. Inside a file Parquet reads only the requested columns, and the
+row-group statistics let the date, state and gold type filters skip whole
+row groups. Nothing here imports pyarrow unless there are files to read.
+"""
+import os
+import logging
+from sqlalchemy import select
+from src.database.config import archive_dir as default_archive_dir
+from src.database.models import ArchivedFile
+from src.database.summaries import DIMENSIONS, MEASURES, SUMMARY_PERIODS, add_to_summaries
+from src.archive.engine import archive_schema
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 10000
+
+# Summary period format for each summary table, as Arrow strftime formats
+_PERIOD_FORMATS = {'sales_daily': '%Y-%m-%d', 'sales_monthly': '%Y-%m'}
+# Summary measure -> archived column summed into it ('transactions' counts rows)
+_MEASURE_COLUMNS = {'grams': 'gold_weight', 'total_amount': 'total_amount',
+                    'discount_amount': 'discount_amount', 'final_amount': 'final_amount'}
+
+
+def archived_files(conn, start=None, end=None):
+    """Registered archive files, oldest month first, that may hold purchases in [start, end)"""
+    query = select(ArchivedFile).order_by(ArchivedFile.month, ArchivedFile.first_date)
+    if start is not None:
+        query = query.where(ArchivedFile.last_date >= start)
+    if end is not None:
+        query = query.where(ArchivedFile.first_date < end)
+    return conn.execute(query).all()
+
+
+def _paths(conn, files, directory):
+    directory = directory or default_archive_dir(conn.engine.url)
+    return [os.path.join(directory, *file.path.split('/')) for file in files]
+
+
+def _filter(start, end, states, gold_types):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    conditions = []
+    timestamp = pa.timestamp('us')
+    if start is not None:
+        conditions.append(pc.field('purchase_date') >= pa.scalar(start, timestamp))
+    if end is not None:
+        conditions.append(pc.field('purchase_date') < pa.scalar(end, timestamp))
+    if states:
+        conditions.append(pc.field('state').isin(list(states)))
+    if gold_types:
+        conditions.append(pc.field('gold_type').isin(list(gold_types)))
+    if not conditions:
+        return None
+    expression = conditions[0]
+    for condition in conditions[1:]:
+        expression = expression & condition
+    return expression
+
+
+def _dataset(path):
+    import pyarrow.dataset as ds
+    return ds.dataset(path, schema=archive_schema(), format='parquet')
+
+
+def count_archived(conn, start=None, end=None, states=None, gold_types=None, directory=None):
+    """Archived purchases in [start, end) with the given states and gold types"""
+    files = archived_files(conn, start, end)
+    if not files:
+        return 0
+    expression = _filter(start, end, states, gold_types)
+    if expression is None:
+        return sum(file.rows for file in files)
+    return sum(_dataset(path).count_rows(filter=expression) for path in _paths(conn, files, directory))
+
+
+def archived_rows(conn, columns, start=None, end=None, states=None, gold_types=None, directory=None,
+                  batch_size=DEFAULT_BATCH_SIZE):
+    """Yield lists of row tuples of the archived purchases in [start, end).
+
+    Rows come in `columns` order, oldest month first and by purchase date
+    within each file. purchase_date is returned as 'YYYY-MM-DD HH:MM:SS'
+    text, the same as the exporter reads from the database.
+    """
+    files = archived_files(conn, start, end)
+    if not files:
+        return
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    expression = _filter(start, end, states, gold_types)
+    for path in _paths(conn, files, directory):
+        for batch in _dataset(path).to_batches(columns=list(columns), filter=expression,
+                                               batch_size=batch_size):
+            if not batch.num_rows:
+                continue
+            values = []
+            for name, column in zip(batch.schema.names, batch.columns):
+                if name == 'purchase_date':
+                    column = pc.strftime(column.cast(pa.timestamp('s'), safe=False), '%Y-%m-%d %H:%M:%S')
+                if not column.null_count or pa.types.is_string(column.type):
+                    # Through NumPy is ~10x faster; nulls only stay None for text
+                    values.append(column.to_numpy(zero_copy_only=False).tolist())
+                else:
+                    values.append(column.to_pylist())
+            yield list(zip(*values))
+
+
+def add_archive_to_summaries(conn, directory=None):
+    """Add the archived purchases to freshly rebuilt sales summaries.
+
+    rebuild_summaries() only sees the purchases table; run this right after
+    it, in the same transaction, so the totals include the archive again.
+    """
+    files = archived_files(conn)
+    if not files:
+        return
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    logger.info(f"Adding {sum(file.rows for file in files)} archived purchases to the sales summaries...")
+    measure_columns = list(_MEASURE_COLUMNS.values())
+    # Aggregated column of each summary measure, in MEASURES order
+    totals_columns = [f"{_MEASURE_COLUMNS[m]}_sum" if m in _MEASURE_COLUMNS else 'purchase_date_count'
+                      for m in MEASURES]
+    for path in _paths(conn, files, directory):
+        table = _dataset(path).to_table(columns=['purchase_date'] + DIMENSIONS + measure_columns)
+        # Same as the coalesce()s the summary triggers apply
+        table = pa.Table.from_arrays(
+            [table.column('purchase_date')]
+            + [pc.fill_null(table.column(name), '') for name in DIMENSIONS]
+            + [pc.fill_null(table.column(name), 0.0) for name in measure_columns],
+            names=['purchase_date'] + DIMENSIONS + measure_columns)
+        for summary_table in SUMMARY_PERIODS:
+            periods = pc.strftime(table.column('purchase_date'), _PERIOD_FORMATS[summary_table])
+            totals = table.append_column('period', periods).group_by(['period'] + DIMENSIONS).aggregate(
+                [(column, 'sum') for column in measure_columns] + [('purchase_date', 'count')])
+            add_to_summaries(conn, summary_table, zip(*(
+                totals.column(name).to_pylist() for name in ['period'] + DIMENSIONS + totals_columns)))
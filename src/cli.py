@@ -0,0 +1,243 @@
+"""Command-line interface for batch work without the GUI.
+
+    python -m src.cli import FILE_OR_FOLDER [...] [--workers N] [--reject-dir DIR]
+    python -m src.cli export FILE [--start DATE] [--end DATE] [--state S] [--gold-type T]
+    python -m src.cli reindex
+    python -m src.cli archive [--before DATE | --keep-months N]
+    python -m src.cli report [--grain day|month] [--group-by state,gold_type] [--format csv]
+    python -m src.cli vacuum
+
+Uses the same database layer as the application and never imports PyQt, so
+it runs on servers without a display. Heavy modules (pandas, the exporters)
+are imported by the command that needs them. Exit status is 0 on success
+and 1 when anything failed, for cron and scripts.
+"""
+import os
+import sys
+import csv
+import json
+import logging
+import argparse
+
+logger = logging.getLogger(__name__)
+
+REPORT_FORMATS = ['table', 'csv', 'json']
+MEASURE_DECIMALS = 3  # grams are weighed to the milligram; amounts have 2
+
+
+def _database():
+    # Imported on first use so --database can take effect before the engine exists
+    from src.database.models import engine, init_db
+    init_db().close()
+    return engine
+
+
+def cmd_import(args):
+    from src.importer.batch import import_file_names, import_files, summary_lines
+    from src.importer.engine import ON_DUPLICATE_SKIP, ON_DUPLICATE_UPDATE
+    file_names = import_file_names(args.files)
+    if not file_names:
+        logger.error("No .csv, .xlsx or .xls files to import")
+        return 1
+    engine = _database()
+    on_duplicate = ON_DUPLICATE_UPDATE if args.update_duplicates else ON_DUPLICATE_SKIP
+    batch = import_files(file_names, engine=engine, workers=args.workers, chunk_size=args.chunk_size,
+                         on_duplicate=on_duplicate, force=args.force, reject_dir=args.reject_dir)
+    for line in summary_lines(batch):
+        print(line)
+    if any(result.already_imported is not None for result in batch.results):
+        print("Use --force to import the skipped files again")
+    return 1 if batch.failed or batch.rejected else 0
+
+
+def cmd_export(args):
+    from src.exporter.engine import export_customers
+    from src.exporter.writers import ExportError
+    engine = _database()
+    try:
+        result = export_customers(args.file, start=args.start, end=args.end, states=args.state,
+                                  gold_types=args.gold_type, engine=engine, batch_size=args.batch_size)
+    except (ExportError, ValueError) as e:
+        logger.error(str(e))
+        return 1
+    print(f"{args.file}: exported {result.written} records in {result.elapsed:.1f}s "
+          f"({result.rows_per_second:,.0f} rows/s)")
+    return 0
+
+
+def cmd_reindex(args):
+    from src.archive.query import add_archive_to_summaries
+    from src.database.fingerprint import backfill_fingerprints
+    from src.database.search import rebuild_name_index, rebuild_search_index
+    from src.database.summaries import rebuild_summaries
+    engine = _database()
+    with engine.begin() as conn:
+        logger.info("Rebuilding customer search index...")
+        rebuild_search_index(conn)
+        logger.info("Rebuilding customer name index...")
+        rebuild_name_index(conn)
+        rebuild_summaries(conn)
+        add_archive_to_summaries(conn)
+        logger.info("Filling missing purchase fingerprints...")
+        backfill_fingerprints(conn)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    print("Search and name indexes, sales summaries and fingerprints rebuilt.")
+    return 0
+
+
+def cmd_archive(args):
+    from src.archive.engine import ArchiveError, archive_purchases
+    engine = _database()
+    try:
+        result = archive_purchases(before=args.before, keep_months=args.keep_months, engine=engine,
+                                   batch_size=args.batch_size)
+    except (ArchiveError, ValueError, OSError) as e:
+        logger.error(str(e))
+        return 1
+    if not result.archived:
+        print(f"No purchases before {result.before:%Y-%m-%d} to archive.")
+        return 0
+    print(f"Archived {result.archived} purchases before {result.before:%Y-%m-%d} from {result.months} "
+          f"months into {len(result.files)} files ({result.bytes / 1048576:,.1f} MB) "
+          f"in {result.elapsed:.1f}s ({result.rows_per_second:,.0f} rows/s). "
+          f"Run 'vacuum' to shrink the database file.")
+    return 0
+
+
+def _parse_filters(values):
+    filters = {}
+    for value in values or []:
+        column, sep, wanted = value.partition('=')
+        if not sep:
+            raise ValueError(f"Filters look like dimension=value, not '{value}'")
+        filters.setdefault(column.strip(), []).append(wanted.strip())
+    return filters
+
+
+def _print_table(rows, columns):
+    cells = [[f"{row[c]:,.2f}" if isinstance(row[c], float) else str(row[c]) for c in columns] for row in rows]
+    widths = [max([len(column)] + [len(line[i]) for line in cells]) for i, column in enumerate(columns)]
+    print('  '.join(column.ljust(width) for column, width in zip(columns, widths)))
+    for line in cells:
+        print('  '.join(cell.rjust(width) for cell, width in zip(line, widths)))
+
+
+def cmd_report(args):
+    from src.database.reports import sales_summary
+    from src.database.summaries import MEASURES
+    _database()
+    group_by = [column.strip() for column in args.group_by.split(',') if column.strip()]
+    try:
+        rows = sales_summary(args.grain, start=args.start, end=args.end, group_by=group_by,
+                             filters=_parse_filters(args.filter))
+    except ValueError as e:
+        logger.error(str(e))
+        return 1
+    columns = group_by + MEASURES
+    rows = [{column: round(value, MEASURE_DECIMALS) if isinstance(value, float) else value
+             for column, value in row.items()} for row in rows]
+    if args.format == 'json':
+        json.dump(rows, sys.stdout, indent=2)
+        print()
+    elif args.format == 'csv':
+        writer = csv.DictWriter(sys.stdout, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+    else:
+        _print_table(rows, columns)
+    return 0
+
+
+def cmd_vacuum(args):
+    engine = _database()
+    path = engine.url.database
+    before = os.path.getsize(path) if path and os.path.exists(path) else None
+    with engine.connect() as conn:
+        # VACUUM cannot run inside a transaction, so bypass SQLAlchemy's BEGIN
+        driver = conn.connection.driver_connection
+        logger.info("Checkpointing the write-ahead log...")
+        driver.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        logger.info("Vacuuming...")
+        driver.execute("VACUUM")
+        driver.execute("PRAGMA optimize")
+    if before is not None:
+        after = os.path.getsize(path)
+        print(f"{path}: {before / 1048576:,.1f} MB -> {after / 1048576:,.1f} MB")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m src.cli',
+                                     description="Gold purchase batch tools (no GUI required)")
+    parser.add_argument('--database', metavar='URL',
+                        help="SQLAlchemy database URL (default: GOLD_DATABASE_URL or sqlite:///gold_purchases.db)")
+    parser.add_argument('--archive-dir', metavar='DIR',
+                        help="purchase archive directory (default: GOLD_ARCHIVE_DIR or <database>-archive)")
+    parser.add_argument('-q', '--quiet', action='store_true', help="only log warnings and errors")
+    commands = parser.add_subparsers(dest='command', metavar='COMMAND', required=True)
+
+    command = commands.add_parser('import', help="import CSV or Excel files, or every one in a folder")
+    command.add_argument('files', nargs='+', metavar='FILE_OR_FOLDER')
+    command.add_argument('--force', action='store_true', help="import files that were already imported")
+    command.add_argument('--update-duplicates', action='store_true',
+                         help="update stored purchases that match a row instead of skipping the row")
+    command.add_argument('--chunk-size', type=int, default=50000, help="rows per transaction (default: %(default)s)")
+    command.add_argument('--workers', type=int, metavar='N',
+                         help="processes reading the files (default: one per CPU but one, at most one per file; "
+                              "0, the default for a single file or CPU, reads them in this process)")
+    command.add_argument('--reject-dir', metavar='DIR',
+                         help="where to write each file's rejected rows (default: a rejects folder next to it)")
+    command.set_defaults(handler=cmd_import)
+
+    command = commands.add_parser('export', help="export customers to .csv, .xlsx or .parquet")
+    command.add_argument('file', metavar='FILE')
+    command.add_argument('--start', help="first purchase day, YYYY-MM-DD")
+    command.add_argument('--end', help="last purchase day, YYYY-MM-DD")
+    command.add_argument('--state', action='append', help="only this state (repeatable)")
+    command.add_argument('--gold-type', action='append', help="only this gold type (repeatable)")
+    command.add_argument('--batch-size', type=int, default=10000, help="rows per batch (default: %(default)s)")
+    command.set_defaults(handler=cmd_export)
+
+    command = commands.add_parser('reindex', help="rebuild the search and name indexes, sales summaries and fingerprints")
+    command.set_defaults(handler=cmd_reindex)
+
+    command = commands.add_parser('archive', help="move old purchases into the month-partitioned Parquet archive")
+    cutoff = command.add_mutually_exclusive_group()
+    cutoff.add_argument('--before', metavar='DATE', help="archive purchases before this day, YYYY-MM-DD")
+    cutoff.add_argument('--keep-months', type=int, metavar='N',
+                        help="archive everything older than the last N whole months (default: 24)")
+    command.add_argument('--batch-size', type=int, default=50000,
+                         help="rows per Parquet row group (default: %(default)s)")
+    command.set_defaults(handler=cmd_archive)
+
+    command = commands.add_parser('report', help="print sales totals from the summary tables")
+    command.add_argument('--grain', choices=['day', 'month'], default='month')
+    command.add_argument('--start', help="first period, YYYY-MM-DD or YYYY-MM")
+    command.add_argument('--end', help="last period, YYYY-MM-DD or YYYY-MM")
+    command.add_argument('--group-by', default='period',
+                         help="comma-separated: period, state, gold_type, gold_quality, payment_mode; "
+                              "empty for grand totals (default: %(default)s)")
+    command.add_argument('--filter', action='append', metavar='DIMENSION=VALUE',
+                         help="only rows with this value (repeatable)")
+    command.add_argument('--format', choices=REPORT_FORMATS, default='table')
+    command.set_defaults(handler=cmd_report)
+
+    command = commands.add_parser('vacuum', help="checkpoint the WAL, compact the database file and refresh statistics")
+    command.set_defaults(handler=cmd_vacuum)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.database:
+        os.environ['GOLD_DATABASE_URL'] = args.database
+    if args.archive_dir:
+        os.environ['GOLD_ARCHIVE_DIR'] = args.archive_dir
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO,
+                        format='%(levelname)s: %(message)s')
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
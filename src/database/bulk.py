@@ -0,0 +1,82 @@
+"""Index upkeep deferred for the length of a bulk load.
+
+Loading many rows is much faster with the secondary purchase indexes
+dropped and built once at the end, and with the fuzzy name index rebuilt
+once from the distinct names instead of kept up chunk by chunk. A load
+that is killed outright leaves them suspended until restore_indexes()
+runs, which migrate() does at every start. Other connections see the
+purchases without those indexes while a load runs: slower, never wrong.
+"""
+import logging
+from src.database.models import Purchase
+from src.database.search import resume_name_index, suspend_name_index
+
+logger = logging.getLogger(__name__)
+
+# Purchase indexes a large import builds once at the end. The fingerprint
+# index stays, as finding duplicates looks it up
+DEFERRED_INDEXES = [index for index in Purchase.__table__.indexes if index.name != 'ix_purchases_row_hash']
+# A load defers its indexes once it has written at least this many rows
+# and as many as were stored before it; rebuilding them then costs less
+# than keeping them up
+BULK_LOAD_ROWS = 100000
+
+
+def suspend_indexes(conn, indexes=DEFERRED_INDEXES):
+    """Drop `indexes` and suspend the name index until restore_indexes()"""
+    for index in indexes:
+        index.drop(conn, checkfirst=True)
+    suspend_name_index(conn)
+
+
+def restore_indexes(conn):
+    """Build every purchase index that is missing and resume the name index.
+
+    Returns whether anything was rebuilt, in which case the planner
+    statistics are refreshed too.
+    """
+    missing = [index for index in Purchase.__table__.indexes
+               if not conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?",
+                                           (index.name,)).first()]
+    if missing:
+        logger.info(f"Building {len(missing)} purchase indexes...")
+    for index in missing:
+        index.create(conn)
+    if not resume_name_index(conn) and not missing:
+        return False
+    conn.exec_driver_sql("ANALYZE")
+    return True
+
+
+class BulkLoad:
+    """Defers index upkeep once a load turns out to be large.
+
+    Call add(rows) before writing each chunk; from the chunk that makes
+    the load large (see BULK_LOAD_ROWS) on, the indexes are suspended.
+    Leaving the block restores them, however it is left.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.min_rows = BULK_LOAD_ROWS
+        self.rows = 0
+        self.suspended = False
+        with engine.connect() as conn:
+            # An upper bound on the rows stored, without counting them
+            self.stored = conn.exec_driver_sql("SELECT coalesce(max(id), 0) FROM purchases").scalar()
+
+    def add(self, rows):
+        self.rows += rows
+        if not self.suspended and self.rows >= max(self.min_rows, self.stored):
+            logger.info("Large load: deferring index upkeep until it ends")
+            with self.engine.begin() as conn:
+                suspend_indexes(conn)
+            self.suspended = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.suspended:
+            with self.engine.begin() as conn:
+                restore_indexes(conn)
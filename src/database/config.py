@@ -0,0 +1,79 @@
+import os
+import logging
+from sqlalchemy import create_engine, event, make_url
+from src.database.search import register_functions
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATABASE_URL = 'sqlite:///gold_purchases.db'
+
+# Connection pragmas applied to every new SQLite connection. Each one can be
+# overridden with an environment variable, e.g. GOLD_SQLITE_CACHE_SIZE=-131072.
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',         # readers keep working while a writer commits
+    'synchronous': 'NORMAL',       # durable at checkpoints; safe with WAL
+    'cache_size': -65536,          # negative = KiB, i.e. 64 MB page cache
+    'mmap_size': 268435456,        # 256 MB of memory-mapped reads
+    # MEMORY keeps savepoint sub-journals in RAM, which made large imports in
+    # WAL mode superlinear (22s vs 3.6s for 50k rows); the OS cache does better
+    'temp_store': 'DEFAULT',
+    'foreign_keys': 'ON',
+    'busy_timeout': 5000,          # ms to wait on a locked database
+}
+
+
+def database_url():
+    return os.environ.get('GOLD_DATABASE_URL', DEFAULT_DATABASE_URL)
+
+
+def archive_dir(url=None):
+    """Directory of the Parquet purchase archive (GOLD_ARCHIVE_DIR).
+
+    Defaults to "<database file>-archive" next to the SQLite file.
+    """
+    if os.environ.get('GOLD_ARCHIVE_DIR'):
+        return os.environ['GOLD_ARCHIVE_DIR']
+    database = make_url(url or database_url()).database
+    if not database or database == ':memory:':
+        raise ValueError("An in-memory database has no archive directory; set GOLD_ARCHIVE_DIR")
+    return os.path.splitext(database)[0] + '-archive'
+
+
+def pragmas_from_env(pragmas=None):
+    """Merge GOLD_SQLITE_<PRAGMA> environment overrides into the defaults"""
+    merged = dict(DEFAULT_PRAGMAS)
+    merged.update(pragmas or {})
+    for name in list(merged):
+        value = os.environ.get(f'GOLD_SQLITE_{name.upper()}')
+        if value is not None:
+            merged[name] = value
+    return merged
+
+
+def configure_engine(engine, pragmas=None):
+    """Apply connection pragmas and real transaction control to a SQLite engine"""
+    pragmas = pragmas_from_env(pragmas)
+
+    # Let SQLAlchemy emit BEGIN itself instead of pysqlite's implicit transactions,
+    # so SAVEPOINTs (used by the importer to isolate bad rows) nest correctly.
+    @event.listens_for(engine, "connect")
+    def _configure_connection(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        for name, value in pragmas.items():
+            dbapi_connection.execute(f"PRAGMA {name}={value}")
+        # The customer name index triggers call these
+        register_functions(dbapi_connection)
+
+    # Writes that read before they write ask for the write lock up front with
+    # the 'immediate' execution option; otherwise another writer committing
+    # in between makes their first write fail instead of waiting its turn.
+    @event.listens_for(engine, "begin")
+    def _emit_begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE" if conn.get_execution_options().get('immediate') else "BEGIN")
+
+    return engine
+
+
+def create_configured_engine(url=None, pragmas=None, **kwargs):
+    """Create the application engine for `url` (default: GOLD_DATABASE_URL)"""
+    return configure_engine(create_engine(url or database_url(), **kwargs), pragmas)
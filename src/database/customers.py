@@ -0,0 +1,112 @@
+"""Which customer made a purchase.
+
+A purchase belongs to the customer with the same phone number, compared in
+its canonical form (see phone_key); failing that, to the customer with the
+same email address, compared case-insensitively. A purchase with neither, or with ones nobody
+has yet, starts a new customer. A customer's details are the ones of the
+first purchase that created it.
+
+The importer, the repository and the migration that split customers out of
+the purchases all resolve customers here, so they agree on who is who.
+"""
+import re
+import json
+
+CUSTOMER_DETAILS = ['customer_name', 'phone_number', 'email', 'address']
+
+_NON_DIGITS = re.compile(r'\D')
+# National numbers are keyed without the country code or trunk 0 they are
+# often written with: "+91 98450 12345", "098450 12345" and "9845012345"
+# are one number
+COUNTRY_CODE = '91'
+NATIONAL_NUMBER_LENGTH = 10
+_NATIONAL_PREFIXES = ['00' + COUNTRY_CODE, COUNTRY_CODE, '0']
+
+
+def phone_key(phone_number):
+    """The canonical form of a phone number, or None if it has no digits.
+
+    Its digits, less the country code or trunk 0 in front of a national
+    number; other numbers keep all their digits.
+    """
+    if phone_number is None:
+        return None
+    digits = _NON_DIGITS.sub('', str(phone_number))
+    for prefix in _NATIONAL_PREFIXES:
+        if len(digits) == len(prefix) + NATIONAL_NUMBER_LENGTH and digits.startswith(prefix):
+            return digits[len(prefix):]
+    return digits or None
+
+
+def email_key(email):
+    """An email address trimmed and case-folded, or None if it is blank"""
+    return str(email).strip().casefold() or None if email is not None else None
+
+
+def _existing(conn, column, keys):
+    # Oldest customer first, so a key shared by several customers keeps
+    # resolving to the same one
+    if not keys:
+        return {}
+    result = conn.exec_driver_sql(
+        f"SELECT {column}, min(id) FROM customers WHERE {column} IN (SELECT value FROM json_each(?)) "
+        f"GROUP BY {column}",
+        (json.dumps(sorted(keys)),)
+    )
+    return dict(result.fetchall())
+
+
+def find_customer(conn, phone_number=None, email=None):
+    """Id of the customer these contact details belong to, or None"""
+    phone, mail = phone_key(phone_number), email_key(email)
+    if phone:
+        found = _existing(conn, 'phone_key', {phone}).get(phone)
+        if found is not None:
+            return found
+    if mail:
+        return _existing(conn, 'email_key', {mail}).get(mail)
+    return None
+
+
+def resolve_customers(conn, details, known=None):
+    """Customer id for each (customer_name, phone_number, email, address) tuple.
+
+    Customers that do not exist yet are inserted, one per new phone number
+    or email; later tuples in the same batch then resolve to them too.
+    Must run inside a write transaction.
+
+    `known` is an optional (phone_key -> id, email_key -> id) pair of dicts
+    holding every customer, kept up to date here across calls; with it the
+    customers table is never read, so a bulk load can leave it unindexed.
+    """
+    keys = [(phone_key(row[1]), email_key(row[2])) for row in details]
+    if known is not None:
+        by_phone, by_email = known
+    else:
+        by_phone = _existing(conn, 'phone_key', {phone for phone, _ in keys if phone})
+        by_email = _existing(conn, 'email_key', {mail for _, mail in keys if mail})
+
+    last_id = conn.exec_driver_sql("SELECT coalesce(max(id), 0) FROM customers").scalar()
+    ids, new_rows = [], []
+    for row, (phone, mail) in zip(details, keys):
+        customer_id = by_phone.get(phone) if phone else None
+        if customer_id is None and mail:
+            customer_id = by_email.get(mail)
+        if customer_id is None:
+            # Ids are handed out here; the write lock keeps them free until the insert
+            last_id += 1
+            customer_id = last_id
+            new_rows.append((customer_id, *row, phone, mail))
+        if phone:
+            by_phone.setdefault(phone, customer_id)
+        if mail:
+            by_email.setdefault(mail, customer_id)
+        ids.append(customer_id)
+
+    if new_rows:
+        columns = ['id'] + CUSTOMER_DETAILS + ['phone_key', 'email_key']
+        conn.exec_driver_sql(
+            f"INSERT INTO customers ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            new_rows
+        )
+    return ids
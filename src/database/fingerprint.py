@@ -0,0 +1,177 @@
+"""Stable fingerprints of purchases, used to recognise re-imported rows.
+
+A fingerprint covers the fields that identify a purchase (who bought what,
+when, how much and at what price) after normalization, so cosmetic
+differences in a file (case, spacing, phone punctuation, number formatting)
+do not make a row look new. Phone numbers are compared by their canonical
+key (customers.phone_key), so "+91 98450 12345" and "098450 12345" match. Discount, payment mode, notes and the derived
+amounts are left out; re-importing a row with only those changed updates
+the stored row instead of duplicating it.
+"""
+import re
+import hashlib
+from datetime import date, datetime
+from src.database.customers import CUSTOMER_DETAILS, phone_key
+
+HASH_COLUMNS = ['customer_name', 'phone_number', 'email', 'address', 'state',
+                'purchase_date', 'gold_type', 'gold_quality', 'gold_weight', 'price_per_gram']
+
+_SEPARATOR = '\x1f'
+_NON_DIGITS = re.compile(r'\D')
+
+
+def _text(value):
+    return ' '.join(str(value).split()).casefold() if value is not None else ''
+
+
+def _digits(value):
+    return _NON_DIGITS.sub('', str(value)) if value is not None else ''
+
+
+def _phone(value):
+    return phone_key(value) or ''
+
+
+def _number(value):
+    return f"{float(value):.6f}" if value is not None and value == value else ''
+
+
+def _date(value):
+    if value is None:
+        return ''
+    if isinstance(value, (date, datetime)):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    # Stored as text: 'YYYY-MM-DD HH:MM:SS.ffffff'
+    return str(value)[:19]
+
+
+_NORMALIZERS = {
+    'phone_number': _phone,
+    'purchase_date': _date,
+    'gold_weight': _number,
+    'price_per_gram': _number,
+}
+# Before canonical phone keys, fingerprints kept all of a number's digits
+_DIGITS_NORMALIZERS = dict(_NORMALIZERS, phone_number=_digits)
+
+
+def _hash(key):
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def purchase_fingerprint(values, normalizers=_NORMALIZERS):
+    """Fingerprint of one purchase given its HASH_COLUMNS values in order"""
+    return _hash(_SEPARATOR.join(normalizers.get(column, _text)(value)
+                                 for column, value in zip(HASH_COLUMNS, values)))
+
+
+def _normalized_column(column, values):
+    # Most columns repeat a few values (states, gold types, dates, common
+    # names), so each distinct value is normalized once and broadcast back
+    import numpy as np
+    import pandas as pd
+    normalize = _NORMALIZERS.get(column, _text)
+    if normalize is _number:
+        values = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=np.float64)
+    else:
+        values = pd.Series(values, dtype=object)
+    codes, uniques = pd.factorize(values)
+    normalized = np.array([normalize(value) for value in uniques] + [normalize(None)], dtype=object)
+    return normalized[codes]
+
+
+def purchase_fingerprints(columns):
+    """Fingerprints for whole columns: `columns` maps each HASH_COLUMNS name to a sequence.
+
+    Gives the same result as purchase_fingerprint row by row, but normalizes
+    column-wise.
+    """
+    normalized = [_normalized_column(column, columns[column]) for column in HASH_COLUMNS]
+    return [_hash(_SEPARATOR.join(values)) for values in zip(*normalized)]
+
+
+def file_fingerprint(file_name, block_size=1 << 20):
+    """SHA-256 of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(file_name, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _purchase_columns():
+    return [f"{'c' if column in CUSTOMER_DETAILS else 'p'}.{column}" for column in HASH_COLUMNS]
+
+
+def _fill_fingerprints(conn, table, select, chunk_size, normalizers=_NORMALIZERS):
+    # `select` takes (last id, limit) and returns the id, then HASH_COLUMNS
+    last_id = 0
+    while True:
+        rows = conn.exec_driver_sql(select, (last_id, chunk_size)).fetchall()
+        if not rows:
+            break
+        conn.exec_driver_sql(
+            f"UPDATE {table} SET row_hash = ? WHERE id = ?",
+            [(purchase_fingerprint(row[1:], normalizers), row[0]) for row in rows]
+        )
+        last_id = rows[-1][0]
+
+
+def backfill_fingerprints(conn, chunk_size=100000):
+    """Fill row_hash for every purchase that has none, from its customer's current details"""
+    _fill_fingerprints(conn, 'purchases', f"SELECT p.id, {', '.join(_purchase_columns())} FROM purchases p "
+                                          f"JOIN customers c ON c.id = p.customer_id "
+                                          f"WHERE p.row_hash IS NULL AND p.id > ? ORDER BY p.id LIMIT ?", chunk_size)
+
+
+def backfill_single_table(conn, chunk_size=100000):
+    """Fill row_hash where it is missing in the single-table customers layout.
+
+    Phone numbers are hashed by all their digits, as they were when
+    migration 5 ran; migration 8 fingerprints every row again.
+    """
+    _fill_fingerprints(conn, 'customers', f"SELECT id, {', '.join(HASH_COLUMNS)} FROM customers "
+                                          f"WHERE row_hash IS NULL AND id > ? ORDER BY id LIMIT ?",
+                       chunk_size, _DIGITS_NORMALIZERS)
+
+
+def fingerprint_single_table(conn, table, chunk_size=100000):
+    """Fingerprint every row of a single-table layout `table` from its own columns.
+
+    Those are the values the importer and the repository hashed, before
+    rows sharing a phone number or email are merged into one customer.
+    """
+    _fill_fingerprints(conn, table, f"SELECT id, {', '.join(HASH_COLUMNS)} FROM {table} "
+                                    f"WHERE id > ? ORDER BY id LIMIT ?", chunk_size)
+
+
+def rehash_phone_fingerprints(conn, chunk_size=100000):
+    """Move fingerprints taken over a phone number's digits to its canonical key.
+
+    A stored fingerprint can only be recomputed where it still matches the
+    purchase's current values, i.e. its customer's details are the ones
+    that were hashed. Others (purchases whose customer was merged with
+    different details) keep theirs. Must run before customers are merged
+    by their new keys. Returns (rehashed, kept) counts.
+    """
+    select = (f"SELECT p.id, p.row_hash, {', '.join(_purchase_columns())} FROM purchases p "
+              f"JOIN customers c ON c.id = p.customer_id WHERE p.id > ? ORDER BY p.id LIMIT ?")
+    last_id, rehashed, kept = 0, 0, 0
+    while True:
+        rows = conn.exec_driver_sql(select, (last_id, chunk_size)).fetchall()
+        if not rows:
+            break
+        updates = []
+        for row in rows:
+            fingerprint = purchase_fingerprint(row[2:])
+            if row[1] is None or row[1] == fingerprint:
+                continue
+            if row[1] == purchase_fingerprint(row[2:], _DIGITS_NORMALIZERS):
+                updates.append((fingerprint, row[0]))
+            else:
+                kept += 1
+        if updates:
+            conn.exec_driver_sql("UPDATE purchases SET row_hash = ? WHERE id = ?", updates)
+        rehashed += len(updates)
+        last_id = rows[-1][0]
+    return rehashed, kept
@@ -0,0 +1,268 @@
+"""Versioned schema migrations.
+
+The schema version lives in SQLite's `PRAGMA user_version`. Each migration
+runs in its own transaction and bumps the version when it commits, so an
+interrupted upgrade resumes from the last completed step. Migrations must
+tolerate databases created by older versions of the app through
+`Base.metadata.create_all`, which is why they check before they add.
+
+A released migration never changes: every database, new or old, replays
+the same steps. Migrations 1-7 work on the single-table layout, where
+each customers row was a purchase (LEGACY_CUSTOMERS below); migration 8
+moves it to the current models.
+"""
+import logging
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Float, Index, Integer, MetaData, String, Table, Text
+from sqlalchemy.schema import CreateTable
+from src.database.bulk import restore_indexes
+from src.database.models import ArchivedFile, Base, Customer, ImportedFile, Purchase, SalesDaily, SalesMonthly, User
+from src.database.customers import CUSTOMER_DETAILS, email_key, phone_key, resolve_customers
+from src.database.fingerprint import backfill_single_table, fingerprint_single_table, rehash_phone_fingerprints
+from src.database.search import FTS_TABLE, create_name_index, create_search_index
+from src.database.summaries import create_summary_triggers, summary_statements
+
+logger = logging.getLogger(__name__)
+
+# The customers table before migration 8, as migrations 1-7 built it
+LEGACY_CUSTOMERS = Table(
+    'customers', MetaData(),
+    Column('id', Integer, primary_key=True),
+    Column('customer_name', String(100), nullable=False),
+    Column('phone_number', String(20)),
+    Column('email', String(100)),
+    Column('address', Text),
+    Column('state', String(50)),
+    Column('purchase_date', DateTime, default=datetime.now),
+    Column('gold_type', String(50)),
+    Column('gold_quality', String(50)),
+    Column('gold_weight', Float),
+    Column('price_per_gram', Float),
+    Column('total_amount', Float),
+    Column('discount_percentage', Float),
+    Column('discount_amount', Float),
+    Column('final_amount', Float),
+    Column('payment_mode', String(50)),
+    Column('notes', Text),
+    Column('row_hash', String(32)),
+)
+_LEGACY_INDEXES = {
+    3: [Index('ix_customers_phone_number', LEGACY_CUSTOMERS.c.phone_number),
+        Index('ix_customers_purchase_date', LEGACY_CUSTOMERS.c.purchase_date),
+        Index('ix_customers_state_purchase_date', LEGACY_CUSTOMERS.c.state, LEGACY_CUSTOMERS.c.purchase_date,
+              LEGACY_CUSTOMERS.c.gold_weight, LEGACY_CUSTOMERS.c.final_amount),
+        Index('ix_customers_gold_type_purchase_date', LEGACY_CUSTOMERS.c.gold_type,
+              LEGACY_CUSTOMERS.c.purchase_date, LEGACY_CUSTOMERS.c.gold_weight, LEGACY_CUSTOMERS.c.final_amount)],
+    5: [Index('ix_customers_row_hash', LEGACY_CUSTOMERS.c.row_hash)],
+    6: [Index('ix_customers_customer_name', LEGACY_CUSTOMERS.c.customer_name),
+        Index('ix_customers_final_amount', LEGACY_CUSTOMERS.c.final_amount)],
+}
+
+
+def _create_tables(conn):
+    Base.metadata.create_all(conn, tables=[User.__table__])
+    LEGACY_CUSTOMERS.create(conn, checkfirst=True)
+
+
+def _has_column(conn, table, column):
+    return any(row[1] == column for row in conn.exec_driver_sql(f"PRAGMA table_info({table})"))
+
+
+def _create_indexes(conn, table, names):
+    for index in table.indexes:
+        if index.name in names:
+            index.create(conn, checkfirst=True)
+
+
+def _create_legacy_indexes(conn, version):
+    for index in _LEGACY_INDEXES[version]:
+        index.create(conn, checkfirst=True)
+
+
+def _add_customer_indexes(conn):
+    _create_legacy_indexes(conn, 3)
+
+
+def _add_sales_summaries(conn):
+    Base.metadata.create_all(conn, tables=[SalesDaily.__table__, SalesMonthly.__table__])
+    create_summary_triggers(conn, 'customers')
+
+
+def _add_import_fingerprints(conn):
+    if not _has_column(conn, 'customers', 'row_hash'):
+        conn.exec_driver_sql("ALTER TABLE customers ADD COLUMN row_hash VARCHAR(32)")
+    backfill_single_table(conn)
+    _create_legacy_indexes(conn, 5)
+    Base.metadata.create_all(conn, tables=[ImportedFile.__table__])
+
+
+def _add_sort_indexes(conn):
+    _create_legacy_indexes(conn, 6)
+
+
+def _add_purchase_archive(conn):
+    Base.metadata.create_all(conn, tables=[ArchivedFile.__table__])
+    # Archiving deletes purchases without taking them out of the summaries
+    for statement in summary_statements('customers'):
+        conn.exec_driver_sql(statement)
+
+
+def _split_customers(conn, chunk_size=100000):
+    """Move the customer details of the single-table layout into customers.
+
+    Purchases keep their ids. Customers are resolved in purchase id order
+    (see customers.py), so rows sharing a phone number or email become one
+    customer with the details of its earliest purchase. Every purchase is
+    fingerprinted from its own row first, as a re-import of it would be.
+    Builds everything of the new layout: tables, indexes, the search index
+    and the summary triggers. The sales totals are unchanged.
+    """
+    logger.info("Splitting customers out of their purchases...")
+    # Triggers and the search index refer to the old table; all come back below
+    for trigger in ['customers_fts_ai', 'customers_fts_ad', 'customers_fts_au',
+                    'sales_summary_ai', 'sales_summary_ad', 'sales_summary_au']:
+        conn.exec_driver_sql(f"DROP TRIGGER {trigger}")
+    conn.exec_driver_sql(f"DROP TABLE {FTS_TABLE}")
+    conn.exec_driver_sql("ALTER TABLE customers RENAME TO purchases_old")
+    for (index,) in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index' "
+                                         "AND tbl_name = 'purchases_old' AND sql IS NOT NULL").fetchall():
+        conn.exec_driver_sql(f"DROP INDEX {index}")
+    fingerprint_single_table(conn, 'purchases_old', chunk_size)
+    # Indexes are built once at the end; customers are resolved in memory
+    conn.execute(CreateTable(Customer.__table__))
+    conn.execute(CreateTable(Purchase.__table__))
+
+    conn.exec_driver_sql("CREATE TEMP TABLE purchase_customers (id INTEGER PRIMARY KEY, customer_id INTEGER)")
+    last_id, known = 0, ({}, {})
+    while True:
+        rows = conn.exec_driver_sql(
+            f"SELECT id, {', '.join(CUSTOMER_DETAILS)} FROM purchases_old WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, chunk_size)).fetchall()
+        if not rows:
+            break
+        customer_ids = resolve_customers(conn, [row[1:] for row in rows], known)
+        conn.exec_driver_sql("INSERT INTO purchase_customers (id, customer_id) VALUES (?, ?)",
+                             [(row[0], customer_id) for row, customer_id in zip(rows, customer_ids)])
+        last_id = rows[-1][0]
+
+    columns = [column.name for column in Purchase.__table__.columns if column.name not in ('id', 'customer_id')]
+    conn.exec_driver_sql(
+        f"INSERT INTO purchases (id, customer_id, {', '.join(columns)}) "
+        f"SELECT o.id, m.customer_id, {', '.join('o.' + column for column in columns)} "
+        f"FROM purchases_old o JOIN purchase_customers m ON m.id = o.id")
+    conn.exec_driver_sql("DROP TABLE purchase_customers")
+    conn.exec_driver_sql("DROP TABLE purchases_old")
+
+    for index in list(Customer.__table__.indexes) + list(Purchase.__table__.indexes):
+        index.create(conn)
+    # Without statistics SQLite pages a list sorted by a customer column by
+    # sorting every purchase, rather than walking the customers index
+    conn.exec_driver_sql("ANALYZE")
+    create_search_index(conn)
+    for statement in summary_statements():
+        conn.exec_driver_sql(statement)
+
+
+def _canonical_phone_keys(conn, chunk_size=100000):
+    """Re-key customers by their canonical phone numbers (see customers.phone_key).
+
+    Customers whose numbers were written differently ("+91 ..." and
+    "0...") now share a key; each such group is merged into its oldest
+    customer, as resolve_customers would have done from the start. That
+    customer keeps its details and gets the blank ones from the others.
+    Purchase fingerprints move to the canonical keys first, while each
+    purchase still has the customer whose details it was hashed with.
+    """
+    rehashed, kept = rehash_phone_fingerprints(conn, chunk_size)
+    logger.info(f"Re-fingerprinted {rehashed} purchases by canonical phone key; "
+                f"{kept} could not be recomputed and keep theirs")
+    # Nearly every key changes; rebuilding the index afterwards is cheaper than updating it
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_customers_phone_key")
+    last_id, rekeyed = 0, 0
+    while True:
+        rows = conn.exec_driver_sql(
+            "SELECT id, phone_number, phone_key FROM customers WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, chunk_size)).fetchall()
+        if not rows:
+            break
+        updates = [(key, id) for id, phone_number, old_key in rows
+                   for key in [phone_key(phone_number)] if key != old_key]
+        if updates:
+            conn.exec_driver_sql("UPDATE customers SET phone_key = ? WHERE id = ?", updates)
+        rekeyed += len(updates)
+        last_id = rows[-1][0]
+    _create_indexes(conn, Customer.__table__, ['ix_customers_phone_key'])
+
+    shared = conn.exec_driver_sql(
+        "SELECT phone_key FROM customers WHERE phone_key IS NOT NULL GROUP BY phone_key HAVING count(*) > 1"
+    ).scalars().all()
+    merged = 0
+    for key in shared:
+        rows = conn.exec_driver_sql(
+            f"SELECT id, {', '.join(CUSTOMER_DETAILS)} FROM customers WHERE phone_key = ? ORDER BY id",
+            (key,)).fetchall()
+        keep, others = rows[0], [row[0] for row in rows[1:]]
+        details = {}
+        for index, column in enumerate(CUSTOMER_DETAILS, 1):
+            if keep[index] in (None, ''):
+                details[column] = next((row[index] for row in rows[1:] if row[index] not in (None, '')), None)
+        details = {column: value for column, value in details.items() if value is not None}
+        if details:
+            details['email_key'] = email_key(details.get('email', keep[CUSTOMER_DETAILS.index('email') + 1]))
+            conn.exec_driver_sql(
+                f"UPDATE customers SET {', '.join(f'{column} = ?' for column in details)} WHERE id = ?",
+                (*details.values(), keep[0]))
+        placeholders = ', '.join('?' * len(others))
+        conn.exec_driver_sql(f"UPDATE purchases SET customer_id = ? WHERE customer_id IN ({placeholders})",
+                             (keep[0], *others))
+        conn.exec_driver_sql(f"DELETE FROM customers WHERE id IN ({placeholders})", tuple(others))
+        merged += len(others)
+    logger.info(f"Re-keyed {rekeyed} phone numbers; merged {merged} customers into the ones sharing their number")
+
+
+# (version, description, function) in the order they must be applied
+MIGRATIONS = [
+    (1, "create tables", _create_tables),
+    (2, "customer full-text search index", create_search_index),
+    (3, "customer lookup and covering indexes", _add_customer_indexes),
+    (4, "daily and monthly sales summaries", _add_sales_summaries),
+    (5, "purchase fingerprints and imported file registry", _add_import_fingerprints),
+    (6, "customer list sort indexes", _add_sort_indexes),
+    (7, "purchase archive registry", _add_purchase_archive),
+    (8, "customers split from their purchases", _split_customers),
+    (9, "fuzzy customer name index", create_name_index),
+    (10, "canonical customer phone keys", _canonical_phone_keys),
+]
+
+
+def current_version(conn):
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def migrate(engine, target=None):
+    """Apply every pending migration up to `target` (default: the latest).
+
+    At the latest version, also restores the indexes a bulk load that was
+    killed left suspended (see bulk.py).
+    """
+    applied = []
+    for version, description, upgrade in MIGRATIONS:
+        if target is not None and version > target:
+            break
+        with engine.begin() as conn:
+            if current_version(conn) >= version:
+                continue
+            logger.info(f"Applying migration {version}: {description}")
+            upgrade(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {version}")
+        applied.append(version)
+
+    if applied:
+        # Refresh planner statistics for any new indexes
+        with engine.begin() as conn:
+            conn.exec_driver_sql("PRAGMA optimize")
+    with engine.begin() as conn:
+        if current_version(conn) == MIGRATIONS[-1][0]:
+            # A bulk load that was killed outright leaves its indexes suspended
+            restore_indexes(conn)
+    return applied
@@ -1,10 +1,12 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, create_engine
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Index, PrimaryKeyConstraint, ForeignKey
+from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import relationship, sessionmaker
 from datetime import datetime
+from src.database.config import create_configured_engine
 
-# Create the SQLAlchemy engine
-engine = create_engine('sqlite:///gold_purchases.db')
+# Create the SQLAlchemy engine (WAL, cache and mmap pragmas; see config.py)
+engine = create_configured_engine()
 
 # Create a session factory
 Session = sessionmaker(bind=engine)
@@ -13,7 +15,9 @@ Session = sessionmaker(bind=engine)
 Base = declarative_base()
 
 def init_db():
-    Base.metadata.create_all(engine)
+    # Imported here because the migrations build on these models
+    from src.database.migrations import migrate
+    migrate(engine)
     return Session()
 
 class User(Base):
@@ -34,6 +38,11 @@ class User(Base):
         return f"<User(id={self.id}, name='{self.first_name} {self.last_name}')>"
 
 class Customer(Base):
+    """A person who buys gold; their purchases are in the purchases table.
+
+    Purchases are matched to customers by phone number, then email (see
+    customers.py), through the normalized phone_key and email_key columns.
+    """
     __tablename__ = 'customers'
 
     id = Column(Integer, primary_key=True)
@@ -41,6 +50,30 @@ class Customer(Base):
     phone_number = Column(String(20))
     email = Column(String(100))
     address = Column(Text)
+    phone_key = Column(String(20))
+    email_key = Column(String(100))
+
+    purchases = relationship('Purchase', back_populates='customer', passive_deletes=True)
+
+    __table_args__ = (
+        Index('ix_customers_customer_name', 'customer_name'),
+        Index('ix_customers_phone_number', 'phone_number'),
+        Index('ix_customers_phone_key', 'phone_key'),
+        Index('ix_customers_email_key', 'email_key'),
+    )
+
+    def __repr__(self):
+        return f"<Customer(id={self.id}, name='{self.customer_name}', phone='{self.phone_number}')>"
+
+class Purchase(Base):
+    """One gold purchase. The customer's details are read through `customer`,
+    and also appear as attributes of the purchase, which is what the
+    customer list, forms and exports show.
+    """
+    __tablename__ = 'purchases'
+
+    id = Column(Integer, primary_key=True)
+    customer_id = Column(Integer, ForeignKey('customers.id'), nullable=False)
     state = Column(String(50))
     purchase_date = Column(DateTime, default=datetime.now)
     gold_type = Column(String(50))
@@ -53,6 +86,109 @@ class Customer(Base):
     final_amount = Column(Float)
     payment_mode = Column(String(50))
     notes = Column(Text)
+    row_hash = Column(String(32))  # see fingerprint.py
+
+    customer = relationship(Customer, back_populates='purchases', lazy='joined', innerjoin=True)
+    customer_name = association_proxy('customer', 'customer_name')
+    phone_number = association_proxy('customer', 'phone_number')
+    email = association_proxy('customer', 'email')
+    address = association_proxy('customer', 'address')
+
+    # Created for existing databases by the migrations in migrations.py.
+    # Every SQLite index also carries the rowid, so these double as keyset
+    # paging indexes for a list ordered by their leading column. The
+    # composite indexes also carry the amounts, so date-range totals by
+    # state or gold type, and a customer's lifetime totals, are answered
+    # from the index alone.
+    __table_args__ = (
+        Index('ix_purchases_customer_id', 'customer_id', 'purchase_date', 'gold_weight', 'final_amount'),
+        Index('ix_purchases_purchase_date', 'purchase_date'),
+        Index('ix_purchases_state_purchase_date', 'state', 'purchase_date',
+              'gold_weight', 'final_amount'),
+        Index('ix_purchases_gold_type_purchase_date', 'gold_type', 'purchase_date',
+              'gold_weight', 'final_amount'),
+        Index('ix_purchases_row_hash', 'row_hash'),
+        Index('ix_purchases_final_amount', 'final_amount'),
+    )
+
+    def __repr__(self):
+        return f"<Purchase(id={self.id}, customer_id={self.customer_id}, date={self.purchase_date})>"
+
+class ImportedFile(Base):
+    """A file whose import ran to completion, keyed by the SHA-256 of its bytes"""
+    __tablename__ = 'imported_files'
+
+    sha256 = Column(String(64), primary_key=True)
+    file_name = Column(Text)
+    imported_at = Column(DateTime, default=datetime.now)
+    rows_read = Column(Integer)
+    inserted = Column(Integer)
+
+    def __repr__(self):
+        return f"<ImportedFile(file='{self.file_name}', imported_at={self.imported_at})>"
+
+class ArchivedFile(Base):
+    """A Parquet file of archived purchases; see src/archive.
+
+    Only files listed here are part of the archive, and a file is listed in
+    the same transaction that deletes its rows from customers.
+    """
+    __tablename__ = 'archived_files'
+
+    path = Column(Text, primary_key=True)  # relative to the archive directory
+    month = Column(String(7), nullable=False)  # YYYY-MM partition
+    rows = Column(Integer, nullable=False)
+    first_date = Column(DateTime, nullable=False)
+    last_date = Column(DateTime, nullable=False)
+    size = Column(Integer)  # bytes
+    archived_at = Column(DateTime, default=datetime.now)
+
+    __table_args__ = (
+        Index('ix_archived_files_month', 'month'),
+    )
+
+    def __repr__(self):
+        return f"<ArchivedFile(path='{self.path}', rows={self.rows})>"
+
+class SalesSummaryColumns:
+    """Dimensions and running totals shared by the sales summary tables.
+
+    Rows are maintained by triggers on purchases (see summaries.py); missing
+    dimension values are stored as '' so they can be part of the key.
+    """
+
+    state = Column(String(50), nullable=False, default='')
+    gold_type = Column(String(50), nullable=False, default='')
+    gold_quality = Column(String(50), nullable=False, default='')
+    payment_mode = Column(String(50), nullable=False, default='')
+    grams = Column(Float, nullable=False, default=0)
+    total_amount = Column(Float, nullable=False, default=0)
+    discount_amount = Column(Float, nullable=False, default=0)
+    final_amount = Column(Float, nullable=False, default=0)
+    transactions = Column(Integer, nullable=False, default=0)
+
+class SalesDaily(SalesSummaryColumns, Base):
+    __tablename__ = 'sales_daily'
+
+    period = Column(String(10), nullable=False)  # YYYY-MM-DD
+
+    __table_args__ = (
+        PrimaryKeyConstraint('period', 'state', 'gold_type', 'gold_quality', 'payment_mode'),
+        {'sqlite_with_rowid': False},
+    )
+
+    def __repr__(self):
+        return f"<SalesDaily(period='{self.period}', state='{self.state}', final_amount={self.final_amount})>"
+
+class SalesMonthly(SalesSummaryColumns, Base):
+    __tablename__ = 'sales_monthly'
+
+    period = Column(String(7), nullable=False)  # YYYY-MM
+
+    __table_args__ = (
+        PrimaryKeyConstraint('period', 'state', 'gold_type', 'gold_quality', 'payment_mode'),
+        {'sqlite_with_rowid': False},
+    )
 
     def __repr__(self):
-        return f"<Customer(id={self.id}, name='{self.customer_name}', phone='{self.phone_number}')>" 
\ No newline at end of file
+        return f"<SalesMonthly(period='{self.period}', state='{self.state}', final_amount={self.final_amount})>"
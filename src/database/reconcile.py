@@ -0,0 +1,120 @@
+"""Batch reconciliation of stored purchase amounts.
+
+Recomputes total, discount and final amounts for every stored purchase with
+the vectorized pricing kernel and flags (or fixes) rows whose stored amounts
+disagree beyond a tolerance. Rows are read in id-ordered chunks through the
+raw driver cursor, so the whole table never has to fit in memory.
+
+Run it with `python -m src.database.reconcile [--fix] [--tolerance 0.01]`.
+"""
+import time
+import logging
+import numpy as np
+from src.database.models import engine as default_engine
+from src.pricing import AMOUNT_TOLERANCE, amounts_differ, calculate_amounts_array
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 200000
+
+_SELECT_CHUNK = ("SELECT id, gold_weight, price_per_gram, discount_percentage, "
+                 "total_amount, discount_amount, final_amount "
+                 "FROM purchases WHERE id > ? ORDER BY id LIMIT ?")
+_UPDATE_AMOUNTS = ("UPDATE purchases SET total_amount = ?, discount_amount = ?, final_amount = ? "
+                   "WHERE id = ?")
+
+
+class ReconcileResult:
+    """Counters for one reconciliation run"""
+
+    def __init__(self, tolerance, fix):
+        self.tolerance = tolerance
+        self.fix = fix
+        self.checked = 0
+        self.mismatched = 0
+        self.fixed = 0
+        self.mismatched_ids = []
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.checked / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self):
+        return (f"<ReconcileResult(checked={self.checked}, mismatched={self.mismatched}, "
+                f"fixed={self.fixed})>")
+
+
+def find_mismatches(rows, tolerance=AMOUNT_TOLERANCE):
+    """Compare one chunk of (id, weight, price, discount %, total, discount, final) rows.
+
+    Returns (ids, expected) for the rows whose stored amounts are missing or
+    off by more than `tolerance`; `expected` holds their recomputed
+    (total, discount, final) columns.
+    """
+    data = np.array(rows, dtype=np.float64).reshape(-1, 7)
+    expected = np.column_stack(calculate_amounts_array(data[:, 1], data[:, 2], data[:, 3]))
+    stored = data[:, 4:7]
+    mismatch = (np.isnan(stored) | amounts_differ(stored, expected, tolerance)).any(axis=1)
+    return data[mismatch, 0].astype(np.int64), expected[mismatch]
+
+
+def reconcile_amounts(engine=None, tolerance=AMOUNT_TOLERANCE, fix=False,
+                      chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Check every stored purchase against the pricing formula.
+
+    With `fix` the recomputed amounts are written back, one transaction per
+    chunk. `progress(result)` is called after every chunk.
+    """
+    engine = engine or default_engine
+    result = ReconcileResult(tolerance, fix)
+    started = time.perf_counter()
+    last_id = 0
+
+    while True:
+        with engine.begin() as conn:
+            # The raw cursor skips per-row Result processing, which dominates
+            # at millions of rows
+            cursor = conn.connection.driver_connection.execute(_SELECT_CHUNK, (last_id, chunk_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            ids, expected = find_mismatches(rows, tolerance)
+            if fix and len(ids):
+                conn.exec_driver_sql(
+                    _UPDATE_AMOUNTS,
+                    [(*amounts, purchase_id) for purchase_id, amounts in zip(ids.tolist(), expected.tolist())]
+                )
+                result.fixed += len(ids)
+
+        last_id = rows[-1][0]
+        result.checked += len(rows)
+        result.mismatched += len(ids)
+        result.mismatched_ids.extend(ids.tolist())
+        result.elapsed = time.perf_counter() - started
+        if progress is not None:
+            progress(result)
+
+    result.elapsed = time.perf_counter() - started
+    logger.info(f"Reconciled {result.checked} purchases in {result.elapsed:.1f}s. "
+                f"Mismatched: {result.mismatched}. Fixed: {result.fixed}")
+    return result
+
+
+if __name__ == '__main__':
+    import argparse
+    from src.database.models import init_db
+
+    parser = argparse.ArgumentParser(description="Recompute and check stored purchase amounts")
+    parser.add_argument('--fix', action='store_true', help="write the recomputed amounts back")
+    parser.add_argument('--tolerance', type=float, default=AMOUNT_TOLERANCE,
+                        help="largest accepted difference per amount (default: %(default)s)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_db().close()
+    outcome = reconcile_amounts(tolerance=args.tolerance, fix=args.fix)
+    if outcome.mismatched_ids:
+        shown = ', '.join(str(purchase_id) for purchase_id in outcome.mismatched_ids[:20])
+        more = ' ...' if outcome.mismatched > 20 else ''
+        print(f"Mismatched purchase ids: {shown}{more}")
@@ -0,0 +1,58 @@
+from datetime import date, datetime
+from sqlalchemy import func, select
+from src.database.models import SalesDaily, SalesMonthly, Session
+from src.database.summaries import DIMENSIONS, MEASURES
+
+# Reports read the incrementally maintained summary tables and never scan purchases
+# grain -> (summary model, period format, period key length)
+GRAINS = {
+    'day': (SalesDaily, '%Y-%m-%d', 10),
+    'month': (SalesMonthly, '%Y-%m', 7),
+}
+
+
+def _period_key(value, fmt, length):
+    if isinstance(value, (date, datetime)):
+        return value.strftime(fmt)
+    return str(value)[:length]
+
+
+def sales_summary(grain='day', start=None, end=None, group_by=('period',), filters=None, session=None):
+    """Sales totals from the summary tables.
+
+    grain:    'day' or 'month'
+    start/end: inclusive bounds (dates or 'YYYY-MM-DD' / 'YYYY-MM' strings)
+    group_by: any of 'period', 'state', 'gold_type', 'gold_quality', 'payment_mode';
+              empty for a single grand-total row
+    filters:  {dimension: value or list of values}
+
+    Returns a list of dicts with the group_by keys plus grams, total_amount,
+    discount_amount, final_amount and transactions.
+    """
+    if grain not in GRAINS:
+        raise ValueError(f"Unknown grain '{grain}', expected one of {', '.join(GRAINS)}")
+    model, fmt, length = GRAINS[grain]
+    for column in list(group_by) + list(filters or {}):
+        if column != 'period' and column not in DIMENSIONS:
+            raise ValueError(f"Cannot group or filter sales by '{column}'")
+
+    keys = [getattr(model, column) for column in group_by]
+    totals = [func.coalesce(func.sum(getattr(model, measure)), 0).label(measure) for measure in MEASURES]
+    query = select(*keys, *totals)
+    if start is not None:
+        query = query.where(model.period >= _period_key(start, fmt, length))
+    if end is not None:
+        query = query.where(model.period <= _period_key(end, fmt, length))
+    for column, value in (filters or {}).items():
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        query = query.where(getattr(model, column).in_([v or '' for v in values]))
+    if keys:
+        query = query.group_by(*keys).order_by(*keys)
+
+    own_session = session is None
+    session = session or Session()
+    try:
+        return [dict(row._mapping) for row in session.execute(query)]
+    finally:
+        if own_session:
+            session.close()
@@ -0,0 +1,373 @@
+import re
+import logging
+from sys import intern
+from sqlalchemy import func, select, tuple_
+from src.database.models import Customer, Purchase, Session
+from src.database.customers import CUSTOMER_DETAILS, email_key, find_customer, phone_key, resolve_customers
+from src.database.search import SIMILARITY_THRESHOLD, build_match_query, matching_ids_select, similar_customer_ids
+from src.database.fingerprint import HASH_COLUMNS, purchase_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Change events passed to repository listeners along with the purchase id
+INSERTED = 'inserted'
+UPDATED = 'updated'
+DELETED = 'deleted'
+
+# Columns the customer list can be ordered by. Each has an index, which also
+# carries the id, so ORDER BY column, id and the keyset seek after the last
+# row of a page are index range scans at any depth.
+SORT_COLUMNS = ['id', 'customer_name', 'phone_number', 'purchase_date', 'final_amount']
+_SORT_ATTRIBUTES = {'customer_name': Customer.customer_name, 'phone_number': Customer.phone_number}
+
+# What a list row holds: the columns the customer list and the history show,
+# and the customer's id. Not the notes, discounts or fingerprint; the full
+# purchase is loaded with get() when a form needs it.
+LIST_COLUMNS = ['id', 'customer_id'] + CUSTOMER_DETAILS + [
+    'state', 'purchase_date', 'gold_type', 'gold_quality', 'gold_weight', 'price_per_gram',
+    'total_amount', 'final_amount']
+_LIST_SELECT = [(Customer if name in CUSTOMER_DETAILS else Purchase).__table__.c[name] for name in LIST_COLUMNS]
+
+# A search that is a whole phone number, however it is written, also finds
+# the customer through the phone_key index
+_PHONE_SEARCH = re.compile(r'^\+?[\d\s().-]{10,}$')
+
+
+def _split(data):
+    """(customer details, purchase fields) of a flat customer list row"""
+    details = {key: value for key, value in data.items() if key in CUSTOMER_DETAILS}
+    return details, {key: value for key, value in data.items() if key not in CUSTOMER_DETAILS}
+
+
+def _set_details(customer, details):
+    for key, value in details.items():
+        setattr(customer, key, value)
+    customer.phone_key = phone_key(customer.phone_number)
+    customer.email_key = email_key(customer.email)
+
+
+def _fill_blanks(customer, details):
+    """Give `customer` the details it has none of; existing ones win"""
+    _set_details(customer, {key: value for key, value in details.items()
+                            if value not in (None, '') and getattr(customer, key) in (None, '')})
+
+
+def _set_fingerprint(purchase, data):
+    # From the details as entered, like the importer, not the customer's
+    purchase.row_hash = purchase_fingerprint([data.get(column, getattr(purchase, column))
+                                              for column in HASH_COLUMNS])
+
+
+class ListRow:
+    """One row of the customer list: a purchase with its customer's details.
+
+    Read straight from a Core select, so it costs a fraction of a Purchase
+    and Customer pair, in memory and in loading time. The state, gold type
+    and quality take a handful of values; rows share one copy of each.
+    """
+
+    __slots__ = LIST_COLUMNS
+
+    def __init__(self, id, customer_id, customer_name, phone_number, email, address, state, purchase_date,
+                 gold_type, gold_quality, gold_weight, price_per_gram, total_amount, final_amount):
+        self.id = id
+        self.customer_id = customer_id
+        self.customer_name = customer_name
+        self.phone_number = phone_number
+        self.email = email
+        self.address = address
+        self.state = state and intern(state)
+        self.purchase_date = purchase_date
+        self.gold_type = gold_type and intern(gold_type)
+        self.gold_quality = gold_quality and intern(gold_quality)
+        self.gold_weight = gold_weight
+        self.price_per_gram = price_per_gram
+        self.total_amount = total_amount
+        self.final_amount = final_amount
+
+    def __repr__(self):
+        return f"<ListRow(id={self.id}, customer_id={self.customer_id}, name='{self.customer_name}')>"
+
+
+class CustomerRepository:
+    """Data access for the customer list used by the UI.
+
+    Each row of the list is a purchase together with its customer's details,
+    read as a ListRow; row ids are purchase ids. Every write goes
+    through add/update/delete, which notify subscribed listeners with
+    (event, purchase_id) for each row that changed, so views can patch
+    those rows instead of reloading everything.
+    """
+
+    def __init__(self, session_factory=Session):
+        self.session_factory = session_factory
+        self._listeners = []
+
+    def subscribe(self, listener):
+        """Call `listener(event, purchase_id)` after every committed change.
+
+        One write can send many events: an update that changes customer
+        details sends UPDATED for every purchase of that customer.
+        """
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, event, purchase_id):
+        for listener in list(self._listeners):
+            try:
+                listener(event, purchase_id)
+            except Exception as e:
+                logger.error(f"Customer change listener failed: {str(e)}")
+
+    def _filtered(self, search):
+        query = select(*_LIST_SELECT).join_from(Purchase, Customer)
+        phone = phone_key(search) if search and _PHONE_SEARCH.match(search.strip()) else None
+        if phone:
+            # As one prefix, not "+91"'s digits matching half the numbers
+            customer_ids = matching_ids_select(build_match_query(re.sub(r'\D', '', search))).union(
+                select(Customer.id).where(Customer.phone_key == phone))
+            return query.where(Purchase.customer_id.in_(customer_ids))
+        match_query = build_match_query(search) if search else None
+        if match_query:
+            query = query.where(Purchase.customer_id.in_(matching_ids_select(match_query)))
+        return query
+
+    @staticmethod
+    def _list_rows(session, query):
+        return [ListRow(*row) for row in session.execute(query)]
+
+    def fetch_page(self, after_id=None, limit=200, search=None, sort_by='id', descending=False,
+                   after_value=None):
+        """Return up to `limit` ListRows ordered by `sort_by`, then id.
+
+        Paging is keyset based: pass the id and `sort_by` value of the last
+        row already shown as `after_id` and `after_value` (None for the
+        first page), never an offset, so a page deep into the list costs
+        the same as the first. NULL values sort first, or last when
+        `descending`, as in SQLite.
+
+        `search` is free text resolved through the full-text index, so only
+        matching rows are ever loaded.
+        """
+        if sort_by not in SORT_COLUMNS:
+            raise ValueError(f"Cannot sort customers by '{sort_by}'")
+        column = _SORT_ATTRIBUTES.get(sort_by) or getattr(Purchase, sort_by)
+        order = [column.desc(), Purchase.id.desc()] if descending else [column, Purchase.id]
+        session = self.session_factory()
+        try:
+            page = []
+            for seek in self._seek_segments(column, descending, after_id, after_value):
+                query = self._filtered(search)
+                if seek is not None:
+                    query = query.where(seek)
+                page.extend(self._list_rows(session, query.order_by(*order).limit(limit - len(page))))
+                if len(page) == limit:
+                    break
+            return page
+        finally:
+            session.close()
+
+    @staticmethod
+    def _seek_segments(column, descending, after_id, after_value):
+        """WHERE clauses for the rows after the keyset, in list order.
+
+        NULLs are paged separately from the other values because a single
+        predicate covering both would stop SQLite from seeking the index.
+        The row value comparison also gets a plain bound on the column, as
+        SQLite only seeks with a row value whose columns share one table.
+        """
+        key = Purchase.id
+        if column is key:
+            if after_id is None:
+                return [None]
+            return [key < after_id] if descending else [key > after_id]
+        nulls, values = column.is_(None), column.isnot(None)
+        if descending:
+            if after_id is None:
+                return [values, nulls]
+            if after_value is None:
+                return [nulls & (key < after_id)]
+            return [(column <= after_value) & (tuple_(column, key) < (after_value, after_id)), nulls]
+        if after_id is None:
+            return [nulls, values]
+        if after_value is None:
+            return [nulls & (key > after_id), values]
+        return [(column >= after_value) & (tuple_(column, key) > (after_value, after_id))]
+
+    def fetch_by_ids(self, ids, search=None):
+        """Return the ListRows among `ids` that match `search`"""
+        session = self.session_factory()
+        try:
+            query = self._filtered(search).where(Purchase.id.in_(ids)).order_by(Purchase.id)
+            return self._list_rows(session, query)
+        finally:
+            session.close()
+
+    def get(self, purchase_id):
+        """Return a detached purchase with its customer, or None if it no longer exists"""
+        session = self.session_factory()
+        try:
+            return session.get(Purchase, purchase_id)
+        finally:
+            session.close()
+
+    def customer_history(self, customer_id, limit=None):
+        """A customer's purchases as ListRows, newest first.
+
+        Served from the customer_id index; purchases moved to the archive
+        are not included.
+        """
+        session = self.session_factory()
+        try:
+            query = (select(*_LIST_SELECT).join_from(Purchase, Customer).where(Purchase.customer_id == customer_id)
+                     .order_by(Purchase.purchase_date.desc(), Purchase.id.desc()).limit(limit))
+            return self._list_rows(session, query)
+        finally:
+            session.close()
+
+    def customer_summary(self, customer_id):
+        """Lifetime totals of a customer: purchases, grams, final_amount, first and last purchase.
+
+        Read from the customer_id index alone.
+        """
+        session = self.session_factory()
+        try:
+            row = session.execute(
+                select(func.count(), func.sum(Purchase.gold_weight), func.sum(Purchase.final_amount),
+                       func.min(Purchase.purchase_date), func.max(Purchase.purchase_date))
+                .where(Purchase.customer_id == customer_id)
+            ).one()
+        finally:
+            session.close()
+        return dict(zip(['purchases', 'grams', 'final_amount', 'first_purchase', 'last_purchase'], row))
+
+    def find_by_phone(self, phone_number):
+        """The customer with this phone number, written in any form, or None.
+
+        A single seek of the phone_key index (see customers.phone_key).
+        """
+        key = phone_key(phone_number)
+        if key is None:
+            return None
+        session = self.session_factory()
+        try:
+            return session.query(Customer).filter(Customer.phone_key == key).order_by(Customer.id).first()
+        finally:
+            session.close()
+
+    def similar_customers(self, name, limit=10, threshold=SIMILARITY_THRESHOLD):
+        """Customers whose names best match a possibly misspelled `name`.
+
+        Returns detached (customer, similarity) pairs, best first; see
+        search.similar_customer_ids.
+        """
+        session = self.session_factory()
+        try:
+            matches = similar_customer_ids(session.connection(), name, limit, threshold)
+            customers = {customer.id: customer for customer in
+                         session.query(Customer).filter(Customer.id.in_([id for id, _ in matches]))}
+        finally:
+            session.close()
+        return [(customers[id], similarity) for id, similarity in matches if id in customers]
+
+    @staticmethod
+    def _write_connection(session):
+        # Resolving a customer reads before it writes; taking the write lock
+        # up front keeps another terminal from adding the same customer
+        return session.connection(execution_options={'immediate': True})
+
+    def add(self, customer_data):
+        """Add a purchase with its customer's details; returns the purchase id.
+
+        The purchase joins an existing customer with the same phone number
+        or email, whose missing details are filled in from `customer_data`.
+        """
+        details, fields = _split(customer_data)
+        session = self.session_factory()
+        try:
+            conn = self._write_connection(session)
+            customer_id = resolve_customers(conn, [tuple(details.get(key) for key in CUSTOMER_DETAILS)])[0]
+            customer = session.get(Customer, customer_id)
+            _fill_blanks(customer, details)
+            purchase = Purchase(customer=customer, **fields)
+            _set_fingerprint(purchase, customer_data)
+            session.add(purchase)
+            session.commit()
+            purchase_id = purchase.id
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+        self._notify(INSERTED, purchase_id)
+        return purchase_id
+
+    def update(self, purchase_id, customer_data):
+        """Apply `customer_data` to a purchase and its customer; returns False if it is gone.
+
+        Changed details are the customer's, so they show on all of the
+        customer's purchases; if the new phone number or email belongs to
+        another customer, the purchase moves to that customer instead.
+        """
+        details, fields = _split(customer_data)
+        changed = [purchase_id]
+        session = self.session_factory()
+        try:
+            conn = self._write_connection(session)
+            purchase = session.get(Purchase, purchase_id)
+            if not purchase:
+                return False
+            for key, value in fields.items():
+                setattr(purchase, key, value)
+            customer = purchase.customer
+            details = {key: value for key, value in details.items() if getattr(customer, key) != value}
+            if details:
+                merged = {key: details.get(key, getattr(customer, key)) for key in CUSTOMER_DETAILS}
+                found = find_customer(conn, merged['phone_number'], merged['email'])
+                if found is None or found == customer.id:
+                    _set_details(customer, details)
+                    changed += conn.execute(select(Purchase.id).where(
+                        Purchase.customer_id == customer.id, Purchase.id != purchase_id)).scalars().all()
+                else:
+                    purchase.customer = session.get(Customer, found)
+                    _fill_blanks(purchase.customer, merged)
+                    session.flush()
+                    self._delete_if_unused(session, customer)
+            _set_fingerprint(purchase, customer_data)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+        for changed_id in changed:
+            self._notify(UPDATED, changed_id)
+        return True
+
+    def delete(self, purchase_id):
+        """Delete a purchase, and its customer with its last purchase; returns False if it was already gone"""
+        session = self.session_factory()
+        try:
+            purchase = session.get(Purchase, purchase_id)
+            if not purchase:
+                return False
+            customer = purchase.customer
+            session.delete(purchase)
+            session.flush()
+            self._delete_if_unused(session, customer)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+        self._notify(DELETED, purchase_id)
+        return True
+
+    @staticmethod
+    def _delete_if_unused(session, customer):
+        if not session.execute(select(Purchase.id).where(Purchase.customer_id == customer.id).limit(1)).first():
+            session.delete(customer)
@@ -0,0 +1,328 @@
+import re
+import json
+import heapq
+import logging
+import unicodedata
+from contextlib import contextmanager
+from itertools import product
+from math import prod
+from sqlalchemy import bindparam, literal_column, select, table, text
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'customers_fts'
+
+# Fuzzy name matching: trigram similarity between a typed word and the words
+# of customer names, as pg_trgm computes it (shared / all distinct trigrams)
+SIMILARITY_THRESHOLD = 0.3
+MAX_WORD_MATCHES = 8   # most similar name words tried for each typed word
+MAX_COMBINATIONS = 64  # word combinations looked up for a multi-word name
+
+# External-content FTS5 index over the searchable customer columns; the
+# triggers keep it in step with every insert, update and delete on customers.
+# While a row exists in customers_fts_deferred the insert trigger is skipped
+# and the bulk importer indexes its rows in one statement (see bulk_indexing).
+FTS_STATEMENTS = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS customers_fts USING fts5(
+        customer_name, phone_number, email, address,
+        content='customers', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    "CREATE TABLE IF NOT EXISTS customers_fts_deferred (active INTEGER NOT NULL)",
+    "DROP TRIGGER IF EXISTS customers_fts_ai",
+    "DROP TRIGGER IF EXISTS customers_fts_ad",
+    "DROP TRIGGER IF EXISTS customers_fts_au",
+    """CREATE TRIGGER customers_fts_ai AFTER INSERT ON customers
+        WHEN NOT EXISTS (SELECT 1 FROM customers_fts_deferred) BEGIN
+        INSERT INTO customers_fts(rowid, customer_name, phone_number, email, address)
+        VALUES (new.id, new.customer_name, new.phone_number, new.email, new.address);
+    END""",
+    """CREATE TRIGGER customers_fts_ad AFTER DELETE ON customers BEGIN
+        INSERT INTO customers_fts(customers_fts, rowid, customer_name, phone_number, email, address)
+        VALUES ('delete', old.id, old.customer_name, old.phone_number, old.email, old.address);
+    END""",
+    """CREATE TRIGGER customers_fts_au
+        AFTER UPDATE OF customer_name, phone_number, email, address ON customers BEGIN
+        INSERT INTO customers_fts(customers_fts, rowid, customer_name, phone_number, email, address)
+        VALUES ('delete', old.id, old.customer_name, old.phone_number, old.email, old.address);
+        INSERT INTO customers_fts(rowid, customer_name, phone_number, email, address)
+        VALUES (new.id, new.customer_name, new.phone_number, new.email, new.address);
+    END""",
+]
+
+# Trigram index over the vocabulary of customer name words. Spelling variants
+# share most of their trigrams ("kashyap"/"kasyap" 5 of 10), and there are far
+# fewer distinct words than customers, so the index stays small and a lookup
+# only reads the postings of the typed word's trigrams. The words found are
+# then looked up in customers_fts. `customers` counts the customers whose name
+# has the word; a word and its trigrams go when the last of them does. The
+# triggers call the name_words() and name_trigrams() SQL functions, which
+# register_functions() adds to every connection of the application.
+def _add_name_statements(row):
+    return (f"""INSERT INTO customer_name_words (word, grams, customers)
+        SELECT value, json_array_length(name_trigrams(value)), 1
+        FROM json_each(name_words({row}.customer_name)) WHERE true
+        ON CONFLICT (word) DO UPDATE SET customers = customers + 1;
+        INSERT OR IGNORE INTO customer_name_trigrams (trigram, word)
+        SELECT t.value, w.value FROM json_each(name_words({row}.customer_name)) w
+        JOIN customer_name_words n ON n.word = w.value AND n.customers = 1, json_each(name_trigrams(w.value)) t;""")
+
+
+def _remove_name_statements(row):
+    return (f"""UPDATE customer_name_words SET customers = customers - 1
+        WHERE word IN (SELECT value FROM json_each(name_words({row}.customer_name)));
+        DELETE FROM customer_name_trigrams WHERE (trigram, word) IN (
+            SELECT t.value, w.value FROM json_each(name_words({row}.customer_name)) w
+            JOIN customer_name_words n ON n.word = w.value AND n.customers <= 0, json_each(name_trigrams(w.value)) t);
+        DELETE FROM customer_name_words WHERE customers <= 0
+        AND word IN (SELECT value FROM json_each(name_words({row}.customer_name)));""")
+
+
+NAME_INDEX_STATEMENTS = [
+    """CREATE TABLE IF NOT EXISTS customer_name_words (
+        word TEXT PRIMARY KEY, grams INTEGER NOT NULL, customers INTEGER NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS customer_name_trigrams (
+        trigram TEXT NOT NULL, word TEXT NOT NULL, PRIMARY KEY (trigram, word)
+    ) WITHOUT ROWID""",
+    "CREATE TABLE IF NOT EXISTS customers_fts_deferred (active INTEGER NOT NULL)",
+    "DROP TRIGGER IF EXISTS customer_names_ai",
+    "DROP TRIGGER IF EXISTS customer_names_ad",
+    "DROP TRIGGER IF EXISTS customer_names_au",
+    f"""CREATE TRIGGER customer_names_ai AFTER INSERT ON customers
+        WHEN NOT EXISTS (SELECT 1 FROM customers_fts_deferred) BEGIN
+        {_add_name_statements('new')}
+    END""",
+    f"""CREATE TRIGGER customer_names_ad AFTER DELETE ON customers BEGIN
+        {_remove_name_statements('old')}
+    END""",
+    f"""CREATE TRIGGER customer_names_au AFTER UPDATE OF customer_name ON customers BEGIN
+        {_remove_name_statements('old')}
+        {_add_name_statements('new')}
+    END""",
+]
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+# Words as the FTS unicode61 tokenizer sees them: letters and digits
+_WORD_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+
+def create_search_index(conn):
+    """Create the FTS index and its triggers, populating it if it is new"""
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': FTS_TABLE}
+    ).first()
+    for statement in FTS_STATEMENTS:
+        conn.exec_driver_sql(statement)
+    if not exists:
+        logger.info("Building customer search index...")
+        rebuild_search_index(conn)
+
+
+def rebuild_search_index(conn):
+    """Repopulate the FTS index from the customers table"""
+    conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def normalize_name(name):
+    """Lower-case `name` and strip accents from Latin letters, as the FTS index does"""
+    chars = []
+    for char in unicodedata.normalize('NFD', str(name).lower()):
+        if unicodedata.combining(char) and chars and chars[-1] < '\u0250':
+            continue
+        chars.append(char)
+    return unicodedata.normalize('NFC', ''.join(chars))
+
+
+def name_words(name):
+    """The distinct words of a normalized name, in order"""
+    if name is None:
+        return []
+    return list(dict.fromkeys(_WORD_RE.findall(normalize_name(name))))
+
+
+def name_trigrams(word):
+    """Distinct trigrams of a word padded like pg_trgm does: '  word '"""
+    padded = f"  {word} "
+    return list(dict.fromkeys(padded[i:i + 3] for i in range(len(padded) - 2)))
+
+
+def register_functions(dbapi_connection):
+    """Add the SQL functions the name index triggers call to a SQLite connection"""
+    dbapi_connection.create_function(
+        'name_words', 1, lambda name: json.dumps(name_words(name)), deterministic=True)
+    dbapi_connection.create_function(
+        'name_trigrams', 1, lambda word: json.dumps(name_trigrams(word)), deterministic=True)
+
+
+def _index_names(conn, where="", params=()):
+    # Counts the words of the selected customers, then indexes the words that
+    # are new: every word has the trigram of the padding and its first letter.
+    # Names repeat, so each distinct one is split into words once.
+    conn.exec_driver_sql(
+        "INSERT INTO customer_name_words (word, grams, customers) "
+        "SELECT w.value, json_array_length(name_trigrams(w.value)), sum(c.customers) "
+        f"FROM (SELECT customer_name, count(*) AS customers FROM customers c {where} GROUP BY customer_name) c, "
+        "json_each(name_words(c.customer_name)) w GROUP BY w.value "
+        "ON CONFLICT (word) DO UPDATE SET customers = customers + excluded.customers",
+        params
+    )
+    conn.exec_driver_sql(
+        "INSERT INTO customer_name_trigrams (trigram, word) "
+        "SELECT t.value, n.word FROM customer_name_words n, json_each(name_trigrams(n.word)) t "
+        "WHERE NOT EXISTS (SELECT 1 FROM customer_name_trigrams e "
+        "                  WHERE e.trigram = '  ' || substr(n.word, 1, 1) AND e.word = n.word)"
+    )
+
+
+def create_name_index(conn):
+    """Create the fuzzy name index and its triggers, populating it if it is new"""
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'customer_name_words'")
+    ).first()
+    for statement in NAME_INDEX_STATEMENTS:
+        conn.exec_driver_sql(statement)
+    if not exists:
+        logger.info("Building customer name index...")
+        rebuild_name_index(conn)
+
+
+def rebuild_name_index(conn):
+    """Repopulate the fuzzy name index from the customers table"""
+    conn.exec_driver_sql("DELETE FROM customer_name_trigrams")
+    conn.exec_driver_sql("DELETE FROM customer_name_words")
+    _index_names(conn)
+
+
+def name_index_suspended(conn):
+    return conn.exec_driver_sql(
+        "SELECT NOT EXISTS (SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'customer_names_ai')"
+    ).scalar()
+
+
+def suspend_name_index(conn):
+    """Stop maintaining the fuzzy name index until resume_name_index().
+
+    For bulk loads: rebuilding the index once from the distinct names is
+    much cheaper than keeping it up chunk by chunk.
+    """
+    for trigger in ['customer_names_ai', 'customer_names_ad', 'customer_names_au']:
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+
+
+def resume_name_index(conn):
+    """Reinstall the name index triggers and rebuild it, if it was suspended.
+
+    Returns whether it was.
+    """
+    if not name_index_suspended(conn):
+        return False
+    logger.info("Rebuilding customer name index...")
+    for statement in NAME_INDEX_STATEMENTS:
+        conn.exec_driver_sql(statement)
+    rebuild_name_index(conn)
+    return True
+
+
+@contextmanager
+def bulk_indexing(conn):
+    """Index the rows inserted inside the block with a single statement.
+
+    Per-row trigger maintenance of FTS5 is roughly ten times slower than one
+    INSERT ... SELECT over the new rows; the name index is filled the same
+    way, unless it is suspended. Must be used inside a transaction, so the
+    deferral is never visible to other connections.
+    """
+    last_id = conn.exec_driver_sql("SELECT coalesce(max(id), 0) FROM customers").scalar()
+    conn.exec_driver_sql("INSERT INTO customers_fts_deferred (active) VALUES (1)")
+    yield
+    conn.exec_driver_sql("DELETE FROM customers_fts_deferred")
+    conn.exec_driver_sql(
+        f"INSERT INTO {FTS_TABLE}(rowid, customer_name, phone_number, email, address) "
+        "SELECT id, customer_name, phone_number, email, address FROM customers WHERE id > ?",
+        (last_id,)
+    )
+    if not name_index_suspended(conn):
+        _index_names(conn, "WHERE c.id > ?", (last_id,))
+
+
+def build_match_query(search_text):
+    """Turn free text into an FTS5 query where every word is a prefix match.
+
+    Returns None when the text contains nothing searchable.
+    """
+    tokens = _TOKEN_RE.findall(search_text.lower())
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def matching_ids_select(match_query):
+    """SELECT of the customer ids matching an FTS5 query"""
+    return (
+        select(literal_column('rowid'))
+        .select_from(table(FTS_TABLE))
+        .where(literal_column(FTS_TABLE).op('MATCH')(bindparam('match', match_query)))
+    )
+
+
+def search_customer_ids(session, search_text, limit=None):
+    """Return the ids of customers whose name, phone, email or address match"""
+    match_query = build_match_query(search_text)
+    if match_query is None:
+        return []
+    query = matching_ids_select(match_query)
+    if limit is not None:
+        query = query.limit(limit)
+    return [row[0] for row in session.execute(query)]
+
+
+def similar_words(conn, word, threshold=SIMILARITY_THRESHOLD, limit=MAX_WORD_MATCHES):
+    """(name word, similarity) pairs for a normalized word, most similar first"""
+    trigrams = name_trigrams(word)
+    # A word sharing `shared` of the typed word's trigrams and having `grams`
+    # in all is shared / (typed + grams - shared) similar
+    return conn.exec_driver_sql(
+        "SELECT word, similarity FROM ("
+        "  SELECT t.word, count(*) * 1.0 / (? + n.grams - count(*)) AS similarity"
+        "  FROM customer_name_trigrams t JOIN customer_name_words n ON n.word = t.word"
+        "  WHERE t.trigram IN (SELECT value FROM json_each(?)) GROUP BY t.word"
+        ") WHERE similarity >= ? ORDER BY similarity DESC, word LIMIT ?",
+        (len(trigrams), json.dumps(trigrams), threshold, limit)
+    ).fetchall()
+
+
+def similar_customer_ids(conn, name, limit=10, threshold=SIMILARITY_THRESHOLD):
+    """Ids of the customers whose names best match a possibly misspelled `name`.
+
+    Returns (customer id, similarity) pairs, best first. Every word of `name`
+    has to be at least `threshold` similar to a word of the customer's name;
+    a customer's similarity is the average over the words of `name`, so
+    other words in the customer's name (a middle name) do not count against
+    it.
+    """
+    words = name_words(name)
+    if not words:
+        return []
+    matches = [similar_words(conn, word, threshold) for word in words]
+    if not all(matches):
+        return []
+    # Long names: drop the weakest alternatives until the combinations are few enough to rank
+    while prod(len(alternatives) for alternatives in matches) > MAX_COMBINATIONS * MAX_WORD_MATCHES:
+        max(matches, key=len).pop()
+    # Word combinations best first; each is an FTS lookup of up to `limit` customers
+    combinations = heapq.nsmallest(
+        MAX_COMBINATIONS, product(*matches),
+        key=lambda combination: -sum(similarity for _, similarity in combination))
+    found = {}
+    for combination in combinations:
+        similarity = sum(similarity for _, similarity in combination) / len(words)
+        match_query = 'customer_name : (' + ' AND '.join(f'"{word}"' for word, _ in combination) + ')'
+        for (customer_id,) in conn.exec_driver_sql(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ? ORDER BY rowid LIMIT ?",
+                (match_query, limit + len(found))):
+            found.setdefault(customer_id, similarity)
+        if len(found) >= limit:
+            break
+    return sorted(found.items(), key=lambda item: (-item[1], item[0]))[:limit]
@@ -0,0 +1,165 @@
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# summary table -> SQL expression turning a purchase_date into its period key
+SUMMARY_PERIODS = {
+    'sales_daily': "coalesce(date({row}.purchase_date), '')",
+    'sales_monthly': "coalesce(strftime('%Y-%m', {row}.purchase_date), '')",
+}
+
+DIMENSIONS = ['state', 'gold_type', 'gold_quality', 'payment_mode']
+MEASURES = ['grams', 'total_amount', 'discount_amount', 'final_amount', 'transactions']
+
+# Source expression on a purchases row for each summary measure
+_MEASURE_SOURCES = {
+    'grams': "coalesce({row}.gold_weight, 0)",
+    'total_amount': "coalesce({row}.total_amount, 0)",
+    'discount_amount': "coalesce({row}.discount_amount, 0)",
+    'final_amount': "coalesce({row}.final_amount, 0)",
+    'transactions': "1",
+}
+
+# Columns whose change moves a purchase between summary rows or totals
+_TRACKED_COLUMNS = ['purchase_date'] + DIMENSIONS + ['gold_weight', 'total_amount',
+                                                      'discount_amount', 'final_amount']
+
+
+def _key_values(table, row):
+    return [SUMMARY_PERIODS[table].format(row=row)] + \
+        [f"coalesce({row}.{dimension}, '')" for dimension in DIMENSIONS]
+
+
+def _add_statement(table, row):
+    key = ['period'] + DIMENSIONS
+    values = _key_values(table, row) + [_MEASURE_SOURCES[m].format(row=row) for m in MEASURES]
+    updates = ', '.join(f"{m} = {m} + excluded.{m}" for m in MEASURES)
+    return (f"INSERT INTO {table} ({', '.join(key + MEASURES)}) VALUES ({', '.join(values)}) "
+            f"ON CONFLICT ({', '.join(key)}) DO UPDATE SET {updates};")
+
+
+def _subtract_statements(table, row):
+    condition = ' AND '.join(
+        f"{column} = {value}" for column, value in zip(['period'] + DIMENSIONS, _key_values(table, row))
+    )
+    updates = ', '.join(f"{m} = {m} - {_MEASURE_SOURCES[m].format(row=row)}" for m in MEASURES)
+    return (f"UPDATE {table} SET {updates} WHERE {condition};\n"
+            f"        DELETE FROM {table} WHERE {condition} AND transactions <= 0;")
+
+
+def _aggregate_select(table, where=None, source='purchases'):
+    key_values = _key_values(table, source)
+    sums = [f"sum({_MEASURE_SOURCES[m].format(row=source)})" for m in MEASURES]
+    return (f"SELECT {', '.join(key_values + sums)} FROM {source} "
+            f"{'WHERE ' + where if where else ''} "
+            f"GROUP BY {', '.join(str(i) for i in range(1, len(key_values) + 1))}")
+
+
+def summary_statements(source='purchases'):
+    """DDL for the triggers that keep every summary table up to date.
+
+    `source` is the table holding the purchases: customers, before
+    migration 8 split them apart.
+
+    While a row exists in sales_summary_deferred the insert and delete
+    triggers are skipped: the bulk importer aggregates its rows itself (see
+    bulk_summaries), and archived purchases keep counting (see
+    keep_summaries).
+    """
+    insert_body = '\n        '.join(_add_statement(table, 'new') for table in SUMMARY_PERIODS)
+    delete_body = '\n        '.join(_subtract_statements(table, 'old') for table in SUMMARY_PERIODS)
+    return [
+        "CREATE TABLE IF NOT EXISTS sales_summary_deferred (active INTEGER NOT NULL)",
+        "DROP TRIGGER IF EXISTS sales_summary_ai",
+        "DROP TRIGGER IF EXISTS sales_summary_ad",
+        "DROP TRIGGER IF EXISTS sales_summary_au",
+        f"""CREATE TRIGGER sales_summary_ai AFTER INSERT ON {source}
+        WHEN NOT EXISTS (SELECT 1 FROM sales_summary_deferred) BEGIN
+        {insert_body}
+    END""",
+        f"""CREATE TRIGGER sales_summary_ad AFTER DELETE ON {source}
+        WHEN NOT EXISTS (SELECT 1 FROM sales_summary_deferred) BEGIN
+        {delete_body}
+    END""",
+        f"""CREATE TRIGGER sales_summary_au AFTER UPDATE OF {', '.join(_TRACKED_COLUMNS)} ON {source} BEGIN
+        {delete_body}
+        {insert_body}
+    END""",
+    ]
+
+
+def create_summary_triggers(conn, source='purchases'):
+    """Install the maintenance triggers and fill the summaries from scratch"""
+    for statement in summary_statements(source):
+        conn.exec_driver_sql(statement)
+    rebuild_summaries(conn, source)
+
+
+def rebuild_summaries(conn, source='purchases'):
+    """Recompute every summary table from the purchases table (`source`)"""
+    for table in SUMMARY_PERIODS:
+        logger.info(f"Rebuilding {table}...")
+        conn.exec_driver_sql(f"DELETE FROM {table}")
+        conn.exec_driver_sql(
+            f"INSERT INTO {table} (period, {', '.join(DIMENSIONS)}, {', '.join(MEASURES)}) "
+            + _aggregate_select(table, source=source)
+        )
+
+
+@contextmanager
+def bulk_summaries(conn):
+    """Fold the rows inserted inside the block into the summaries at once.
+
+    One grouped upsert per chunk replaces a per-row trigger upsert into each
+    summary table. Must be used inside a transaction, so the deferral is
+    never visible to other connections.
+    """
+    last_id = conn.exec_driver_sql("SELECT coalesce(max(id), 0) FROM purchases").scalar()
+    conn.exec_driver_sql("INSERT INTO sales_summary_deferred (active) VALUES (1)")
+    yield
+    conn.exec_driver_sql("DELETE FROM sales_summary_deferred")
+    key = ', '.join(['period'] + DIMENSIONS)
+    updates = ', '.join(f"{m} = {m} + excluded.{m}" for m in MEASURES)
+    for table in SUMMARY_PERIODS:
+        conn.exec_driver_sql(
+            f"INSERT INTO {table} ({key}, {', '.join(MEASURES)}) "
+            + _aggregate_select(table, "id > ?")
+            + f" ON CONFLICT ({key}) DO UPDATE SET {updates}",
+            (last_id,)
+        )
+
+
+@contextmanager
+def keep_summaries(conn):
+    """Delete purchases inside the block without taking them out of the summaries.
+
+    Used when purchases move to the archive: they still count in every sales
+    total. Must be used inside a transaction, like bulk_summaries.
+    """
+    conn.exec_driver_sql("INSERT INTO sales_summary_deferred (active) VALUES (1)")
+    yield
+    conn.exec_driver_sql("DELETE FROM sales_summary_deferred")
+
+
+def add_to_summaries(conn, table, rows):
+    """Add (period, *DIMENSIONS, *MEASURES) tuples to a summary table's totals"""
+    key = ', '.join(['period'] + DIMENSIONS)
+    updates = ', '.join(f"{m} = {m} + excluded.{m}" for m in MEASURES)
+    placeholders = ', '.join('?' * (1 + len(DIMENSIONS) + len(MEASURES)))
+    conn.exec_driver_sql(
+        f"INSERT INTO {table} ({key}, {', '.join(MEASURES)}) VALUES ({placeholders}) "
+        f"ON CONFLICT ({key}) DO UPDATE SET {updates}",
+        [tuple(row) for row in rows]
+    )
+
+
+if __name__ == '__main__':
+    # python -m src.database.summaries: rebuild the summaries from scratch
+    from src.archive.query import add_archive_to_summaries
+    from src.database.models import engine, init_db
+    logging.basicConfig(level=logging.INFO)
+    init_db().close()
+    with engine.begin() as conn:
+        rebuild_summaries(conn)
+        add_archive_to_summaries(conn)
@@ -0,0 +1,305 @@
+"""Opt-in performance instrumentation.
+
+Collects latency histograms for SQL statements and for the UI operations
+that matter (loading, scrolling, sorting, searching, painting, imports),
+how much of each operation was spent in SQL, how many rows the ORM
+hydrated, and a log of slow statements with their EXPLAIN QUERY PLAN.
+
+Off by default. While off, no SQLAlchemy listeners are attached and a timed
+call costs a single attribute check. Turn it on with GOLD_DIAGNOSTICS=1,
+`run.py --diagnostics` or the checkbox in the diagnostics dialog
+(Ctrl+Shift+D), which also exports everything as JSON.
+"""
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import logging
+import threading
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+from functools import wraps
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram buckets, in milliseconds; the last
+# bucket takes everything slower
+BUCKET_BOUNDS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+DEFAULT_SLOW_QUERY_MS = 100
+SLOW_QUERIES_KEPT = 100
+STATEMENTS_KEPT = 1000  # distinct statements tracked; later ones share one entry
+SQL_TEXT_LIMIT = 2000
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_PLACEHOLDERS_RE = re.compile(r'\?(?:\s*,\s*\?)+')  # IN (?, ?, ...) of any length
+
+
+def _normalized(statement):
+    return _PLACEHOLDERS_RE.sub('?, ...', _WHITESPACE_RE.sub(' ', statement).strip())[:SQL_TEXT_LIMIT]
+
+
+class Histogram:
+    """Counts of latencies per bucket, plus count, total and maximum"""
+
+    __slots__ = ('counts', 'count', 'total_ms', 'max_ms')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms):
+        self.counts[bisect_left(BUCKET_BOUNDS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    @property
+    def mean_ms(self):
+        return self.total_ms / self.count if self.count else 0.0
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of samples"""
+        wanted = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKET_BOUNDS_MS + [self.max_ms], self.counts):
+            seen += count
+            if count and seen >= wanted:
+                return min(bound, self.max_ms)
+        return 0.0
+
+    def to_dict(self):
+        return {
+            'count': self.count, 'total_ms': self.total_ms, 'mean_ms': self.mean_ms,
+            'p50_ms': self.percentile(0.5), 'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99), 'max_ms': self.max_ms,
+            'buckets': {f"<={bound}" if i < len(BUCKET_BOUNDS_MS) else f">{BUCKET_BOUNDS_MS[-1]}": count
+                        for i, (bound, count) in enumerate(zip(BUCKET_BOUNDS_MS + [None], self.counts))
+                        if count},
+        }
+
+
+class TimerStats:
+    """One timed operation: its latencies, the SQL time inside it and the rows it touched"""
+
+    __slots__ = ('histogram', 'sql_ms', 'statements', 'rows')
+
+    def __init__(self):
+        self.histogram = Histogram()
+        self.sql_ms = 0.0
+        self.statements = 0
+        self.rows = 0
+
+    def to_dict(self):
+        data = self.histogram.to_dict()
+        data.update(sql_ms=self.sql_ms, statements=self.statements, rows=self.rows,
+                    sql_share=self.sql_ms / self.histogram.total_ms if self.histogram.total_ms else 0.0)
+        return data
+
+
+class StatementStats:
+    __slots__ = ('histogram', 'rows')
+
+    def __init__(self):
+        self.histogram = Histogram()
+        self.rows = 0  # rows changed; SQLite reports no count for SELECT
+
+
+class _NullTimer:
+    """What timer() returns while diagnostics are off"""
+
+    __slots__ = ()
+    rows = property(lambda self: 0, lambda self, value: None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('diagnostics', 'name', 'rows', 'started', 'counters')
+
+    def __init__(self, diagnostics, name):
+        self.diagnostics = diagnostics
+        self.name = name
+        self.rows = None  # None: count the ORM rows hydrated inside the block
+
+    def __enter__(self):
+        self.counters = self.diagnostics._thread_counters()
+        self.started = (time.perf_counter(), self.counters[0], self.counters[1], self.counters[2])
+        return self
+
+    def __exit__(self, *exc):
+        started, sql_ms, statements, hydrated = self.started
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        rows = self.counters[2] - hydrated if self.rows is None else self.rows
+        self.diagnostics._record_timer(self.name, elapsed_ms, self.counters[0] - sql_ms,
+                                       self.counters[1] - statements, rows)
+        return False
+
+
+class Diagnostics:
+    """Process-wide collector; use the module's `diagnostics` instance"""
+
+    def __init__(self):
+        self.enabled = False
+        self.slow_query_ms = float(os.environ.get('GOLD_SLOW_QUERY_MS', DEFAULT_SLOW_QUERY_MS))
+        self._engine = None
+        self._base = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = datetime.now()
+            self.timers = {}
+            self.statements = {}
+            self.slow_queries = deque(maxlen=SLOW_QUERIES_KEPT)
+
+    def enable(self, engine=None, base=None):
+        """Start collecting; SQL is timed on `engine`, ORM rows on `base`'s models"""
+        if self.enabled:
+            return
+        if engine is None or base is None:
+            from src.database.models import Base, engine as default_engine
+            engine, base = engine or default_engine, base or Base
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        event.listen(base, 'load', self._on_load, propagate=True)
+        self._engine, self._base = engine, base
+        self.enabled = True
+        logger.info("Diagnostics enabled")
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        event.remove(self._engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.remove(self._engine, 'after_cursor_execute', self._after_cursor_execute)
+        event.remove(self._base, 'load', self._on_load)
+        logger.info("Diagnostics disabled")
+
+    def timer(self, name):
+        """Context manager timing a block as operation `name`.
+
+        Set `.rows` on the returned timer to record a row count other than
+        the ORM rows hydrated inside the block.
+        """
+        return _Timer(self, name) if self.enabled else _NULL_TIMER
+
+    def timed(self, name):
+        """Decorator timing every call of a function as operation `name`"""
+        def decorate(function):
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with _Timer(self, name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def _thread_counters(self):
+        # [sql ms, statements, ORM rows hydrated] for the current thread
+        counters = getattr(self._local, 'counters', None)
+        if counters is None:
+            counters = self._local.counters = [0.0, 0, 0]
+        return counters
+
+    def _record_timer(self, name, elapsed_ms, sql_ms, statements, rows):
+        with self._lock:
+            stats = self.timers.get(name)
+            if stats is None:
+                stats = self.timers[name] = TimerStats()
+            stats.histogram.add(elapsed_ms)
+            stats.sql_ms += sql_ms
+            stats.statements += statements
+            stats.rows += rows
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # Statements on one connection never overlap, so one start time is enough
+        conn.info['diagnostics_started'] = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info['diagnostics_started']) * 1000
+        counters = self._thread_counters()
+        counters[0] += elapsed_ms
+        counters[1] += 1
+        rows = max(cursor.rowcount, 0)
+        key = _normalized(statement)
+        with self._lock:
+            stats = self.statements.get(key)
+            if stats is None:
+                if len(self.statements) >= STATEMENTS_KEPT:
+                    key = '(other statements)'
+                stats = self.statements.setdefault(key, StatementStats())
+            stats.histogram.add(elapsed_ms)
+            stats.rows += rows
+        if elapsed_ms >= self.slow_query_ms:
+            self._log_slow_query(conn, statement, parameters, executemany, elapsed_ms, rows)
+
+    def _on_load(self, target, context):
+        self._thread_counters()[2] += 1
+
+    def _log_slow_query(self, conn, statement, parameters, executemany, elapsed_ms, rows):
+        if executemany:
+            parameters = parameters[0] if parameters else ()
+        try:
+            # A separate cursor, so the slow statement's own results are untouched
+            plan = [row[-1] for row in conn.connection.driver_connection.execute(
+                f"EXPLAIN QUERY PLAN {statement}", parameters)]
+        except Exception as e:
+            plan = [f"(no plan: {str(e)})"]
+        logger.warning(f"Slow query ({elapsed_ms:.0f} ms): {_normalized(statement)[:200]}")
+        with self._lock:
+            self.slow_queries.append({
+                'at': datetime.now().isoformat(timespec='seconds'),
+                'elapsed_ms': elapsed_ms,
+                'rows': rows,
+                'executemany': executemany,
+                'statement': _normalized(statement),
+                'parameters': repr(parameters)[:SQL_TEXT_LIMIT],
+                'plan': plan,
+            })
+
+    def snapshot(self):
+        """Everything collected so far as plain data (see save())"""
+        with self._lock:
+            timers = {name: stats.to_dict() for name, stats in sorted(self.timers.items())}
+            statements = sorted(
+                ({'statement': key, 'rows': stats.rows, **stats.histogram.to_dict()}
+                 for key, stats in self.statements.items()),
+                key=lambda entry: entry['total_ms'], reverse=True)
+            slow_queries = list(self.slow_queries)
+        return {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'collecting_since': self.started_at.isoformat(timespec='seconds'),
+            'enabled': self.enabled,
+            'slow_query_ms': self.slow_query_ms,
+            'environment': {
+                'python': sys.version.split()[0],
+                'sqlite': sqlite3.sqlite_version,
+                'database': self._engine.url.render_as_string(hide_password=True) if self._engine else None,
+            },
+            'timers': timers,
+            'statements': statements,
+            'slow_queries': slow_queries,
+        }
+
+    def save(self, file_name):
+        with open(file_name, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+
+diagnostics = Diagnostics()
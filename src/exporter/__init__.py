@@ -0,0 +1 @@
+"""Streaming export of customer purchases to CSV, Excel and Parquet files""" 
\ No newline at end of file
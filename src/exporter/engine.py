@@ -0,0 +1,152 @@
+import os
+import time
+import logging
+from itertools import chain
+from datetime import date, datetime, timedelta
+from sqlalchemy import String, func, select, type_coerce
+from src.archive.query import archived_rows, count_archived
+from src.database.customers import CUSTOMER_DETAILS
+from src.database.models import Customer, Purchase, engine as default_engine
+from src.exporter.writers import EXPORT_COLUMNS, XLSX_MAX_ROWS, ExportError, open_writer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 10000
+
+
+class ExportResult:
+    """Counters for a single export"""
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.total = 0
+        self.written = 0
+        self.elapsed = 0.0
+        self.cancelled = False
+
+    @property
+    def rows_per_second(self):
+        return self.written / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self):
+        return f"<ExportResult(file='{self.file_name}', written={self.written} of {self.total})>"
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+
+def _day_start(value):
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        value = value.date()
+    return datetime.combine(value, datetime.min.time())
+
+
+def _date_range(start=None, end=None):
+    """[from, before) datetimes for inclusive `start` and `end` days"""
+    return (None if start is None else _day_start(start),
+            None if end is None else _day_start(end) + timedelta(days=1))
+
+
+def export_filters(start=None, end=None, states=None, gold_types=None):
+    """WHERE clauses for the export filters; `start` and `end` are inclusive days"""
+    clauses = []
+    start, before = _date_range(start, end)
+    if start is not None:
+        clauses.append(Purchase.purchase_date >= start)
+    if before is not None:
+        clauses.append(Purchase.purchase_date < before)
+    if _as_list(states):
+        clauses.append(Purchase.state.in_(_as_list(states)))
+    if _as_list(gold_types):
+        clauses.append(Purchase.gold_type.in_(_as_list(gold_types)))
+    return clauses
+
+
+def export_query(filters):
+    """The rows to export, in EXPORT_COLUMNS order, oldest purchase first.
+
+    purchase_date comes back as its stored text, cut to whole seconds, so
+    no row has to be turned into datetime objects on the way out.
+    """
+    columns = []
+    for name in EXPORT_COLUMNS:
+        column = (Customer if name in CUSTOMER_DETAILS else Purchase).__table__.c[name]
+        if name == 'purchase_date':
+            column = type_coerce(func.substr(column, 1, 19), String).label(name)
+        columns.append(column)
+    return (select(*columns).join_from(Purchase, Customer).where(*filters)
+            .order_by(Purchase.purchase_date, Purchase.id))
+
+
+def _remove(file_name):
+    if os.path.exists(file_name):
+        os.remove(file_name)
+
+
+def count_rows(conn, filters):
+    return conn.execute(select(func.count()).select_from(Purchase).where(*filters)).scalar()
+
+
+def export_customers(file_name, start=None, end=None, states=None, gold_types=None, engine=None,
+                     batch_size=DEFAULT_BATCH_SIZE, progress=None, cancelled=None):
+    """Stream the matching customers into a .csv, .xlsx or .parquet file.
+
+    Archived purchases are included: they come first, read from only the
+    archive files and columns the export needs (see archive/query.py). Then
+    the database's rows, filtered in SQL and read through a streaming cursor
+    `batch_size` at a time. Rows are written as they arrive, so memory does
+    not depend on the size of the export. `progress(result)` is called after every batch;
+    `cancelled()` is checked before each one. A cancelled or failed export
+    leaves no file behind.
+    """
+    engine = engine or default_engine
+    result = ExportResult(file_name)
+    started = time.perf_counter()
+    filters = export_filters(start, end, states, gold_types)
+    archive_filters = dict(zip(['start', 'end'], _date_range(start, end)),
+                           states=_as_list(states), gold_types=_as_list(gold_types))
+
+    with engine.connect() as conn:
+        result.total = count_rows(conn, filters) + count_archived(conn, **archive_filters)
+        if os.path.splitext(file_name)[1].lower() == '.xlsx' and result.total > XLSX_MAX_ROWS:
+            raise ExportError(f"{result.total} records do not fit in one Excel sheet "
+                              f"(at most {XLSX_MAX_ROWS}); export to CSV or Parquet instead")
+        writer = open_writer(file_name)
+        try:
+            rows = conn.execution_options(stream_results=True, yield_per=batch_size).execute(
+                export_query(filters))
+            batches = chain(archived_rows(conn, EXPORT_COLUMNS, batch_size=batch_size, **archive_filters),
+                            rows.partitions())
+            for batch in batches:
+                if cancelled is not None and cancelled():
+                    result.cancelled = True
+                    break
+                writer.write(batch)
+                result.written += len(batch)
+                result.elapsed = time.perf_counter() - started
+                if progress is not None:
+                    progress(result)
+            rows.close()
+            writer.close()
+        except BaseException:
+            # A truncated file would look like a complete export
+            try:
+                writer.close()
+            except Exception:
+                pass  # the error being raised is the one to report
+            _remove(file_name)
+            raise
+        if result.cancelled:
+            _remove(file_name)
+
+    result.elapsed = time.perf_counter() - started
+    if result.cancelled:
+        logger.info(f"Export cancelled after {result.written} rows")
+    else:
+        logger.info(f"Exported {result.written} records to {file_name} in {result.elapsed:.1f}s")
+    return result
@@ -0,0 +1,108 @@
+import os
+import csv
+from datetime import datetime
+
+# Exported columns, in file order. Everything the importer needs is
+# included, so an exported file can be imported again.
+EXPORT_COLUMNS = ['id', 'customer_name', 'phone_number', 'email', 'address', 'state',
+                  'purchase_date', 'gold_type', 'gold_quality', 'gold_weight',
+                  'price_per_gram', 'total_amount', 'discount_percentage',
+                  'discount_amount', 'final_amount', 'payment_mode', 'notes']
+XLSX_MAX_ROWS = 1048575  # one sheet, below the header row
+
+
+class ExportError(Exception):
+    """Raised when an export cannot be written at all"""
+
+
+class CsvExportWriter:
+    def __init__(self, file_name):
+        self.file = open(file_name, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(EXPORT_COLUMNS)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+def _excel_date(value):
+    # Purchase dates arrive as text; Excel sorts and filters real dates only
+    try:
+        return datetime.fromisoformat(value) if value else value
+    except ValueError:
+        return value
+
+
+class XlsxExportWriter:
+    """openpyxl write-only workbook; rows go straight to a temporary file"""
+
+    def __init__(self, file_name):
+        from openpyxl import Workbook
+        self.file_name = file_name
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet("Customers")
+        self.sheet.append(EXPORT_COLUMNS)
+        self.date_position = EXPORT_COLUMNS.index('purchase_date')
+
+    def write(self, rows):
+        position = self.date_position
+        for row in rows:
+            row = list(row)
+            row[position] = _excel_date(row[position])
+            self.sheet.append(row)
+
+    def close(self):
+        self.workbook.save(self.file_name)
+
+
+class ParquetExportWriter:
+    """One Parquet row group per batch of rows"""
+
+    def __init__(self, file_name):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ExportError("Exporting to Parquet needs the pyarrow package: pip install pyarrow")
+        self.pa = pa
+        text = pa.string()
+        number = pa.float64()
+        self.schema = pa.schema([
+            ('id', pa.int64()), ('customer_name', text), ('phone_number', text), ('email', text),
+            ('address', text), ('state', text), ('purchase_date', pa.timestamp('s')),
+            ('gold_type', text), ('gold_quality', text), ('gold_weight', number),
+            ('price_per_gram', number), ('total_amount', number), ('discount_percentage', number),
+            ('discount_amount', number), ('final_amount', number), ('payment_mode', text), ('notes', text),
+        ])
+        self.writer = pq.ParquetWriter(file_name, self.schema)
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        arrays = []
+        for values, field in zip(columns, self.schema):
+            if field.name == 'purchase_date':
+                arrays.append(self.pa.array(values, self.pa.string()).cast(field.type))
+            else:
+                arrays.append(self.pa.array(values, field.type))
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {
+    '.csv': CsvExportWriter,
+    '.xlsx': XlsxExportWriter,
+    '.parquet': ParquetExportWriter,
+}
+
+
+def open_writer(file_name):
+    """Writer for `file_name`, chosen by its extension"""
+    file_ext = os.path.splitext(file_name)[1].lower()
+    if file_ext not in WRITERS:
+        raise ExportError(f"Unsupported file type: {file_ext}")
+    return WRITERS[file_ext](file_name)
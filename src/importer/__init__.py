@@ -0,0 +1,3 @@
+"""
+Bulk import of customer data for the Gold Purchase Management System.
+""" 
\ No newline at end of file
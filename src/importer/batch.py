@@ -0,0 +1,340 @@
+"""Importing many files at once.
+
+Files are fingerprinted, read and validated in a pool of worker processes,
+one file per worker at a time, so parsing uses every core. The prepared
+chunks come back through a bounded queue to the calling thread, which is
+the only one writing to the database: one transaction per chunk, exactly
+as import_file() does, so SQLite never sees two writers. The queue holds
+at most QUEUED_CHUNKS per worker; a worker that gets ahead of the writer
+waits, which keeps memory bounded.
+
+Every file gets its own ImportResult. Files with rejected rows get a CSV
+reject file (row number, column, reason) in a `rejects` folder next to
+them, or in `reject_dir`.
+"""
+import os
+import csv
+import time
+import logging
+from functools import partial
+from queue import Empty
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from src.database.bulk import BulkLoad
+from src.database.fingerprint import file_fingerprint
+from src.database.models import engine as default_engine
+from src.importer.engine import (DEFAULT_CHUNK_SIZE, ON_DUPLICATE_SKIP, ON_DUPLICATE_UPDATE, ImportResult,
+                                 checked_chunks, import_file, prepare_chunk, previous_import, record_import,
+                                 write_chunk)
+from src.importer.readers import SUPPORTED_EXTENSIONS, ImportFileError
+
+logger = logging.getLogger(__name__)
+
+QUEUED_CHUNKS = 2  # prepared chunks waiting for the writer, per worker
+POLL_SECONDS = 0.5  # how often the writer checks for workers that died
+REJECTS_FOLDER = 'rejects'
+REJECT_FILE_SUFFIX = '.rejects.csv'
+REJECT_COLUMNS = ['row_number', 'column', 'reason']
+
+# Messages from the workers: (file index, kind, payload)
+_STARTED = 'started'
+_CHUNK = 'chunk'  # payload: (prepare_chunk() result, rows read)
+_DONE = 'done'
+_FAILED = 'failed'  # payload: error message
+
+# Set in each worker process by _init_worker
+_queue = None
+_stop = None
+
+
+class BatchResult:
+    """Counters for a multi-file import: an ImportResult per file, in the order given"""
+
+    def __init__(self, file_names):
+        self.results = [ImportResult(file_name) for file_name in file_names]
+        self.files_done = 0  # imported, skipped or failed
+        self.workers = 0
+        self.elapsed = 0.0
+        self.cancelled = False
+
+    @property
+    def rows_read(self):
+        return sum(result.rows_read for result in self.results)
+
+    @property
+    def inserted(self):
+        return sum(result.inserted for result in self.results)
+
+    @property
+    def rejected(self):
+        return sum(result.rejected for result in self.results)
+
+    @property
+    def failed(self):
+        return [result for result in self.results if result.error]
+
+    @property
+    def rows_per_second(self):
+        return self.rows_read / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self):
+        return (f"<BatchResult(files={len(self.results)}, read={self.rows_read}, inserted={self.inserted}, "
+                f"rejected={self.rejected})>")
+
+
+def import_file_names(paths):
+    """The importable files among `paths`; a folder stands for the files directly in it"""
+    file_names = []
+    for path in paths:
+        if os.path.isdir(path):
+            file_names.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS
+                and os.path.isfile(os.path.join(path, name))))
+        else:
+            file_names.append(path)
+    return file_names
+
+
+def reject_file_name(file_name, reject_dir=None):
+    directory = reject_dir or os.path.join(os.path.dirname(os.path.abspath(file_name)), REJECTS_FOLDER)
+    return os.path.join(directory, os.path.basename(file_name) + REJECT_FILE_SUFFIX)
+
+
+def write_reject_file(result, reject_dir=None):
+    """Write `result`'s rejected rows to its reject file, ordered by row; returns the path or None"""
+    if not result.rejects:
+        return None
+    path = reject_file_name(result.file_name, reject_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(REJECT_COLUMNS)
+        for reject in sorted(result.rejects, key=lambda reject: reject.row_number):
+            writer.writerow([reject.row_number, reject.column or '', reject.reason])
+    result.reject_file = path
+    return path
+
+
+def summary_lines(batch):
+    """One line per file, then the totals, for printing or showing after an import"""
+    lines = []
+    for result in batch.results:
+        name = os.path.basename(result.file_name)
+        if result.already_imported is not None:
+            lines.append(f"{name}: already imported on {result.already_imported:%Y-%m-%d %H:%M}, skipped")
+            continue
+        line = (f"{name}: read {result.rows_read:,}, inserted {result.inserted:,}, "
+                f"duplicates {result.duplicates:,}, updated {result.updated:,}, "
+                f"rejected {result.rejected:,}, repriced {result.repriced:,} "
+                f"in {result.elapsed:.1f}s ({result.rows_per_second:,.0f} rows/s)")
+        if result.error:
+            line += f"; stopped: {' '.join(result.error.split())}"
+        elif result.cancelled:
+            line += "; cancelled"
+        if result.reject_file:
+            line += f"; rejects in {result.reject_file}"
+        lines.append(line)
+    lines.append(f"{len(batch.results)} files: read {batch.rows_read:,}, inserted {batch.inserted:,}, "
+                 f"rejected {batch.rejected:,}, failed files {len(batch.failed)} "
+                 f"in {batch.elapsed:.1f}s ({batch.rows_per_second:,.0f} rows/s)")
+    return lines
+
+
+def _init_worker(queue, stop):
+    global _queue, _stop
+    _queue, _stop = queue, stop
+
+
+def _fingerprint(file_name):
+    try:
+        return file_fingerprint(file_name), None
+    except OSError as e:
+        return None, f"Cannot read file: {str(e)}"
+
+
+def _prepare_file(index, file_name, chunk_size):
+    """Read and validate a file in a worker process, queueing its chunks for the writer.
+
+    Always ends with a _DONE or _FAILED message, also when the import was
+    cancelled meanwhile.
+    """
+    if _stop.is_set():
+        _queue.put((index, _DONE, None))
+        return
+    _queue.put((index, _STARTED, None))
+    try:
+        for chunk in checked_chunks(file_name, chunk_size):
+            if _stop.is_set():
+                break
+            _queue.put((index, _CHUNK, (prepare_chunk(chunk), len(chunk))))
+    except ImportFileError as e:
+        _queue.put((index, _FAILED, str(e)))
+        return
+    except Exception as e:
+        _queue.put((index, _FAILED, f"Failed to import file: {str(e)}"))
+        return
+    _queue.put((index, _DONE, None))
+
+
+def import_files(file_names, engine=None, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None,
+                 cancelled=None, on_duplicate=ON_DUPLICATE_SKIP, force=False, reject_dir=None,
+                 import_one=None):
+    """Import several CSV or Excel files; returns a BatchResult.
+
+    `workers` processes read and validate the files (default: one per CPU
+    but one, and no more than there are files). With workers=0, the
+    default for a single file or CPU, the files
+    are imported one after another in this process, through `import_one`
+    (default import_file; the server client's import_file uploads them).
+    A file that cannot be read, or stops with a bad column, does not stop
+    the others; its result has `error` set.
+
+    `progress(batch)` is called after every committed chunk; `cancelled()`
+    is checked before each one. Other arguments are as for import_file.
+    """
+    if on_duplicate not in (ON_DUPLICATE_SKIP, ON_DUPLICATE_UPDATE):
+        raise ValueError(f"Unknown duplicate handling '{on_duplicate}'")
+    batch = BatchResult(file_names)
+    if workers is None and len(file_names) > 1:
+        # The writer keeps a CPU busy too; on a single CPU workers would only get in its way
+        workers = min(len(file_names), (os.cpu_count() or 1) - 1)
+    elif workers is None:
+        workers = 0  # starting a process costs more than it saves on one file
+    started = time.perf_counter()
+    if workers == 0:
+        import_one = import_one or partial(import_file, engine=engine, chunk_size=chunk_size)
+        _import_in_process(batch, import_one, progress, cancelled, on_duplicate, force, started)
+    else:
+        _import_in_pool(batch, engine or default_engine, workers, chunk_size, progress, cancelled,
+                        on_duplicate, force, started)
+    batch.elapsed = time.perf_counter() - started
+    for result in batch.results:
+        write_reject_file(result, reject_dir)
+    logger.info(f"Imported {len(file_names)} files in {batch.elapsed:.1f}s: read {batch.rows_read}, "
+                f"inserted {batch.inserted}, rejected {batch.rejected}, failed files {len(batch.failed)}")
+    return batch
+
+
+def _import_in_process(batch, import_one, progress, cancelled, on_duplicate, force, started):
+    def report(index, result):
+        batch.results[index] = result
+        batch.elapsed = time.perf_counter() - started
+        if progress is not None:
+            progress(batch)
+
+    for index, file_name in enumerate(result.file_name for result in batch.results):
+        if cancelled is not None and cancelled():
+            batch.cancelled = True
+        if batch.cancelled:
+            batch.results[index].cancelled = True
+            continue
+        try:
+            batch.results[index] = import_one(file_name, progress=partial(report, index), cancelled=cancelled,
+                                              on_duplicate=on_duplicate, force=force)
+        except ImportFileError as e:
+            logger.error(f"{file_name}: {str(e)}")
+            batch.results[index].error = str(e)
+        batch.cancelled = batch.results[index].cancelled
+        if not batch.cancelled:
+            batch.files_done += 1
+            report(index, batch.results[index])
+
+
+def _import_in_pool(batch, engine, workers, chunk_size, progress, cancelled, on_duplicate, force, started):
+    batch.workers = workers
+    context = get_context('spawn')  # fork is unsafe with the GUI's and SQLAlchemy's threads
+    queue = context.Queue(maxsize=QUEUED_CHUNKS * workers)
+    stop = context.Event()
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                             initargs=(queue, stop)) as pool:
+        futures = {}
+        fingerprints = pool.map(_fingerprint, [result.file_name for result in batch.results])
+        for index, (result, (file_hash, error)) in enumerate(zip(batch.results, fingerprints)):
+            result.file_hash, result.error = file_hash, error
+            if error:
+                logger.error(f"{result.file_name}: {error}")
+                batch.files_done += 1
+                continue
+            if not force:
+                result.already_imported = previous_import(engine, file_hash)
+                if result.already_imported is not None:
+                    logger.info(f"{result.file_name} was already imported on {result.already_imported}; skipping")
+                    batch.files_done += 1
+                    continue
+            futures[index] = pool.submit(_prepare_file, index, result.file_name, chunk_size)
+        try:
+            with BulkLoad(engine) as load:
+                _write_queued(batch, engine, load, queue, stop, futures, progress, cancelled, on_duplicate,
+                              started)
+        except BaseException:
+            # Let the workers finish so the pool can shut down
+            stop.set()
+            _drain(queue, futures.values())
+            raise
+
+
+def _write_queued(batch, engine, load, queue, stop, futures, progress, cancelled, on_duplicate, started):
+    """The single writer: commit the chunks the workers queue, in the order they arrive.
+
+    `load` is the BulkLoad of the whole batch, which defers index upkeep
+    once the files together are large.
+    """
+    file_started = {}
+    remaining = set(futures)
+    while remaining:
+        try:
+            index, kind, payload = queue.get(timeout=POLL_SECONDS)
+        except Empty:
+            # A worker process that died never sends its last message
+            for index in list(remaining):
+                future = futures[index]
+                if future.done() and future.exception() is not None:
+                    batch.results[index].error = f"Failed to import file: {str(future.exception())}"
+                    batch.files_done += 1
+                    remaining.discard(index)
+            continue
+        result = batch.results[index]
+        if kind == _STARTED:
+            file_started[index] = time.perf_counter()
+            continue
+        if kind == _CHUNK and not batch.cancelled:
+            if cancelled is not None and cancelled():
+                batch.cancelled = True
+                stop.set()
+                logger.info(f"Import cancelled after {batch.rows_read} rows")
+                continue
+            prepared, rows_read = payload
+            load.add(rows_read)
+            write_chunk(engine, result, prepared, rows_read, on_duplicate)
+            result.elapsed = time.perf_counter() - file_started[index]
+            batch.elapsed = time.perf_counter() - started
+            logger.info(f"{os.path.basename(result.file_name)}: imported {result.inserted} of "
+                        f"{result.rows_read} rows so far...")
+            if progress is not None:
+                progress(batch)
+        elif kind in (_DONE, _FAILED):
+            remaining.discard(index)
+            if batch.cancelled:
+                result.cancelled = True  # its last chunks were dropped
+                continue
+            result.elapsed = time.perf_counter() - file_started[index]
+            if kind == _FAILED:
+                result.error = payload
+                logger.error(f"{result.file_name}: {payload}")
+            else:
+                record_import(engine, result)
+                logger.info(f"{result.file_name}: imported {result.inserted} of {result.rows_read} rows "
+                            f"in {result.elapsed:.1f}s")
+            batch.files_done += 1
+            batch.elapsed = time.perf_counter() - started
+            if progress is not None:
+                progress(batch)
+
+
+def _drain(queue, futures):
+    while not all(future.done() for future in futures):
+        try:
+            queue.get(timeout=POLL_SECONDS)
+        except Empty:
+            pass
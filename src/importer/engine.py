@@ -0,0 +1,383 @@
+import json
+import time
+import logging
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from src.database.models import ImportedFile, Purchase, engine as default_engine
+from src.database.bulk import BulkLoad
+from src.database.customers import CUSTOMER_DETAILS, resolve_customers
+from src.database.fingerprint import HASH_COLUMNS, file_fingerprint, purchase_fingerprints
+from src.database.search import bulk_indexing
+from src.database.summaries import bulk_summaries
+from src.importer.readers import read_chunks, ImportFileError, FIRST_DATA_ROW
+from src.pricing import amounts_differ, calculate_amounts_array
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ['customer_name', 'phone_number', 'email', 'address', 'state',
+                    'purchase_date', 'gold_type', 'gold_quality', 'gold_weight',
+                    'price_per_gram', 'total_amount', 'discount_percentage',
+                    'discount_amount', 'final_amount', 'payment_mode']
+TEXT_COLUMNS = ['customer_name', 'phone_number', 'email', 'address', 'state',
+                'gold_type', 'gold_quality', 'payment_mode', 'notes']
+NUMERIC_COLUMNS = ['gold_weight', 'price_per_gram', 'total_amount',
+                   'discount_percentage', 'discount_amount', 'final_amount']
+AMOUNT_COLUMNS = ['total_amount', 'discount_amount', 'final_amount']
+DATE_COLUMN = 'purchase_date'
+HASH_COLUMN = 'row_hash'
+# Column order of the positional rows prepared for insert_purchases(): the
+# customer's details, then the purchases columns in table order, which is
+# the order the compiled INSERT lists them in
+PURCHASE_COLUMNS = [column.name for column in Purchase.__table__.columns
+                    if column.name in TEXT_COLUMNS + NUMERIC_COLUMNS + [DATE_COLUMN, HASH_COLUMN]]
+INSERT_COLUMNS = CUSTOMER_DETAILS + PURCHASE_COLUMNS
+# Columns a re-imported row may change on the stored row it matches
+UPDATE_COLUMNS = [column for column in INSERT_COLUMNS if column not in HASH_COLUMNS + [HASH_COLUMN]]
+# Same text format SQLAlchemy's SQLite DateTime type stores
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+DEFAULT_CHUNK_SIZE = 50000
+
+# What to do with a row whose fingerprint is already stored
+ON_DUPLICATE_SKIP = 'skip'
+ON_DUPLICATE_UPDATE = 'update'
+
+
+class RejectedRow:
+    """One problem that kept a row out of the database"""
+
+    __slots__ = ('row_number', 'column', 'reason')
+
+    def __init__(self, row_number, column, reason):
+        self.row_number = row_number
+        self.column = column
+        self.reason = reason
+
+    def __repr__(self):
+        return f"<RejectedRow(row={self.row_number}, column='{self.column}', reason='{self.reason}')>"
+
+
+class ImportResult:
+    """Counters for a single file import"""
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.file_hash = None
+        self.already_imported = None  # when the same file was imported before
+        self.rows_read = 0
+        self.inserted = 0
+        self.rejected = 0
+        self.rejects = []
+        self.repriced = 0
+        self.duplicates = 0
+        self.updated = 0
+        self.elapsed = 0.0
+        self.cancelled = False
+        self.error = None  # why a file of a multi-file import stopped (see batch.py)
+        self.reject_file = None
+
+    @property
+    def rows_per_second(self):
+        return self.rows_read / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self):
+        return (f"<ImportResult(file='{self.file_name}', read={self.rows_read}, "
+                f"inserted={self.inserted}, duplicates={self.duplicates}, rejected={self.rejected})>")
+
+
+def check_columns(columns):
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in columns]
+    if missing_columns:
+        raise ImportFileError(
+            f"File must contain these columns: {', '.join(REQUIRED_COLUMNS)}\n"
+            f"Missing columns: {', '.join(missing_columns)}"
+        )
+
+
+def checked_chunks(file_name, chunk_size):
+    """read_chunks(), with the header's columns checked before any row is used.
+
+    A file without a header row raises ImportFileError, so a file whose
+    columns were never checked cannot be recorded as imported.
+    """
+    checked = False
+    for chunk in read_chunks(file_name, chunk_size):
+        if not checked:
+            check_columns(chunk.columns)
+            checked = True
+        yield chunk
+    if not checked:
+        raise ImportFileError("File is empty: it has no header row")
+
+
+def _raw(chunk, column):
+    if column not in chunk:
+        return pd.Series('', index=chunk.index, dtype=object)
+    return chunk[column].fillna('')
+
+
+def _text(chunk, column):
+    return _raw(chunk, column).str.strip()
+
+
+def prepare_chunk(chunk):
+    """Coerce a chunk of raw text columns into insertable rows.
+
+    All coercion is column-wise. The amounts in the file are not trusted:
+    they are recomputed from weight, price and discount percentage.
+    Returns (rows, row_numbers, rejects, repriced): `rows` are tuples in
+    INSERT_COLUMNS order, `rejects` describes every row that failed
+    validation (those rows are left out of `rows`) and `repriced` counts
+    kept rows whose file amounts disagreed with the recomputed ones.
+    """
+    row_numbers = chunk.index.to_numpy() + FIRST_DATA_ROW
+    bad = np.zeros(len(chunk), dtype=bool)
+    rejects = []
+
+    def reject(mask, column, reason, raw=None):
+        positions = np.flatnonzero(mask.to_numpy())
+        for pos in positions:
+            detail = f"{reason}: {raw.iloc[pos]!r}" if raw is not None else reason
+            rejects.append(RejectedRow(int(row_numbers[pos]), column, detail))
+        bad[positions] = True
+
+    columns = {}
+    for column in TEXT_COLUMNS:
+        values = _text(chunk, column)
+        columns[column] = values.where(values != '', None)
+    reject(columns['customer_name'].isna(), 'customer_name', "customer name is required")
+
+    # Numbers and dates are parsed straight from the raw text; only the few
+    # values that fail get the slower cleanup (blanks, padding, thousands
+    # separators, non-ISO dates) before they are rejected.
+    for column in NUMERIC_COLUMNS:
+        raw = _raw(chunk, column)
+        values = pd.to_numeric(raw, errors='coerce')
+        failed = values.isna()
+        if failed.any():
+            cleaned = raw[failed].str.strip().str.replace(',', '', regex=False)
+            values[failed] = pd.to_numeric(cleaned, errors='coerce')
+            reject(values.isna() & (raw.str.strip() != ''), column, "not a number", raw)
+        columns[column] = values.fillna(0.0)
+
+    amounts = calculate_amounts_array(columns['gold_weight'], columns['price_per_gram'],
+                                      columns['discount_percentage'])
+    disagrees = np.zeros(len(chunk), dtype=bool)
+    for column, expected in zip(AMOUNT_COLUMNS, amounts):
+        disagrees |= amounts_differ(columns[column].to_numpy(), expected)
+        columns[column] = pd.Series(expected, index=chunk.index)
+
+    raw = _raw(chunk, DATE_COLUMN)
+    dates = pd.to_datetime(raw, errors='coerce', format='ISO8601')
+    failed = dates.isna()
+    if failed.any():
+        cleaned = raw[failed].str.strip()
+        dates[failed] = pd.to_datetime(cleaned, errors='coerce', format='mixed', dayfirst=True)
+        reject(dates.isna() & (raw.str.strip() != ''), DATE_COLUMN, "not a date", raw)
+    # Rows without a date get the import time, but are fingerprinted without
+    # one so that importing the same file again still matches them
+    columns[DATE_COLUMN] = dates.dt.strftime(DATE_FORMAT).where(dates.notna(), None)
+    columns[HASH_COLUMN] = purchase_fingerprints(columns)
+    columns[DATE_COLUMN] = columns[DATE_COLUMN].fillna(datetime.now().strftime(DATE_FORMAT))
+
+    keep = ~bad
+    frame = pd.DataFrame(columns, columns=INSERT_COLUMNS)[keep]
+    repriced = int((disagrees & keep).sum())
+    return list(frame.itertuples(index=False, name=None)), row_numbers[keep], rejects, repriced
+
+
+def insert_statement(conn):
+    """Compiled positional INSERT of purchases, for customer_id then PURCHASE_COLUMNS"""
+    statement = insert(Purchase.__table__).compile(dialect=conn.dialect,
+                                                   column_keys=['customer_id'] + PURCHASE_COLUMNS)
+    return str(statement)
+
+
+def insert_purchases(conn, rows, sql=None):
+    """Insert rows in INSERT_COLUMNS order, resolving their customers first.
+
+    New customers are inserted along the way (see customers.py), so this
+    must run inside a write transaction.
+    """
+    details = len(CUSTOMER_DETAILS)
+    customer_ids = resolve_customers(conn, [row[:details] for row in rows])
+    conn.exec_driver_sql(sql or insert_statement(conn),
+                         [(customer_id,) + row[details:] for customer_id, row in zip(customer_ids, rows)])
+
+
+def existing_fingerprints(conn, hashes):
+    """The subset of `hashes` already stored, found with one indexed query"""
+    if not hashes:
+        return set()
+    result = conn.exec_driver_sql(
+        f"SELECT DISTINCT {HASH_COLUMN} FROM purchases "
+        f"WHERE {HASH_COLUMN} IN (SELECT value FROM json_each(?))",
+        (json.dumps(hashes),)
+    )
+    return {row[0] for row in result}
+
+
+def split_duplicates(conn, rows, row_numbers):
+    """Separate rows that are new from rows whose fingerprint is already stored.
+
+    A fingerprint repeated within the batch counts as a duplicate after its
+    first occurrence. Returns (new_rows, new_row_numbers, duplicate_rows).
+    """
+    position = INSERT_COLUMNS.index(HASH_COLUMN)
+    seen = existing_fingerprints(conn, [row[position] for row in rows])
+    new_rows, new_row_numbers, duplicate_rows = [], [], []
+    for row, row_number in zip(rows, row_numbers):
+        if row[position] in seen:
+            duplicate_rows.append(row)
+        else:
+            seen.add(row[position])
+            new_rows.append(row)
+            new_row_numbers.append(row_number)
+    return new_rows, new_row_numbers, duplicate_rows
+
+
+def update_duplicates(conn, rows):
+    """Overwrite the non-identifying columns of stored rows with `rows`.
+
+    Stored rows that already hold the same values are left alone, so the
+    search and summary triggers only run for real changes. Returns the
+    number of rows changed.
+    """
+    if not rows:
+        return 0
+    positions = [INSERT_COLUMNS.index(column) for column in UPDATE_COLUMNS]
+    hash_position = INSERT_COLUMNS.index(HASH_COLUMN)
+    assignments = ', '.join(f"{column} = ?" for column in UPDATE_COLUMNS)
+    changed = ' OR '.join(f"{column} IS NOT ?" for column in UPDATE_COLUMNS)
+    result = conn.exec_driver_sql(
+        f"UPDATE purchases SET {assignments} WHERE {HASH_COLUMN} = ? AND ({changed})",
+        [tuple(row[i] for i in positions) + (row[hash_position],) + tuple(row[i] for i in positions)
+         for row in rows]
+    )
+    return result.rowcount
+
+
+def previous_import(engine, file_hash):
+    """When the file with this SHA-256 was last imported completely, or None"""
+    with engine.connect() as conn:
+        return conn.execute(
+            select(ImportedFile.imported_at).where(ImportedFile.sha256 == file_hash)
+        ).scalar()
+
+
+def record_import(engine, result):
+    with engine.begin() as conn:
+        conn.execute(insert(ImportedFile.__table__).prefix_with('OR REPLACE'), {
+            'sha256': result.file_hash,
+            'file_name': result.file_name,
+            'imported_at': datetime.now(),
+            'rows_read': result.rows_read,
+            'inserted': result.inserted,
+        })
+
+
+def write_batch(conn, rows, row_numbers):
+    """Insert rows with one executemany, isolating failures to single rows.
+
+    Returns (inserted, rejects). When the batch insert fails it is retried
+    row by row, each in its own SAVEPOINT, so a bad row never discards the
+    rest of the batch, nor leaves behind a customer without purchases.
+    """
+    if not rows:
+        return 0, []
+    sql = insert_statement(conn)
+    try:
+        with conn.begin_nested():
+            insert_purchases(conn, rows, sql)
+        return len(rows), []
+    except SQLAlchemyError as e:
+        logger.warning(f"Batch insert failed, retrying row by row: {str(e)}")
+
+    inserted = 0
+    rejects = []
+    for row, row_number in zip(rows, row_numbers):
+        try:
+            with conn.begin_nested():
+                insert_purchases(conn, [row], sql)
+            inserted += 1
+        except SQLAlchemyError as e:
+            rejects.append(RejectedRow(int(row_number), None, str(getattr(e, 'orig', e))))
+    return inserted, rejects
+
+
+def write_chunk(engine, result, prepared, rows_read, on_duplicate=ON_DUPLICATE_SKIP):
+    """Write a prepare_chunk() result in one transaction and add it to `result`'s counters.
+
+    `rows_read` is the number of rows in the chunk as read from the file.
+    """
+    rows, row_numbers, rejects, repriced = prepared
+    with engine.begin() as conn, bulk_indexing(conn), bulk_summaries(conn):
+        rows, row_numbers, duplicate_rows = split_duplicates(conn, rows, row_numbers)
+        inserted, write_rejects = write_batch(conn, rows, row_numbers)
+        if on_duplicate == ON_DUPLICATE_UPDATE:
+            result.updated += update_duplicates(conn, duplicate_rows)
+
+    result.duplicates += len(duplicate_rows)
+
+    rejects.extend(write_rejects)
+    result.rows_read += rows_read
+    result.inserted += inserted
+    result.repriced += repriced
+    result.rejected += len({reject.row_number for reject in rejects})
+    result.rejects.extend(rejects)
+
+
+def import_file(file_name, engine=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None, cancelled=None,
+                on_duplicate=ON_DUPLICATE_SKIP, force=False):
+    """Import a CSV or Excel file chunk by chunk, one transaction per chunk.
+
+    `progress(result)` is called after every committed chunk. `cancelled()`
+    is checked before each chunk; cancelling keeps the chunks already
+    committed and never leaves a partial chunk behind.
+
+    A large file defers the upkeep of the secondary indexes to its end (see
+    bulk.py); they are rebuilt however the import ends.
+
+    Rows whose fingerprint is already stored are skipped, or with
+    ON_DUPLICATE_UPDATE update the stored row. A file that was imported
+    completely before is not read again unless `force` is set; the result
+    then has `already_imported` set and nothing else done.
+    """
+    if on_duplicate not in (ON_DUPLICATE_SKIP, ON_DUPLICATE_UPDATE):
+        raise ValueError(f"Unknown duplicate handling '{on_duplicate}'")
+    engine = engine or default_engine
+    result = ImportResult(file_name)
+    started = time.perf_counter()
+
+    try:
+        result.file_hash = file_fingerprint(file_name)
+    except OSError as e:
+        raise ImportFileError(f"Cannot read file: {str(e)}") from e
+    if not force:
+        result.already_imported = previous_import(engine, result.file_hash)
+        if result.already_imported is not None:
+            logger.info(f"{file_name} was already imported on {result.already_imported}; skipping")
+            return result
+
+    with BulkLoad(engine) as load:
+        for chunk in checked_chunks(file_name, chunk_size):
+            if cancelled is not None and cancelled():
+                result.cancelled = True
+                logger.info(f"Import cancelled after {result.rows_read} rows")
+                break
+            load.add(len(chunk))
+            write_chunk(engine, result, prepare_chunk(chunk), len(chunk), on_duplicate)
+            result.elapsed = time.perf_counter() - started
+            logger.info(f"Imported {result.inserted} of {result.rows_read} rows so far...")
+            if progress is not None:
+                progress(result)
+
+    result.elapsed = time.perf_counter() - started
+    if not result.cancelled:
+        record_import(engine, result)
+    logger.info(f"Import completed in {result.elapsed:.1f}s. Successfully imported {result.inserted} "
+                f"records. Duplicates: {result.duplicates}. Failed: {result.rejected}. Repriced: {result.repriced}")
+    return result
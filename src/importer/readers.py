@@ -0,0 +1,117 @@
+import os
+import logging
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Data rows start on the line after the header, and file lines are 1-based.
+# Chunk indexes are `row_number - FIRST_DATA_ROW` for every reader.
+FIRST_DATA_ROW = 2
+SUPPORTED_EXTENSIONS = ['.csv', '.xlsx', '.xls']
+
+
+class ImportFileError(Exception):
+    """Raised when a file cannot be imported at all (unreadable, wrong columns)"""
+
+
+def read_chunks(file_name, chunk_size):
+    """Yield the file as DataFrames of at most `chunk_size` rows, all values as text.
+
+    CSV and .xlsx are streamed, so memory stays bounded by the chunk size no
+    matter how large the file is; legacy .xls sheets are capped at 65,536 rows.
+    """
+    file_ext = os.path.splitext(file_name)[1].lower()
+    readers = {
+        '.csv': read_csv_chunks,
+        '.xlsx': read_xlsx_chunks,
+        '.xls': read_xls_chunks,
+    }
+    if file_ext not in readers:
+        raise ImportFileError(f"Unsupported file type: {file_ext}")
+    try:
+        yield from readers[file_ext](file_name, chunk_size)
+    except Exception as e:
+        # Parser errors differ per library (pandas, openpyxl, zipfile, xlrd)
+        raise ImportFileError(f"Could not read file: {str(e)}") from e
+
+
+def read_csv_chunks(file_name, chunk_size):
+    return pd.read_csv(file_name, chunksize=chunk_size, dtype=str, keep_default_na=False)
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        # Whole numbers (phone numbers, mostly) come back from Excel as floats
+        return str(int(value))
+    return str(value).strip()
+
+
+def _batches(header, rows, chunk_size):
+    """Group (row_number, values) pairs into DataFrames indexed like read_csv.
+
+    A header without rows gives one empty DataFrame, as read_csv does, so
+    its columns still get checked.
+    """
+    columns = [_cell_text(name) for name in header]
+    batch = []
+    index = []
+    yielded = False
+    for row_number, values in rows:
+        texts = [_cell_text(value) for value in values]
+        if not any(texts):
+            continue  # Blank rows at the end of sheets are common
+        batch.append(texts)
+        index.append(row_number - FIRST_DATA_ROW)
+        if len(batch) == chunk_size:
+            yield pd.DataFrame(batch, columns=columns, index=index)
+            yielded = True
+            batch = []
+            index = []
+    if batch or not yielded:
+        yield pd.DataFrame(batch, columns=columns, index=index)
+
+
+def read_xlsx_chunks(file_name, chunk_size):
+    """Stream the first sheet of an .xlsx file with openpyxl's read-only mode"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_name, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        # Some exporters write wrong dimensions, which would cut rows off
+        sheet.reset_dimensions()
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        yield from _batches(header, enumerate(rows, start=FIRST_DATA_ROW), chunk_size)
+    finally:
+        workbook.close()
+
+
+def read_xls_chunks(file_name, chunk_size):
+    """Read the first sheet of a legacy .xls file in batches with xlrd"""
+    import xlrd
+
+    # .xls sheets are capped at 65,536 rows; on_demand loads only the first one
+    book = xlrd.open_workbook(file_name, on_demand=True)
+    try:
+        sheet = book.sheet_by_index(0)
+        if sheet.nrows == 0:
+            return
+
+        def rows():
+            for row_index in range(1, sheet.nrows):
+                values = []
+                for cell in sheet.row(row_index):
+                    if cell.ctype == xlrd.XL_CELL_DATE:
+                        values.append(xlrd.xldate_as_datetime(cell.value, book.datemode))
+                    else:
+                        values.append(cell.value if cell.ctype != xlrd.XL_CELL_EMPTY else None)
+                yield row_index + 1, values
+
+        yield from _batches(sheet.row_values(0), rows(), chunk_size)
+    finally:
+        book.release_resources()
@@ -1,21 +1,108 @@
-from PyQt5.QtWidgets import QApplication
+from PyQt5.QtWidgets import QApplication, QMessageBox
+from PyQt5.QtCore import QTimer
 from src.ui.main_window import MainWindow
-from src.database.models import init_db, Base, engine
+from src.database.models import init_db
+from src.diagnostics import diagnostics
+import os
 import sys
+import time
+
+# Import-only dependencies that must not be loaded before the window shows
+HEAVY_MODULES = ['pandas', 'numpy', 'openpyxl', 'xlrd']
+
+
+class StartupProfile:
+    """Wall-clock timings of the startup phases, for `run.py --profile-startup`"""
+
+    def __init__(self, started=None):
+        self.started = started if started is not None else time.perf_counter()
+        self.last = self.started
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self):
+        lines = [f"{phase:<24}{seconds * 1000:>9.1f} ms" for phase, seconds in self.phases]
+        lines.append(f"{'total':<24}{(self.last - self.started) * 1000:>9.1f} ms")
+        loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+        lines.append(f"heavy modules loaded: {', '.join(loaded) or 'none'}")
+        return '\n'.join(lines)
+
+
+def open_database(window, profile=None, finished=None):
+    """Migrate the database and stream in the first rows, after the window shows.
+
+    Both run on the window's worker threads, so the window paints meanwhile;
+    `finished()` is called once the first page is showing (or failed to load).
+    """
+    model = window.table_model
+
+    def first_page(*args):
+        model.page_loaded.disconnect(first_page)
+        model.load_failed.disconnect(first_page)
+        if model.rowCount():
+            window.statusBar().clearMessage()
+        if profile:
+            profile.mark('first page loaded')
+        if finished:
+            finished()
+
+    def load(_=None):
+        if profile and not window.server_url:
+            profile.mark('database migrations')
+        model.page_loaded.connect(first_page)
+        model.load_failed.connect(first_page)
+        window.load_customers()
+
+    def failed(error):
+        window.statusBar().showMessage("Not connected" if window.server_url else "Database not opened")
+        QMessageBox.critical(window, "Server Error" if window.server_url else "Database Error", str(error))
+        if finished:
+            finished()
+
+    if window.server_url:
+        # The server migrates its own database
+        window.statusBar().showMessage(f"Connecting to {window.server_url}...")
+        window.service.call('health', on_done=load, on_error=failed)
+        return
+    window.statusBar().showMessage("Opening database...")
+    window.service.submit(lambda: init_db().close(), on_done=load, on_error=failed)
+
+
+def main(profile_startup=False, started=None, server_url=None, collect_diagnostics=False):
+    profile = StartupProfile(started) if profile_startup else None
+    if collect_diagnostics or os.environ.get('GOLD_DIAGNOSTICS') == '1':
+        diagnostics.enable()
+    if profile:
+        profile.mark('imports')
 
-def main():
-    # Initialize database and create tables
-    Base.metadata.create_all(engine)
-    
     # Create application
     app = QApplication(sys.argv)
-    
-    # Create and show main window
-    window = MainWindow()
+    if profile:
+        profile.mark('qt application')
+
+    # Create and show main window before touching the database, so there is
+    # never a blank screen while migrations run or the first page loads
+    window = MainWindow(server_url or os.environ.get('GOLD_SERVER_URL'))
+    if profile:
+        profile.mark('main window')
     window.show()
-    
+    app.processEvents()
+    if profile:
+        profile.mark('window shown')
+
+    finish = None
+    if profile:
+        def finish():
+            print(profile.report())
+            app.quit()
+    QTimer.singleShot(0, lambda: open_database(window, profile, finish))
+
     # Start event loop
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,57 @@
+"""Purchase pricing shared by the form, the importer and reconciliation.
+
+total    = gold_weight * price_per_gram
+discount = total * discount_percentage / 100
+final    = total - discount
+
+Amounts are rounded to paise at each step, always by NumPy's rule: scale
+to paise, round half to even, scale back. The form applies the same rule
+in plain Python, so every path stores exactly the same figures for the
+same inputs.
+"""
+
+AMOUNT_DECIMALS = 2
+# Largest difference between a stored and a recomputed amount that is still
+# considered a match (one paisa absorbs float noise and older unrounded rows)
+AMOUNT_TOLERANCE = 0.01
+# Binary noise allowed on top of a tolerance: amounts one paisa apart can
+# differ by slightly more than 0.01 as floats (e.g. 0.0100000007)
+AMOUNT_EPSILON = 1e-6
+
+_SCALE = 10.0 ** AMOUNT_DECIMALS
+
+
+def _round_paise(amount):
+    # np.round(amount, AMOUNT_DECIMALS), bit for bit: round() of a float
+    # with no digits rounds half to even, as np.rint does
+    return round(amount * _SCALE) / _SCALE
+
+
+def calculate_amounts(gold_weight, price_per_gram, discount_percentage):
+    """Return (total_amount, discount_amount, final_amount) for one purchase"""
+    total_amount = _round_paise((gold_weight or 0) * (price_per_gram or 0))
+    discount_amount = _round_paise(total_amount * (discount_percentage or 0) / 100)
+    final_amount = _round_paise(total_amount - discount_amount)
+    return total_amount, discount_amount, final_amount
+
+
+def calculate_amounts_array(gold_weight, price_per_gram, discount_percentage):
+    """Vectorized calculate_amounts over whole columns.
+
+    Accepts anything NumPy can turn into float arrays (missing values become
+    0) and returns three float64 arrays.
+    """
+    # NumPy is only needed by the importer and batch jobs, not by the form
+    import numpy as np
+    weight = np.nan_to_num(np.asarray(gold_weight, dtype=np.float64))
+    price = np.nan_to_num(np.asarray(price_per_gram, dtype=np.float64))
+    discount_percentage = np.nan_to_num(np.asarray(discount_percentage, dtype=np.float64))
+    total_amount = np.round(weight * price, AMOUNT_DECIMALS)
+    discount_amount = np.round(total_amount * discount_percentage / 100, AMOUNT_DECIMALS)
+    final_amount = np.round(total_amount - discount_amount, AMOUNT_DECIMALS)
+    return total_amount, discount_amount, final_amount
+
+
+def amounts_differ(stored, recomputed, tolerance=AMOUNT_TOLERANCE):
+    """Whether stored amounts are off by more than `tolerance`; element-wise for arrays"""
+    return abs(stored - recomputed) > tolerance + AMOUNT_EPSILON
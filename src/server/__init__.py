@@ -0,0 +1,9 @@
+"""Optional HTTP API that lets several terminals share one purchase database.
+
+    python -m src.server --host 0.0.0.0 --port 8765
+
+The server owns the database: one writer connection commits the terminals'
+writes in batches, reader threads serve searches and reports. Point the
+application at it with `python run.py --server http://HOST:8765` or the
+GOLD_SERVER_URL environment variable. Needs aiohttp; terminals do not.
+"""
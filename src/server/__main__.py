@@ -0,0 +1,30 @@
+import os
+import logging
+import argparse
+
+DEFAULT_PORT = 8765
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m src.server',
+                                     description="Serve the purchase database to several terminals over HTTP")
+    parser.add_argument('--host', default='127.0.0.1',
+                        help="address to listen on; 0.0.0.0 for every interface (default: %(default)s)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="default: %(default)s")
+    parser.add_argument('--database', metavar='URL',
+                        help="SQLAlchemy database URL (default: GOLD_DATABASE_URL or sqlite:///gold_purchases.db)")
+    parser.add_argument('--readers', type=int, help="reader threads (default: 4)")
+    parser.add_argument('--max-batch', type=int, help="most writes committed together (default: 64)")
+    args = parser.parse_args()
+    if args.database:
+        os.environ['GOLD_DATABASE_URL'] = args.database
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s: %(message)s')
+    # Imported after --database is applied, since the engine is created on import
+    from aiohttp import web
+    from src.server.app import create_app
+    web.run_app(create_app(readers=args.readers, max_batch=args.max_batch), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
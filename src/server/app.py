@@ -0,0 +1,314 @@
+import os
+import json
+import shutil
+import asyncio
+import logging
+import tempfile
+import threading
+from datetime import date, datetime
+from functools import partial
+from aiohttp import web
+from src.database.customers import CUSTOMER_DETAILS
+from src.database.models import Purchase, Session, engine as default_engine
+from src.database.migrations import current_version, migrate
+from src.database.reports import sales_summary
+from src.database.search import SIMILARITY_THRESHOLD
+from src.database.repository import LIST_COLUMNS, CustomerRepository
+from src.database.summaries import DIMENSIONS
+
+logger = logging.getLogger(__name__)
+
+# Customer list row attributes sent to and accepted from terminals
+CUSTOMER_FIELDS = ['id', 'customer_id'] + CUSTOMER_DETAILS + [
+    column.name for column in Purchase.__table__.columns if column.name not in ('id', 'customer_id', 'row_hash')]
+READ_ONLY_FIELDS = {'id', 'customer_id'}
+MAX_HISTORY_SIZE = 1000
+MAX_SIMILAR_CUSTOMERS = 100
+MAX_PAGE_SIZE = 1000
+MAX_REJECTS_SENT = 1000
+UPLOAD_BLOCK_SIZE = 1 << 20
+
+POOL_KEY = web.AppKey('pool', object)
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _json(data, status=200):
+    return web.json_response(data, status=status, dumps=partial(json.dumps, default=_json_default))
+
+
+def _dumps_line(data):
+    return (json.dumps(data, default=_json_default) + '\n').encode('utf-8')
+
+
+def customer_to_dict(customer):
+    return {field: getattr(customer, field) for field in CUSTOMER_FIELDS}
+
+
+def list_row_to_dict(row):
+    return {field: getattr(row, field) for field in LIST_COLUMNS}
+
+
+def customer_data(payload):
+    """Validate a JSON customer body into the dict the repository takes"""
+    if not isinstance(payload, dict):
+        raise ValueError("Expected a JSON object")
+    unknown = set(payload) - set(CUSTOMER_FIELDS) | (READ_ONLY_FIELDS & set(payload))
+    if unknown:
+        raise ValueError(f"Unknown or read-only fields: {', '.join(sorted(unknown))}")
+    data = dict(payload)
+    if isinstance(data.get('purchase_date'), str):
+        data['purchase_date'] = datetime.fromisoformat(data['purchase_date'])
+    return data
+
+
+def _int_param(request, name, default=None):
+    value = request.query.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise web.HTTPBadRequest(text=f"{name} must be an integer")
+
+
+def _reader_repository(request):
+    # Reads go to the server's engine, the same database the writer uses
+    return CustomerRepository(session_factory=request.app[POOL_KEY].session_factory)
+
+
+def _writer_repository(conn):
+    # Sessions on the writer connection commit to their own SAVEPOINT; the
+    # pool commits the batch
+    return CustomerRepository(session_factory=lambda: Session(bind=conn))
+
+
+@web.middleware
+async def error_middleware(request, handler):
+    try:
+        return await handler(request)
+    except web.HTTPException:
+        raise
+    except (ValueError, TypeError) as e:
+        return _json({'error': str(e)}, status=400)
+    except Exception as e:
+        logger.exception(f"{request.method} {request.path} failed")
+        return _json({'error': str(e)}, status=500)
+
+
+async def health(request):
+    def version():
+        with request.app[POOL_KEY].engine.connect() as conn:
+            return current_version(conn)
+    return _json({'status': 'ok', 'schema_version': await request.app[POOL_KEY].read(version)})
+
+
+async def list_customers(request):
+    pool = request.app[POOL_KEY]
+    repository = _reader_repository(request)
+    search = request.query.get('search') or None
+    if 'ids' in request.query:
+        ids = [int(value) for value in request.query['ids'].split(',') if value]
+        customers = await pool.read(repository.fetch_by_ids, ids, search)
+    else:
+        limit = min(_int_param(request, 'limit', 200), MAX_PAGE_SIZE)
+        sort_by = request.query.get('sort_by', 'id')
+        # The keyset value of the last row the terminal has, as JSON (it may be null)
+        after_value = json.loads(request.query.get('after_value', 'null'))
+        if sort_by == 'purchase_date' and isinstance(after_value, str):
+            after_value = datetime.fromisoformat(after_value)
+        customers = await pool.read(partial(
+            repository.fetch_page, _int_param(request, 'after_id'), limit, search, sort_by,
+            request.query.get('descending') in ('1', 'true'), after_value))
+    return _json([list_row_to_dict(customer) for customer in customers])
+
+
+async def get_customer(request):
+    customer = await request.app[POOL_KEY].read(_reader_repository(request).get, int(request.match_info['id']))
+    if customer is None:
+        raise web.HTTPNotFound(text="Customer not found")
+    return _json(customer_to_dict(customer))
+
+
+async def add_customer(request):
+    data = customer_data(await request.json())
+    customer_id = await request.app[POOL_KEY].write(lambda conn: _writer_repository(conn).add(data))
+    return _json({'id': customer_id}, status=201)
+
+
+async def update_customer(request):
+    customer_id = int(request.match_info['id'])
+    data = customer_data(await request.json())
+
+    def update(conn):
+        # The purchases whose rows changed, as the repository notifies them
+        updated = []
+        repository = _writer_repository(conn)
+        repository.subscribe(lambda event, changed_id: updated.append(changed_id))
+        return updated if repository.update(customer_id, data) else None
+    updated = await request.app[POOL_KEY].write(update)
+    if updated is None:
+        raise web.HTTPNotFound(text="Customer not found")
+    return _json({'id': customer_id, 'updated': updated})
+
+
+async def delete_customer(request):
+    customer_id = int(request.match_info['id'])
+    if not await request.app[POOL_KEY].write(lambda conn: _writer_repository(conn).delete(customer_id)):
+        raise web.HTTPNotFound(text="Customer not found")
+    return _json({'id': customer_id})
+
+
+async def customer_history(request):
+    """A customer's lifetime totals and newest purchases, as list rows"""
+    customer_id = int(request.match_info['id'])
+    limit = min(_int_param(request, 'limit', MAX_HISTORY_SIZE), MAX_HISTORY_SIZE)
+    pool = request.app[POOL_KEY]
+    repository = _reader_repository(request)
+    summary = await pool.read(repository.customer_summary, customer_id)
+    purchases = await pool.read(repository.customer_history, customer_id, limit)
+    return _json({'summary': summary, 'purchases': [list_row_to_dict(purchase) for purchase in purchases]})
+
+
+async def find_by_phone(request):
+    """The customer with a phone number, written in any form"""
+    customer = await request.app[POOL_KEY].read(_reader_repository(request).find_by_phone, request.query.get('phone', ''))
+    if customer is None:
+        raise web.HTTPNotFound(text="Customer not found")
+    return _json({field: getattr(customer, field) for field in ['id'] + CUSTOMER_DETAILS})
+
+
+async def similar_customers(request):
+    """Customers whose names best match a possibly misspelled name, best first"""
+    name = request.query.get('name', '')
+    limit = min(_int_param(request, 'limit', 10), MAX_SIMILAR_CUSTOMERS)
+    threshold = float(request.query.get('threshold', SIMILARITY_THRESHOLD))
+    matches = await request.app[POOL_KEY].read(_reader_repository(request).similar_customers, name, limit, threshold)
+    return _json([dict({field: getattr(customer, field) for field in ['id'] + CUSTOMER_DETAILS},
+                       similarity=similarity) for customer, similarity in matches])
+
+
+async def sales_report(request):
+    group_by = [column for column in request.query.get('group_by', 'period').split(',') if column]
+    filters = {dimension: request.query.getall(dimension) for dimension in DIMENSIONS
+               if dimension in request.query}
+    pool = request.app[POOL_KEY]
+
+    def report():
+        session = pool.session_factory()
+        try:
+            return sales_summary(request.query.get('grain', 'day'), request.query.get('start'),
+                                 request.query.get('end'), group_by, filters, session=session)
+        finally:
+            session.close()
+    return _json(await pool.read(report))
+
+
+def import_result_to_dict(result, rejects=True):
+    data = {name: getattr(result, name) for name in
+            ['file_hash', 'already_imported', 'rows_read', 'inserted', 'rejected', 'repriced',
+             'duplicates', 'updated', 'elapsed', 'cancelled']}
+    if rejects:
+        data['rejects'] = [[reject.row_number, reject.column, reject.reason]
+                           for reject in result.rejects[:MAX_REJECTS_SENT]]
+    return data
+
+
+def _run_import(engine, drain, file_name, options, report, cancelled):
+    from src.importer.engine import import_file
+
+    def progress(result):
+        report(result)
+        drain()  # let queued terminal writes commit between chunks
+    return import_file(file_name, engine=engine, progress=progress, cancelled=cancelled, **options)
+
+
+async def import_upload(request):
+    """Import the uploaded file, streaming progress as JSON lines.
+
+    The body is the raw file; `file_name` names it (its extension picks
+    the reader). Every line is {"progress": {...}}, then one {"result": ...}
+    or {"error": ...}. Closing the connection cancels the import at the
+    next chunk.
+    """
+    from src.importer.engine import ON_DUPLICATE_SKIP, ImportFileError
+    file_name = os.path.basename(request.query.get('file_name', ''))
+    if not file_name:
+        raise web.HTTPBadRequest(text="file_name is required")
+    options = {'force': request.query.get('force') in ('1', 'true'),
+               'on_duplicate': request.query.get('on_duplicate', ON_DUPLICATE_SKIP)}
+
+    upload_dir = tempfile.mkdtemp(prefix='gold-import-')
+    try:
+        path = os.path.join(upload_dir, file_name)
+        with open(path, 'wb') as f:
+            async for block in request.content.iter_chunked(UPLOAD_BLOCK_SIZE):
+                f.write(block)
+
+        response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+        await response.prepare(request)
+        loop = asyncio.get_running_loop()
+        updates = asyncio.Queue()
+        stop = threading.Event()
+
+        def report(result):
+            loop.call_soon_threadsafe(updates.put_nowait, import_result_to_dict(result, rejects=False))
+
+        job = asyncio.ensure_future(request.app[POOL_KEY].exclusive(
+            _run_import, path, options, report, stop.is_set))
+        job.add_done_callback(lambda _: updates.put_nowait(None))
+        while (update := await updates.get()) is not None:
+            try:
+                await response.write(_dumps_line({'progress': update}))
+            except ConnectionError:
+                logger.info(f"Terminal disconnected; cancelling the import of {file_name}")
+                stop.set()
+
+        try:
+            line = {'result': import_result_to_dict(job.result())}
+        except ImportFileError as e:
+            line = {'error': str(e)}
+        except Exception as e:
+            logger.exception(f"Import of {file_name} failed")
+            line = {'error': f"Failed to import file: {str(e)}"}
+        if not stop.is_set():
+            await response.write(_dumps_line(line))
+            await response.write_eof()
+        return response
+    finally:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+
+
+def create_app(engine=None, readers=None, max_batch=None):
+    """The HTTP API over `engine` (default: the application database)"""
+    from src.server.pool import DEFAULT_MAX_BATCH, DEFAULT_READERS, DatabasePool
+    engine = engine or default_engine
+    app = web.Application(middlewares=[error_middleware])
+
+    async def open_pool(app):
+        migrate(engine)
+        app[POOL_KEY] = DatabasePool(engine, readers or DEFAULT_READERS, max_batch or DEFAULT_MAX_BATCH)
+
+    async def close_pool(app):
+        app[POOL_KEY].close()
+
+    app.on_startup.append(open_pool)
+    app.on_cleanup.append(close_pool)
+    app.add_routes([
+        web.get('/health', health),
+        web.get('/customers', list_customers),
+        web.post('/customers', add_customer),
+        web.get('/customers/{id:\\d+}', get_customer),
+        web.put('/customers/{id:\\d+}', update_customer),
+        web.delete('/customers/{id:\\d+}', delete_customer),
+        web.get('/customer-history/{id:\\d+}', customer_history),
+        web.get('/similar-customers', similar_customers),
+        web.get('/phone-lookup', find_by_phone),
+        web.post('/import', import_upload),
+        web.get('/reports/sales', sales_report),
+    ])
+    return app
@@ -0,0 +1,212 @@
+import os
+import json
+import logging
+from datetime import datetime
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+from src.database.customers import CUSTOMER_DETAILS
+from src.database.models import Customer, Purchase
+from src.database.repository import LIST_COLUMNS, CustomerRepository, ListRow, INSERTED, UPDATED, DELETED
+from src.database.search import SIMILARITY_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 30  # seconds
+
+
+class ServerError(Exception):
+    """Raised when the purchase server cannot be reached or refuses a request"""
+
+
+def _json_default(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _open(server_url, method, path, params=None, body=None, headers=None, timeout=DEFAULT_TIMEOUT):
+    url = server_url.rstrip('/') + path
+    if params:
+        url += '?' + urlencode({key: value for key, value in params.items() if value is not None}, doseq=True)
+    request = Request(url, data=body, method=method, headers=headers or {})
+    try:
+        return urlopen(request, timeout=timeout)
+    except HTTPError as e:
+        try:
+            message = json.loads(e.read()).get('error')
+        except ValueError:
+            message = None
+        raise ServerError(message or f"{e.code} {e.reason}") from e
+    except (URLError, OSError) as e:
+        raise ServerError(f"Cannot reach the server at {server_url}: {getattr(e, 'reason', e)}") from e
+
+
+def customer_from_dict(data):
+    """A detached Purchase and its Customer built from a list row of the server's JSON"""
+    data = dict(data)
+    if data.get('purchase_date'):
+        data['purchase_date'] = datetime.fromisoformat(data['purchase_date'])
+    details = {key: data.pop(key) for key in CUSTOMER_DETAILS if key in data}
+    return Purchase(customer=Customer(id=data.get('customer_id'), **details), **data)
+
+
+def list_row_from_dict(data):
+    """A ListRow from the server's JSON"""
+    if data.get('purchase_date'):
+        data = dict(data, purchase_date=datetime.fromisoformat(data['purchase_date']))
+    return ListRow(*(data.get(name) for name in LIST_COLUMNS))
+
+
+class RemoteCustomerRepository(CustomerRepository):
+    """CustomerRepository that talks to the purchase server instead of the file.
+
+    Same interface and change events as the local repository, so the table
+    model and forms work unchanged. Listeners hear about this terminal's
+    own writes; rows other terminals change show up on the next refresh.
+    """
+
+    def __init__(self, server_url, timeout=DEFAULT_TIMEOUT):
+        super().__init__(session_factory=None)
+        self.server_url = server_url
+        self.timeout = timeout
+
+    def _request(self, method, path, params=None, payload=None):
+        body = None if payload is None else json.dumps(payload, default=_json_default).encode('utf-8')
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        with _open(self.server_url, method, path, params, body, headers, self.timeout) as response:
+            return json.loads(response.read())
+
+    def health(self):
+        return self._request('GET', '/health')
+
+    def fetch_page(self, after_id=None, limit=200, search=None, sort_by='id', descending=False,
+                   after_value=None):
+        params = {'after_id': after_id, 'limit': limit, 'search': search, 'sort_by': sort_by,
+                  'descending': int(descending)}
+        if after_id is not None and sort_by != 'id':
+            params['after_value'] = json.dumps(after_value, default=_json_default)
+        rows = self._request('GET', '/customers', params)
+        return [list_row_from_dict(row) for row in rows]
+
+    def fetch_by_ids(self, ids, search=None):
+        rows = self._request('GET', '/customers', {'ids': ','.join(str(i) for i in ids), 'search': search})
+        return [list_row_from_dict(row) for row in rows]
+
+    def get(self, customer_id):
+        try:
+            return customer_from_dict(self._request('GET', f'/customers/{int(customer_id)}'))
+        except ServerError as e:
+            if isinstance(e.__cause__, HTTPError) and e.__cause__.code == 404:
+                return None
+            raise
+
+    def customer_history(self, customer_id, limit=None):
+        history = self._request('GET', f'/customer-history/{int(customer_id)}', {'limit': limit})
+        return [list_row_from_dict(row) for row in history['purchases']]
+
+    def customer_summary(self, customer_id):
+        summary = self._request('GET', f'/customer-history/{int(customer_id)}', {'limit': 0})['summary']
+        for key in ('first_purchase', 'last_purchase'):
+            if summary[key]:
+                summary[key] = datetime.fromisoformat(summary[key])
+        return summary
+
+    def find_by_phone(self, phone_number):
+        try:
+            row = self._request('GET', '/phone-lookup', {'phone': phone_number})
+        except ServerError as e:
+            if isinstance(e.__cause__, HTTPError) and e.__cause__.code == 404:
+                return None
+            raise
+        return Customer(**{key: row[key] for key in ['id'] + CUSTOMER_DETAILS})
+
+    def similar_customers(self, name, limit=10, threshold=SIMILARITY_THRESHOLD):
+        rows = self._request('GET', '/similar-customers', {'name': name, 'limit': limit, 'threshold': threshold})
+        return [(Customer(**{key: row[key] for key in ['id'] + CUSTOMER_DETAILS}), row['similarity'])
+                for row in rows]
+
+    def add(self, customer_data):
+        purchase_id = self._request('POST', '/customers', payload=customer_data)['id']
+        self._notify(INSERTED, purchase_id)
+        return purchase_id
+
+    def _write(self, method, purchase_id, payload=None):
+        """The server's reply, or None if the purchase is gone"""
+        try:
+            return self._request(method, f'/customers/{int(purchase_id)}', payload=payload)
+        except ServerError as e:
+            if isinstance(e.__cause__, HTTPError) and e.__cause__.code == 404:
+                return None
+            raise
+
+    def update(self, purchase_id, customer_data):
+        """Apply `customer_data` to a purchase and its customer; returns False if it is gone.
+
+        Like CustomerRepository.update, notifies every purchase whose row
+        changed: all of the customer's purchases when their details did.
+        """
+        reply = self._write('PUT', purchase_id, customer_data)
+        if reply is None:
+            return False
+        for changed_id in reply['updated']:
+            self._notify(UPDATED, changed_id)
+        return True
+
+    def delete(self, purchase_id):
+        """Delete a purchase; returns False if it was already gone"""
+        if self._write('DELETE', purchase_id) is None:
+            return False
+        self._notify(DELETED, purchase_id)
+        return True
+
+
+def _import_result(file_name, data):
+    from src.importer.engine import ImportResult, RejectedRow
+    result = ImportResult(file_name)
+    for name, value in data.items():
+        if name == 'rejects':
+            result.rejects = [RejectedRow(*reject) for reject in value]
+        elif name == 'already_imported' and value:
+            result.already_imported = datetime.fromisoformat(value)
+        else:
+            setattr(result, name, value)
+    return result
+
+
+def import_file(server_url, file_name, progress=None, cancelled=None, force=False, on_duplicate='skip',
+                timeout=None):
+    """Upload a file to the server's importer; same contract as importer.engine.import_file.
+
+    The server streams progress after every chunk. Cancelling closes the
+    connection, which stops the import at the server's next chunk; the
+    returned result then shows the last progress the server reported.
+    """
+    from src.importer.readers import ImportFileError
+    params = {'file_name': os.path.basename(file_name), 'force': int(force), 'on_duplicate': on_duplicate}
+    try:
+        upload = open(file_name, 'rb')
+    except OSError as e:
+        raise ImportFileError(f"Cannot read file: {str(e)}") from e
+    with upload:
+        headers = {'Content-Type': 'application/octet-stream',
+                   'Content-Length': str(os.fstat(upload.fileno()).st_size)}
+        try:
+            response = _open(server_url, 'POST', '/import', params, upload, headers, timeout)
+        except ServerError as e:
+            raise ImportFileError(str(e)) from e
+    with response:
+        for line in response:
+            message = json.loads(line)
+            if 'error' in message:
+                raise ImportFileError(message['error'])
+            result = _import_result(file_name, message.get('progress') or message['result'])
+            if 'result' in message:
+                return result
+            if progress is not None:
+                progress(result)
+            if cancelled is not None and cancelled():
+                result.cancelled = True
+                logger.info(f"Import cancelled after {result.rows_read} rows")
+                return result
+    raise ImportFileError("The server closed the connection before the import finished")
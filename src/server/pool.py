@@ -0,0 +1,141 @@
+import queue
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from sqlalchemy.orm import sessionmaker
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_READERS = 4
+DEFAULT_MAX_BATCH = 64
+
+
+class _WriteJob:
+    __slots__ = ('function', 'args', 'future', 'exclusive')
+
+    def __init__(self, function, args, exclusive=False):
+        self.function = function
+        self.args = args
+        self.future = Future()
+        self.exclusive = exclusive
+
+
+class DatabasePool:
+    """One writer thread and a pool of reader threads over a WAL database.
+
+    Every write goes through a single writer connection, so terminals queue
+    for the write lock inside the server instead of failing with "database
+    is locked". Writes waiting in the queue are committed together: each
+    runs in its own SAVEPOINT, so one failing write does not undo the
+    others, and a single COMMIT (one WAL sync) covers the whole batch.
+    Results are delivered only after that commit.
+
+    Reads run on `readers` threads, each with its own pooled connection;
+    under WAL they never wait for the writer. They open their sessions with
+    `session_factory`, which is bound to the same engine as the writer.
+    """
+
+    def __init__(self, engine, readers=DEFAULT_READERS, max_batch=DEFAULT_MAX_BATCH):
+        self.engine = engine
+        self.session_factory = sessionmaker(bind=engine)
+        self.max_batch = max_batch
+        self._jobs = queue.Queue()
+        self._pending = False  # a job taken off the queue but not run yet
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix='db-reader')
+        self._writer = threading.Thread(target=self._write_loop, name='db-writer', daemon=True)
+        self._writer.start()
+
+    async def read(self, function, *args):
+        """Run `function(*args)` on a reader thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, function, *args)
+
+    async def write(self, function, *args):
+        """Run `function(conn, *args)` in the next write batch; returns its result after COMMIT"""
+        job = _WriteJob(function, args)
+        self._jobs.put(job)
+        return await asyncio.wrap_future(job.future)
+
+    async def exclusive(self, function, *args):
+        """Run `function(engine, drain, *args)` alone on the writer thread.
+
+        For long jobs such as imports that manage their own transactions.
+        Calling `drain()` between two of its transactions commits the writes
+        that queued up meanwhile, so other terminals wait at most one step.
+        """
+        job = _WriteJob(function, args, exclusive=True)
+        self._jobs.put(job)
+        return await asyncio.wrap_future(job.future)
+
+    def close(self):
+        self._jobs.put(None)
+        self._writer.join()
+        self._readers.shutdown(wait=True)
+
+    def _next_batch(self, first):
+        batch = [first]
+        while len(batch) < self.max_batch:
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is None or job.exclusive:
+                # Keep the queue order: run these after the batch
+                self._pending = job
+                break
+            batch.append(job)
+        return batch
+
+    def _write_loop(self):
+        with self.engine.connect() as conn:
+            while True:
+                if self._pending is not False:
+                    job, self._pending = self._pending, False
+                else:
+                    job = self._jobs.get()
+                if job is None:
+                    break
+                if job.exclusive:
+                    self._run_exclusive(conn, job)
+                else:
+                    self._commit_batch(conn, self._next_batch(job))
+
+    def _run_exclusive(self, conn, job):
+        def drain():
+            # Called from inside the job, between its transactions
+            while self._pending is False:
+                try:
+                    queued = self._jobs.get_nowait()
+                except queue.Empty:
+                    return
+                if queued is None or queued.exclusive:
+                    self._pending = queued
+                    return
+                self._commit_batch(conn, self._next_batch(queued))
+
+        try:
+            job.future.set_result(job.function(self.engine, drain, *job.args))
+        except Exception as e:
+            job.future.set_exception(e)
+
+    def _commit_batch(self, conn, batch):
+        outcomes = []
+        try:
+            with conn.begin():
+                for job in batch:
+                    try:
+                        with conn.begin_nested():
+                            outcomes.append((True, job.function(conn, *job.args)))
+                    except Exception as e:
+                        outcomes.append((False, e))
+        except Exception as e:
+            logger.error(f"Write batch of {len(batch)} failed to commit: {str(e)}")
+            for job in batch:
+                job.future.set_exception(e)
+            return
+        for job, (ok, value) in zip(batch, outcomes):
+            if ok:
+                job.future.set_result(value)
+            else:
+                job.future.set_exception(value)
@@ -0,0 +1,170 @@
+"""Repository calls off the GUI thread.
+
+AsyncRepository runs the methods of a CustomerRepository (local or remote)
+on a small thread pool and hands each result back on the GUI thread, so a
+slow query or a wait for the write lock never freezes the window. Every
+call gets its own session from the repository, opened and closed on the
+worker thread that runs it.
+
+Calls submitted under a key supersede the previous call with the same key:
+one still queued is dropped, and a running SQLite query is interrupted at
+its next progress check. Its callbacks are never called. This is how a
+stale search keystroke or a page of a list that was re-sorted meanwhile
+gets out of the way. Writes are submitted without a key and always run.
+"""
+import logging
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from sqlalchemy import event
+from PyQt5.QtCore import Qt, QObject, QCoreApplication, QEventLoop, pyqtSignal
+from src.diagnostics import diagnostics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+# SQLite virtual machine steps between checks for a superseded query
+PROGRESS_STEPS = 1000
+
+
+class QueryTask:
+    """One submitted call; `future` is its concurrent.futures.Future"""
+
+    __slots__ = ('key', 'future', 'on_done', 'on_error', 'superseded')
+
+    def __init__(self, key, on_done, on_error):
+        self.key = key
+        self.future = None
+        self.on_done = on_done
+        self.on_error = on_error
+        self.superseded = False
+
+    def cancel(self):
+        """Drop the call: its callbacks will not run and a running query stops"""
+        self.superseded = True
+        if self.future is not None:
+            self.future.cancel()
+
+    def __repr__(self):
+        return f"<QueryTask(key={self.key!r}, superseded={self.superseded})>"
+
+
+class AsyncRepository(QObject):
+    """Runs repository calls on worker threads; results arrive on the GUI thread.
+
+    `changed(event, purchase_id)` re-emits the repository's change events
+    on the GUI thread, whichever thread the write ran on.
+    """
+
+    changed = pyqtSignal(str, int)
+    _finished = pyqtSignal(object)
+
+    def __init__(self, repository, workers=DEFAULT_WORKERS, engine=None, parent=None):
+        super().__init__(parent)
+        self.repository = repository
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='db-query')
+        self._latest = {}  # key -> the task that superseded the others
+        self._pending = set()
+        self._local = threading.local()  # the task running on each worker thread
+        # Queued even when a cancel() finishes a task on the GUI thread, so
+        # callbacks never run inside submit()
+        self._finished.connect(self._deliver, Qt.QueuedConnection)
+        repository.subscribe(self._on_change)
+        self.engine = engine
+        if engine is not None:
+            event.listen(engine, 'checkout', self._on_checkout)
+
+    def submit(self, function, *args, key=None, on_done=None, on_error=None, name=None):
+        """Run `function(*args)` on a worker thread.
+
+        `on_done(result)` or `on_error(exception)` is called on the GUI
+        thread when it finishes, unless a later call with the same `key`
+        superseded it. Errors without an `on_error` are logged. `name`
+        times the call as that operation in the diagnostics.
+        """
+        task = QueryTask(key, on_done, on_error)
+        if key is not None:
+            previous = self._latest.get(key)
+            if previous is not None:
+                previous.cancel()
+            self._latest[key] = task
+        self._pending.add(task)
+        task.future = self._executor.submit(self._run, task, function, args, name)
+        task.future.add_done_callback(lambda future: self._finished.emit(task))
+        return task
+
+    def call(self, method, *args, **options):
+        """submit() a method of the repository, by name"""
+        return self.submit(getattr(self.repository, method), *args, **options)
+
+    def cancel(self, key):
+        """Supersede the call submitted under `key`, if it is still running"""
+        task = self._latest.pop(key, None)
+        if task is not None:
+            task.cancel()
+
+    def _run(self, task, function, args, name):
+        if task.superseded:
+            raise CancelledError()
+        self._local.task = task
+        try:
+            if name is None:
+                return function(*args)
+            with diagnostics.timer(name):
+                return function(*args)
+        finally:
+            self._local.task = None
+
+    def _on_change(self, event, purchase_id):
+        self.changed.emit(event, purchase_id)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        # Only queries of keyed calls can be superseded; every other user of
+        # the connection (writes, imports, exports) runs without the handler
+        task = getattr(self._local, 'task', None)
+        if task is not None and task.key is not None:
+            dbapi_connection.set_progress_handler(self._interrupt_superseded, PROGRESS_STEPS)
+        else:
+            dbapi_connection.set_progress_handler(None, 0)
+
+    def _interrupt_superseded(self):
+        task = getattr(self._local, 'task', None)
+        return 1 if task is not None and task.superseded else 0
+
+    def _deliver(self, task):
+        self._pending.discard(task)
+        if task.key is not None and self._latest.get(task.key) is task:
+            del self._latest[task.key]
+        if task.superseded:
+            return
+        try:
+            result = task.future.result()
+        except Exception as e:
+            if task.on_error is not None:
+                task.on_error(e)
+            else:
+                logger.error(f"Database call failed: {str(e)}")
+            return
+        if task.on_done is not None:
+            task.on_done(result)
+
+    def is_busy(self):
+        return bool(self._pending)
+
+    def wait(self):
+        """Process events until every submitted call has been delivered.
+
+        For scripts and benchmarks without a running event loop; the GUI
+        never needs it.
+        """
+        app = QCoreApplication.instance()
+        while self._pending:
+            app.processEvents(QEventLoop.AllEvents | QEventLoop.WaitForMoreEvents)
+
+    def shutdown(self):
+        """Drop the keyed calls, let the writes finish, and stop the workers"""
+        for key in list(self._latest):
+            self.cancel(key)
+        self._executor.shutdown(wait=True)
+        if self.engine is not None:
+            event.remove(self.engine, 'checkout', self._on_checkout)
+        self.repository.unsubscribe(self._on_change)
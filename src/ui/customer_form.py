@@ -3,6 +3,8 @@ from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel,
                              QComboBox, QDateEdit)
 from PyQt5.QtCore import Qt, QDate
 from src.database.models import Customer
+from src.database.customers import phone_key
+from src.pricing import calculate_amounts
 from sqlalchemy.orm import Session
 
 class CustomerForm(QDialog):
@@ -191,14 +193,12 @@ class CustomerForm(QDialog):
         layout.addLayout(button_layout)
 
     def calculate_amounts(self):
-        weight = self.weight_input.value()
-        price = self.price_input.value()
-        discount_percent = self.discount_percent_input.value()
-        
-        total = weight * price
-        discount_amount = total * (discount_percent / 100)
-        final_amount = total - discount_amount
-        
+        total, discount_amount, final_amount = calculate_amounts(
+            self.weight_input.value(),
+            self.price_input.value(),
+            self.discount_percent_input.value()
+        )
+
         self.total_label.setText(f"{total:.2f}")
         self.discount_amount_label.setText(f"{discount_amount:.2f}")
         self.final_amount_label.setText(f"{final_amount:.2f}")
@@ -211,11 +211,16 @@ class CustomerForm(QDialog):
             if not name:
                 QMessageBox.warning(self, "Validation Error", "Customer name is required")
                 return None
+            phone = self.phone_input.text().strip()
+            if phone and phone_key(phone) is None:
+                # Customers are matched by the phone number's digits
+                QMessageBox.warning(self, "Validation Error", "Phone number must contain digits")
+                return None
 
             # Create customer data dictionary
             customer_data = {
                 'customer_name': name,
-                'phone_number': self.phone_input.text().strip(),
+                'phone_number': phone,
                 'email': self.email_input.text().strip(),
                 'address': self.address_input.text().strip(),
                 'state': self.state_input.text().strip(),
@@ -230,9 +235,13 @@ class CustomerForm(QDialog):
             }
 
             # Calculate amounts
-            customer_data['total_amount'] = customer_data['gold_weight'] * customer_data['price_per_gram']
-            customer_data['discount_amount'] = (customer_data['total_amount'] * customer_data['discount_percentage']) / 100
-            customer_data['final_amount'] = customer_data['total_amount'] - customer_data['discount_amount']
+            (customer_data['total_amount'],
+             customer_data['discount_amount'],
+             customer_data['final_amount']) = calculate_amounts(
+                customer_data['gold_weight'],
+                customer_data['price_per_gram'],
+                customer_data['discount_percentage']
+            )
 
             return customer_data
         except ValueError as e:
@@ -0,0 +1,86 @@
+import logging
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableWidget,
+                             QTableWidgetItem, QHeaderView, QAbstractItemView)
+from PyQt5.QtCore import Qt
+from src.ui.customer_table_model import COLUMNS
+
+logger = logging.getLogger(__name__)
+
+HISTORY_LIMIT = 500
+# The customer list's purchase columns; the customer's details are in the title
+HISTORY_COLUMNS = [column for column in COLUMNS
+                   if column[1] not in ('customer_name', 'phone_number', 'email', 'address')]
+
+
+def _format(value, fmt):
+    if value is None:
+        return ""
+    return fmt.format(value) if fmt else str(value)
+
+
+class CustomerHistoryDialog(QDialog):
+    """A customer's lifetime totals and purchases, newest first"""
+
+    def __init__(self, service, customer, parent=None):
+        super().__init__(parent)
+        # An AsyncRepository; the totals and purchases load after the dialog shows
+        self.service = service
+        self.customer_id = customer.id
+        self.setup_ui(customer)
+        self.load()
+
+    def setup_ui(self, customer):
+        contact = ", ".join(value for value in (customer.phone_number, customer.email) if value)
+        self.setWindowTitle(f"Customer History - {customer.customer_name}")
+        self.resize(1000, 500)
+        layout = QVBoxLayout(self)
+
+        self.contact_label = QLabel(f"{customer.customer_name}" + (f" ({contact})" if contact else ""))
+        layout.addWidget(self.contact_label)
+        self.summary_label = QLabel("Loading...")
+        layout.addWidget(self.summary_label)
+
+        self.table = QTableWidget(0, len(HISTORY_COLUMNS))
+        self.table.setHorizontalHeaderLabels([header for header, _, _ in HISTORY_COLUMNS])
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        layout.addWidget(self.table)
+
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.close)
+        button_layout.addWidget(close_button)
+        layout.addLayout(button_layout)
+
+    def load(self):
+        self.service.call('customer_summary', self.customer_id, name='customer_history',
+                          on_done=self.show_summary, on_error=self.show_error)
+        self.service.call('customer_history', self.customer_id, HISTORY_LIMIT, name='customer_history',
+                          on_done=self.show_purchases, on_error=self.show_error)
+
+    def show_error(self, error):
+        logger.error(f"Failed to load customer history: {str(error)}")
+        self.summary_label.setText(f"Failed to load customer history: {str(error)}")
+
+    def show_summary(self, summary):
+        if summary['purchases']:
+            self.summary_label.setText(
+                f"{summary['purchases']:,} purchase{'s' if summary['purchases'] != 1 else ''}, "
+                f"{summary['grams'] or 0:,.3f} g, "
+                f"₹{summary['final_amount'] or 0:,.2f} in total; first on "
+                f"{summary['first_purchase']:%Y-%m-%d}, last on {summary['last_purchase']:%Y-%m-%d}"
+                + (f" (newest {HISTORY_LIMIT} shown)" if summary['purchases'] > HISTORY_LIMIT else ""))
+        else:
+            self.summary_label.setText("No purchases in the database (older ones may be archived)")
+
+    def show_purchases(self, purchases):
+        self.table.setRowCount(len(purchases))
+        for row, purchase in enumerate(purchases):
+            for column, (_, attribute, fmt) in enumerate(HISTORY_COLUMNS):
+                item = QTableWidgetItem(_format(getattr(purchase, attribute), fmt))
+                if fmt:
+                    item.setTextAlignment(int(Qt.AlignRight | Qt.AlignVCenter))
+                self.table.setItem(row, column, item)
@@ -0,0 +1,247 @@
+from bisect import bisect_left
+from functools import partial
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QVariant, pyqtSignal
+from src.database.repository import CustomerRepository, SORT_COLUMNS, INSERTED, UPDATED, DELETED
+from src.ui.async_repository import AsyncRepository
+
+# (header, attribute, format) for every column shown in the customer table
+COLUMNS = [
+    ("ID", "id", None),
+    ("Name", "customer_name", None),
+    ("Phone", "phone_number", None),
+    ("Email", "email", None),
+    ("Address", "address", None),
+    ("State", "state", None),
+    ("Date", "purchase_date", "{:%Y-%m-%d}"),
+    ("Gold Type", "gold_type", None),
+    ("Gold Quality", "gold_quality", None),
+    ("Gold Weight (g)", "gold_weight", "{:.3f}"),
+    ("Price (₹/g)", "price_per_gram", "{:.2f}"),
+    ("Total Amount (₹)", "total_amount", "{:.2f}"),
+    ("Final Amount (₹)", "final_amount", "{:.2f}"),
+]
+
+
+class _Descending:
+    """Wraps a sort key so that bisect works on a descending list"""
+
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+
+class CustomerTableModel(QAbstractTableModel):
+    """Table model that pages customers in from the database as the view scrolls.
+
+    Rows are kept in the order of the current sort column (then id), which
+    the database applies with keyset paging; sort() only changes the query.
+    Repository change events patch only the affected row, so scroll
+    position, filter and selection survive edits.
+
+    Queries run on the service's worker threads (see async_repository.py)
+    and rows are added when they arrive. A new search or sort supersedes
+    the page still loading for the previous one.
+    """
+
+    PAGE_SIZE = 200
+
+    page_loaded = pyqtSignal(int)  # rows now loaded
+    load_failed = pyqtSignal(str)
+
+    def __init__(self, service=None, parent=None):
+        super().__init__(parent)
+        self.service = service or AsyncRepository(CustomerRepository(), parent=self)
+        self._rows = []
+        self._keys = []  # Parallel to _rows, in list order, for bisecting
+        self._key_of = {}  # id -> list key of every loaded row
+        self._has_more = False  # until refresh() loads the first page
+        self._loading = False  # a page is on its way
+        self._generation = 0  # bumped by every refresh(); older results are stale
+        self._search = ""
+        self._sort_by = 'id'
+        self._descending = False
+        self.service.changed.connect(self.on_customer_changed)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return QVariant()
+        if orientation == Qt.Horizontal:
+            return COLUMNS[section][0]
+        return section + 1
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+        _, attribute, fmt = COLUMNS[index.column()]
+        if role == Qt.DisplayRole:
+            value = getattr(self._rows[index.row()], attribute)
+            if value is None:
+                return ""
+            return fmt.format(value) if fmt else str(value)
+        if role == Qt.TextAlignmentRole and fmt:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return QVariant()
+
+    def _list_key(self, customer):
+        """Where `customer` belongs in the list; NULLs first, as SQLite sorts them"""
+        if self._sort_by == 'id':
+            key = (customer.id,)
+        else:
+            value = getattr(customer, self._sort_by)
+            key = (value is not None, value, customer.id)
+        return _Descending(key) if self._descending else key
+
+    def is_sortable(self, column):
+        return COLUMNS[column][1] in SORT_COLUMNS
+
+    def sort_order(self):
+        """(column, Qt.SortOrder) the rows are currently sorted by"""
+        column = next(i for i, (_, attribute, _) in enumerate(COLUMNS) if attribute == self._sort_by)
+        return column, Qt.DescendingOrder if self._descending else Qt.AscendingOrder
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """Reload ordered by `column`; columns without an index are ignored"""
+        if not self.is_sortable(column):
+            return
+        sort_by, descending = COLUMNS[column][1], order == Qt.DescendingOrder
+        if (sort_by, descending) == (self._sort_by, self._descending):
+            return
+        self._sort_by, self._descending = sort_by, descending
+        self.refresh('sort')
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._has_more
+
+    def fetchMore(self, parent=QModelIndex(), operation='fetch_more'):
+        if parent.isValid() or not self._has_more or self._loading:
+            return
+        self._loading = True
+        last = self._rows[-1] if self._rows else None
+        self.service.call(
+            'fetch_page', last.id if last else None, self.PAGE_SIZE, self._search, self._sort_by,
+            self._descending, getattr(last, self._sort_by) if last else None,
+            key='page', name=operation, on_done=partial(self._add_page, self._generation),
+            on_error=self._page_failed)
+
+    def _add_page(self, generation, page):
+        if generation != self._generation:
+            return
+        self._loading = False
+        self._has_more = len(page) == self.PAGE_SIZE
+        # A row patched in while the page was loading may be in it too
+        page = [customer for customer in page if customer.id not in self._key_of]
+        if page:
+            first = len(self._rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+            self._rows.extend(page)
+            for customer in page:
+                key = self._list_key(customer)
+                self._keys.append(key)
+                self._key_of[customer.id] = key
+            self.endInsertRows()
+        self.page_loaded.emit(len(self._rows))
+
+    def _page_failed(self, error):
+        self._loading = False
+        self._has_more = False
+        self.load_failed.emit(str(error))
+
+    def refresh(self, operation='load_customers'):
+        """Drop every loaded row and start paging again from the first one"""
+        self.beginResetModel()
+        self._generation += 1
+        self._rows = []
+        self._keys = []
+        self._key_of = {}
+        self._has_more = True
+        self._loading = False  # the page still loading is superseded below
+        self.endResetModel()
+        self.fetchMore(operation=operation)
+
+    def set_search(self, text):
+        self._search = text.strip()
+        self.refresh('search_customers')
+
+    def wait(self):
+        """Block until the pages and row updates asked for have arrived (for scripts)"""
+        self.service.wait()
+
+    def load_new_rows(self):
+        """Make rows appended in bulk (imports) reachable without a reset"""
+        if (self._sort_by, self._descending) != ('id', False):
+            # New rows can land anywhere in this order
+            self.refresh()
+        elif not self._has_more:
+            self._has_more = True
+            self.fetchMore()
+
+    def row_of(self, customer_id):
+        """Row currently showing `customer_id`, or -1 if it is not loaded"""
+        key = self._key_of.get(customer_id)
+        return -1 if key is None else bisect_left(self._keys, key)
+
+    def on_customer_changed(self, event, customer_id):
+        row = self.row_of(customer_id)
+        if event == DELETED:
+            if row >= 0:
+                self._remove_row(row)
+            return
+
+        # A new id past the last loaded one will arrive with the next page anyway
+        if (row < 0 and self._has_more and self._sort_by == 'id' and not self._descending
+                and self._rows and customer_id > self._rows[-1].id):
+            return
+        self.service.call('fetch_by_ids', [customer_id], self._search, name='fetch_by_ids',
+                          on_done=partial(self._patch_row, self._generation, customer_id))
+
+    def _patch_row(self, generation, customer_id, matches):
+        if generation != self._generation:
+            return  # the list was reloaded meanwhile
+        row = self.row_of(customer_id)
+        if not matches:
+            if row >= 0:
+                self._remove_row(row)  # No longer matches the search filter
+            return
+        customer = matches[0]
+        key = self._list_key(customer)
+        if row >= 0 and key == self._keys[row]:
+            self._rows[row] = customer
+            self.dataChanged.emit(self.index(row, 0), self.index(row, len(COLUMNS) - 1))
+            return
+        if row >= 0:
+            self._remove_row(row)  # The edit moved it; re-insert below
+        # Past the last loaded row it will arrive with a later page instead
+        if self._has_more and self._keys and self._keys[-1] < key:
+            return
+        row = bisect_left(self._keys, key)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._rows.insert(row, customer)
+        self._keys.insert(row, key)
+        self._key_of[customer_id] = key
+        self.endInsertRows()
+
+    def _remove_row(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._key_of[self._rows[row].id]
+        del self._rows[row]
+        del self._keys[row]
+        self.endRemoveRows()
+
+    def customer_at(self, row):
+        """Return the ListRow (see repository.py) shown at `row`, or None"""
+        if 0 <= row < len(self._rows):
+            return self._rows[row]
+        return None
@@ -0,0 +1,174 @@
+import logging
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QCheckBox,
+                             QTabWidget, QTableWidget, QTableWidgetItem, QPlainTextEdit, QSplitter,
+                             QHeaderView, QAbstractItemView, QFileDialog, QMessageBox)
+from PyQt5.QtCore import Qt, QTimer
+from src.diagnostics import diagnostics
+
+logger = logging.getLogger(__name__)
+
+REFRESH_INTERVAL_MS = 1000
+STATEMENTS_SHOWN = 200
+
+# (header, key, format) of the timings and statements tables
+TIMER_COLUMNS = [
+    ("Operation", 'name', None),
+    ("Count", 'count', "{:,}"),
+    ("Mean (ms)", 'mean_ms', "{:.1f}"),
+    ("p50 (ms)", 'p50_ms', "{:.1f}"),
+    ("p95 (ms)", 'p95_ms', "{:.1f}"),
+    ("Max (ms)", 'max_ms', "{:.1f}"),
+    ("SQL share", 'sql_share', "{:.0%}"),
+    ("Statements", 'statements', "{:,}"),
+    ("Rows", 'rows', "{:,}"),
+]
+STATEMENT_COLUMNS = [
+    ("Total (ms)", 'total_ms', "{:.1f}"),
+    ("Count", 'count', "{:,}"),
+    ("Mean (ms)", 'mean_ms', "{:.2f}"),
+    ("p95 (ms)", 'p95_ms', "{:.2f}"),
+    ("Max (ms)", 'max_ms', "{:.1f}"),
+    ("Rows changed", 'rows', "{:,}"),
+    ("Statement", 'statement', None),
+]
+SLOW_QUERY_COLUMNS = [
+    ("At", 'at', None),
+    ("Time (ms)", 'elapsed_ms', "{:.0f}"),
+    ("Statement", 'statement', None),
+]
+
+
+def _fill_table(table, columns, entries):
+    table.setRowCount(len(entries))
+    for row, entry in enumerate(entries):
+        for column, (_, key, fmt) in enumerate(columns):
+            value = entry[key]
+            item = QTableWidgetItem(fmt.format(value) if fmt else str(value))
+            if fmt:
+                item.setTextAlignment(int(Qt.AlignRight | Qt.AlignVCenter))
+            table.setItem(row, column, item)
+
+
+def _table(columns):
+    table = QTableWidget(0, len(columns))
+    table.setHorizontalHeaderLabels([header for header, _, _ in columns])
+    table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+    table.setSelectionBehavior(QAbstractItemView.SelectRows)
+    table.verticalHeader().setVisible(False)
+    table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+    table.horizontalHeader().setStretchLastSection(True)
+    return table
+
+
+class DiagnosticsDialog(QDialog):
+    """Live view of the diagnostics collector, with JSON export"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.slow_queries = []
+        self.setup_ui()
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(REFRESH_INTERVAL_MS)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def setup_ui(self):
+        self.setWindowTitle("Diagnostics")
+        self.resize(1000, 600)
+        self.setWindowModality(Qt.NonModal)
+        layout = QVBoxLayout(self)
+
+        top_layout = QHBoxLayout()
+        self.enabled_input = QCheckBox("Collect diagnostics")
+        self.enabled_input.setChecked(diagnostics.enabled)
+        self.enabled_input.toggled.connect(self.set_enabled)
+        top_layout.addWidget(self.enabled_input)
+        self.summary_label = QLabel("")
+        top_layout.addWidget(self.summary_label, 1)
+        layout.addLayout(top_layout)
+
+        tabs = QTabWidget()
+        self.timers_table = _table(TIMER_COLUMNS)
+        tabs.addTab(self.timers_table, "Operations")
+        self.statements_table = _table(STATEMENT_COLUMNS)
+        tabs.addTab(self.statements_table, "SQL statements")
+
+        splitter = QSplitter(Qt.Vertical)
+        self.slow_table = _table(SLOW_QUERY_COLUMNS)
+        self.slow_table.itemSelectionChanged.connect(self.show_plan)
+        self.plan_view = QPlainTextEdit()
+        self.plan_view.setReadOnly(True)
+        splitter.addWidget(self.slow_table)
+        splitter.addWidget(self.plan_view)
+        tabs.addTab(splitter, "Slow queries")
+        layout.addWidget(tabs)
+
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        reset_button = QPushButton("Reset")
+        reset_button.clicked.connect(self.reset)
+        save_button = QPushButton("Save JSON...")
+        save_button.clicked.connect(self.save)
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.close)
+        button_layout.addWidget(reset_button)
+        button_layout.addWidget(save_button)
+        button_layout.addWidget(close_button)
+        layout.addLayout(button_layout)
+
+    def set_enabled(self, enabled):
+        if enabled:
+            diagnostics.enable()
+        else:
+            diagnostics.disable()
+        self.refresh()
+
+    def showEvent(self, event):
+        self.refresh()
+        self.refresh_timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        snapshot = diagnostics.snapshot()
+        state = "collecting" if snapshot['enabled'] else "off"
+        self.summary_label.setText(
+            f"{state} since {snapshot['collecting_since']}; statements slower than "
+            f"{snapshot['slow_query_ms']:.0f} ms are logged with their query plan")
+        _fill_table(self.timers_table, TIMER_COLUMNS,
+                    [{'name': name, **stats} for name, stats in snapshot['timers'].items()])
+        _fill_table(self.statements_table, STATEMENT_COLUMNS, snapshot['statements'][:STATEMENTS_SHOWN])
+        if snapshot['slow_queries'][-1:] != self.slow_queries[:1]:
+            # Newest first; only rebuilt when there are new ones, to keep the selection
+            self.slow_queries = list(reversed(snapshot['slow_queries']))
+            _fill_table(self.slow_table, SLOW_QUERY_COLUMNS, self.slow_queries)
+
+    def show_plan(self):
+        rows = self.slow_table.selectionModel().selectedRows()
+        if not rows:
+            self.plan_view.clear()
+            return
+        query = self.slow_queries[rows[0].row()]
+        self.plan_view.setPlainText(
+            f"{query['statement']}\n\nParameters: {query['parameters']}\n"
+            f"Rows changed: {query['rows']}\n\nQuery plan:\n" + '\n'.join(query['plan']))
+
+    def reset(self):
+        diagnostics.reset()
+        self.slow_queries = []
+        self.slow_table.setRowCount(0)
+        self.plan_view.clear()
+        self.refresh()
+
+    def save(self):
+        file_name, _ = QFileDialog.getSaveFileName(self, "Save Diagnostics", "diagnostics.json",
+                                                   "JSON Files (*.json)")
+        if not file_name:
+            return
+        try:
+            diagnostics.save(file_name)
+        except OSError as e:
+            logger.error(f"Cannot save diagnostics: {str(e)}")
+            QMessageBox.warning(self, "Save Error", f"Failed to save diagnostics: {str(e)}")
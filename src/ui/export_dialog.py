@@ -0,0 +1,223 @@
+import os
+import logging
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, QLabel, QPushButton,
+                             QProgressBar, QComboBox, QDateEdit, QCheckBox, QFileDialog, QMessageBox)
+from PyQt5.QtCore import Qt, QDate, QObject, QThread, pyqtSignal
+from sqlalchemy import select
+from src.database.models import SalesMonthly, Session
+from src.diagnostics import diagnostics
+
+logger = logging.getLogger(__name__)
+
+ALL_STATES = "All states"
+ALL_GOLD_TYPES = "All gold types"
+# (label, extension, file dialog filter)
+FORMATS = [
+    ("CSV", '.csv', "CSV Files (*.csv)"),
+    ("Excel", '.xlsx', "Excel Files (*.xlsx)"),
+    ("Parquet", '.parquet', "Parquet Files (*.parquet)"),
+]
+
+
+class ExportWorker(QObject):
+    """Runs an export off the GUI thread and reports progress through signals"""
+
+    progress = pyqtSignal(int, int)  # rows written, total rows
+    finished = pyqtSignal(object)  # ExportResult
+    failed = pyqtSignal(str)
+
+    def __init__(self, file_name, filters):
+        super().__init__()
+        self.file_name = file_name
+        self.filters = filters
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def run(self):
+        from src.exporter.engine import export_customers
+        from src.exporter.writers import ExportError
+        try:
+            with diagnostics.timer('export') as timer:
+                result = export_customers(self.file_name, progress=self._report,
+                                          cancelled=self.is_cancelled, **self.filters)
+                timer.rows = result.written
+        except ExportError as e:
+            self.failed.emit(str(e))
+            return
+        except Exception as e:
+            logger.error(f"Export failed: {str(e)}")
+            self.failed.emit(f"Failed to export customers: {str(e)}")
+            return
+        self.finished.emit(result)
+
+    def _report(self, result):
+        self.progress.emit(result.written, result.total)
+
+
+def _dimension_values(column):
+    """Distinct values of a summary dimension; the summary table is tiny"""
+    session = Session()
+    try:
+        query = select(column).where(column != '').distinct().order_by(column)
+        return [value for value in session.execute(query).scalars()]
+    finally:
+        session.close()
+
+
+class ExportDialog(QDialog):
+    """Choose filters and a file, then export in the background with progress"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.worker_thread = None
+        self.worker = None
+        self.setup_ui()
+
+    def setup_ui(self):
+        self.setWindowTitle("Export Customers")
+        self.setMinimumWidth(420)
+        self.setWindowModality(Qt.NonModal)
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+
+        self.date_filter = QCheckBox("Only purchases between")
+        self.date_filter.setChecked(True)
+        today = QDate.currentDate()
+        self.start_input = QDateEdit(QDate(today.year(), today.month(), 1))
+        self.start_input.setCalendarPopup(True)
+        self.end_input = QDateEdit(today)
+        self.end_input.setCalendarPopup(True)
+        self.date_filter.toggled.connect(self.start_input.setEnabled)
+        self.date_filter.toggled.connect(self.end_input.setEnabled)
+        date_layout = QHBoxLayout()
+        date_layout.addWidget(self.start_input)
+        date_layout.addWidget(QLabel("and"))
+        date_layout.addWidget(self.end_input)
+        form.addRow(self.date_filter, date_layout)
+
+        self.state_input = QComboBox()
+        self.state_input.addItems([ALL_STATES] + _dimension_values(SalesMonthly.state))
+        form.addRow("State:", self.state_input)
+
+        self.gold_type_input = QComboBox()
+        self.gold_type_input.addItems([ALL_GOLD_TYPES] + _dimension_values(SalesMonthly.gold_type))
+        form.addRow("Gold Type:", self.gold_type_input)
+
+        self.format_input = QComboBox()
+        self.format_input.addItems([label for label, _, _ in FORMATS])
+        form.addRow("Format:", self.format_input)
+        layout.addLayout(form)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setVisible(False)
+        layout.addWidget(self.progress_bar)
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        self.export_button = QPushButton("Export...")
+        self.export_button.clicked.connect(self.choose_file_and_export)
+        self.cancel_button = QPushButton("Close")
+        self.cancel_button.clicked.connect(self.reject)
+        button_layout.addWidget(self.export_button)
+        button_layout.addWidget(self.cancel_button)
+        layout.addLayout(button_layout)
+
+    def filters(self):
+        filters = {}
+        if self.date_filter.isChecked():
+            filters['start'] = self.start_input.date().toPyDate()
+            filters['end'] = self.end_input.date().toPyDate()
+        if self.state_input.currentText() != ALL_STATES:
+            filters['states'] = [self.state_input.currentText()]
+        if self.gold_type_input.currentText() != ALL_GOLD_TYPES:
+            filters['gold_types'] = [self.gold_type_input.currentText()]
+        return filters
+
+    def choose_file_and_export(self):
+        _, extension, file_filter = FORMATS[self.format_input.currentIndex()]
+        file_name, _ = QFileDialog.getSaveFileName(self, "Export Customers", f"customers{extension}", file_filter)
+        if not file_name:
+            return
+        if not os.path.splitext(file_name)[1]:
+            file_name += extension
+        self.start_export(file_name)
+
+    def start_export(self, file_name):
+        logger.info(f"Exporting customers to {file_name}")
+        self.export_button.setEnabled(False)
+        self.cancel_button.setText("Cancel")
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.setVisible(True)
+        self.status_label.setText("Counting records...")
+
+        self.worker_thread = QThread(self)
+        self.worker = ExportWorker(file_name, self.filters())
+        self.worker.moveToThread(self.worker_thread)
+        self.worker_thread.started.connect(self.worker.run)
+        self.worker.progress.connect(self.on_progress)
+        self.worker.finished.connect(self.on_finished)
+        self.worker.failed.connect(self.on_failed)
+        self.worker.finished.connect(self.worker_thread.quit)
+        self.worker.failed.connect(self.worker_thread.quit)
+        self.worker_thread.start()
+
+    def is_running(self):
+        return self.worker_thread is not None and self.worker_thread.isRunning()
+
+    def cancel(self):
+        if self.worker is not None:
+            self.worker.cancel()
+        self.cancel_button.setEnabled(False)
+        self.status_label.setText("Cancelling after the current batch...")
+
+    def wait(self):
+        if self.worker_thread is not None:
+            self.worker_thread.wait()
+
+    def on_progress(self, written, total):
+        self.progress_bar.setRange(0, max(total, 1))
+        self.progress_bar.setValue(written)
+        self.status_label.setText(f"Exported {written:,} of {total:,} records")
+
+    def _reset(self):
+        self.export_button.setEnabled(True)
+        self.cancel_button.setEnabled(True)
+        self.cancel_button.setText("Close")
+        self.progress_bar.setVisible(False)
+
+    def on_finished(self, result):
+        self._reset()
+        if result.cancelled:
+            self.status_label.setText("Export cancelled.")
+            return
+        self.status_label.setText("")
+        QMessageBox.information(self, "Export Complete",
+                                f"Exported {result.written} records to {result.file_name}.")
+        self.accept()
+
+    def on_failed(self, message):
+        self._reset()
+        self.status_label.setText("")
+        logger.error(f"Cannot export customers: {message}")
+        QMessageBox.warning(self, "Export Error", message)
+
+    def closeEvent(self, event):
+        if self.is_running():
+            self.cancel()
+            event.ignore()
+            return
+        event.accept()
+
+    def reject(self):
+        # Escape and the Cancel button stop a running export first
+        if self.is_running():
+            self.cancel()
+            return
+        super().reject()
@@ -0,0 +1,147 @@
+import os
+import logging
+from functools import partial
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+                             QProgressBar)
+from PyQt5.QtCore import Qt, QObject, QThread, pyqtSignal
+from src.diagnostics import diagnostics
+
+logger = logging.getLogger(__name__)
+
+
+class ImportWorker(QObject):
+    """Runs an import of one or more files off the GUI thread and reports progress through signals"""
+
+    progress = pyqtSignal(int, int, int, int, int, float)  # files done, files, rows read, inserted, rejected, rows/sec
+    finished = pyqtSignal(object)  # BatchResult
+    failed = pyqtSignal(str)
+
+    def __init__(self, file_names, force=False, server_url=None):
+        super().__init__()
+        self.file_names = file_names
+        self.force = force
+        self.server_url = server_url
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def run(self):
+        # pandas and the file readers load here, on the worker thread, the
+        # first time something is imported rather than at startup
+        from src.importer.batch import import_files
+        options = {}
+        if self.server_url:
+            from src.server.client import import_file as upload_file
+            # The server does the reading; the files go up one at a time
+            options = {'workers': 0, 'import_one': partial(upload_file, self.server_url)}
+        try:
+            with diagnostics.timer('import') as timer:
+                batch = import_files(self.file_names, progress=self._report, cancelled=self.is_cancelled,
+                                     force=self.force, **options)
+                timer.rows = batch.rows_read
+        except Exception as e:
+            logger.error(f"Import failed: {str(e)}")
+            self.failed.emit(f"Failed to import files: {str(e)}")
+            return
+        self.finished.emit(batch)
+
+    def _report(self, batch):
+        self.progress.emit(batch.files_done, len(batch.results), batch.rows_read, batch.inserted, batch.rejected,
+                           batch.rows_per_second)
+
+
+class ImportProgressDialog(QDialog):
+    """Non-modal dialog showing a running import with a Cancel button"""
+
+    import_finished = pyqtSignal(object)  # BatchResult
+    import_failed = pyqtSignal(str)
+
+    def __init__(self, file_names, parent=None, force=False, server_url=None):
+        super().__init__(parent)
+        self.file_names = file_names
+        self.setup_ui()
+
+        self.worker_thread = QThread(self)
+        self.worker = ImportWorker(file_names, force, server_url)
+        self.worker.moveToThread(self.worker_thread)
+        self.worker_thread.started.connect(self.worker.run)
+        self.worker.progress.connect(self.on_progress)
+        self.worker.finished.connect(self.on_finished)
+        self.worker.failed.connect(self.on_failed)
+        self.worker.finished.connect(self.worker_thread.quit)
+        self.worker.failed.connect(self.worker_thread.quit)
+
+    def setup_ui(self):
+        self.setWindowTitle("Importing")
+        self.setMinimumWidth(400)
+        self.setWindowModality(Qt.NonModal)
+        layout = QVBoxLayout(self)
+
+        if len(self.file_names) == 1:
+            layout.addWidget(QLabel(f"Importing {os.path.basename(self.file_names[0])}..."))
+        else:
+            layout.addWidget(QLabel(f"Importing {len(self.file_names)} files..."))
+
+        # Total row count is unknown until the file is read, so show a busy bar
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 0)
+        layout.addWidget(self.progress_bar)
+
+        self.status_label = QLabel("Reading file...")
+        layout.addWidget(self.status_label)
+
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.cancel)
+        button_layout.addWidget(self.cancel_button)
+        layout.addLayout(button_layout)
+
+    def start(self):
+        self.show()
+        self.worker_thread.start()
+
+    def is_running(self):
+        return self.worker_thread.isRunning()
+
+    def cancel(self):
+        self.worker.cancel()
+        self.cancel_button.setEnabled(False)
+        self.status_label.setText("Cancelling after the current batch...")
+
+    def wait(self):
+        self.worker_thread.wait()
+
+    def on_progress(self, files_done, files, rows_read, inserted, rejected, rows_per_second):
+        self.status_label.setText(
+            (f"Files: {files_done} of {files}    " if files > 1 else "")
+            + f"Read: {rows_read}    Inserted: {inserted}    Rejected: {rejected}    "
+            f"({rows_per_second:,.0f} rows/s)"
+        )
+
+    def on_finished(self, result):
+        self.accept()
+        self.import_finished.emit(result)
+
+    def on_failed(self, message):
+        QDialog.reject(self)
+        self.import_failed.emit(message)
+
+    def closeEvent(self, event):
+        if self.is_running():
+            # Closing the window cancels; the dialog goes away once the worker stops
+            self.cancel()
+            event.ignore()
+            return
+        event.accept()
+
+    def reject(self):
+        # Escape behaves like Cancel while the import is still running
+        if self.is_running():
+            self.cancel()
+            return
+        super().reject()
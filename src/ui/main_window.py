@@ -1,29 +1,60 @@
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-                             QPushButton, QTableWidget, QTableWidgetItem, QLineEdit,
-                             QLabel, QMessageBox, QHeaderView, QFileDialog, QApplication)
-from PyQt5.QtCore import Qt
+                             QPushButton, QTableView, QLineEdit, QMenu, QAbstractItemView,
+                             QLabel, QMessageBox, QHeaderView, QFileDialog, QApplication,
+                             QShortcut, QInputDialog)
+from functools import partial
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QKeySequence
 from src.ui.customer_form import CustomerForm
-from src.database.models import Customer, init_db, Session
-import pandas as pd
-from datetime import datetime
-import os
+from src.ui.customer_table_model import CustomerTableModel
+from src.ui.async_repository import AsyncRepository
+from src.database.repository import CustomerRepository
+from src.database.models import engine
+from src.server.client import RemoteCustomerRepository
+from src.ui.import_dialog import ImportProgressDialog
+from src.ui.export_dialog import ExportDialog
+from src.ui.diagnostics_dialog import DiagnosticsDialog
+from src.ui.customer_history_dialog import CustomerHistoryDialog
+from src.diagnostics import diagnostics
+import html
 import logging
 
+# Similar names offered when a search finds nothing
+SUGGESTIONS = 5
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class CustomerTableView(QTableView):
+    """QTableView whose painting shows up in the diagnostics as 'paint'"""
+
+    @diagnostics.timed('paint')
+    def paintEvent(self, event):
+        super().paintEvent(event)
+
+
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, server_url=None):
         super().__init__()
+        self.import_dialog = None
+        self.export_dialog = None
+        self.diagnostics_dialog = None
+        # With a server URL every read and write goes through the purchase server
+        self.server_url = server_url
+        if server_url:
+            self.repository = RemoteCustomerRepository(server_url)
+        else:
+            self.repository = CustomerRepository()
+        # Every database call runs on the service's worker threads, so the
+        # window keeps painting through slow queries and lock waits
+        self.service = AsyncRepository(self.repository, engine=None if server_url else engine, parent=self)
         self.setup_ui()
-        self.load_customers()
-
-    def get_db_session(self):
-        return Session()
+        # Rows are loaded by load_customers() once the window is showing; see main.py
 
     def setup_ui(self):
-        self.setWindowTitle("Gold Purchase Management System")
+        title = "Gold Purchase Management System"
+        self.setWindowTitle(f"{title} - {self.server_url}" if self.server_url else title)
         self.setMinimumSize(1200, 600)  # Increased width to accommodate buttons
 
         # Create central widget and layout
@@ -34,282 +65,375 @@ class MainWindow(QMainWindow):
         # Search bar
         search_layout = QHBoxLayout()
         self.search_input = QLineEdit()
-        self.search_input.setPlaceholderText("Search by name or phone...")
-        self.search_input.textChanged.connect(self.search_customers)
+        self.search_input.setPlaceholderText("Search by name, phone, email or address...")
+        # Debounce keystrokes so only the last one within the interval hits the index
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(250)
+        self.search_timer.timeout.connect(self.search_customers)
+        self.search_input.textChanged.connect(self.search_timer.start)
         search_layout.addWidget(self.search_input)
         layout.addLayout(search_layout)
+        # Names close to a search that found nothing; clicking one searches for it
+        self.suggestion_label = QLabel()
+        self.suggestion_label.setVisible(False)
+        self.suggestion_label.linkActivated.connect(self.search_input.setText)
+        layout.addWidget(self.suggestion_label)
 
-        # Table
-        self.table = QTableWidget()
-        self.table.setColumnCount(14)  # Added 2 columns for buttons
-        self.table.setHorizontalHeaderLabels([
-            "ID", "Name", "Phone", "Email", "Address", "State",
-            "Gold Type", "Gold Quality", "Gold Weight (g)",
-            "Price (₹/g)", "Total Amount (₹)", "Final Amount (₹)",
-            "Update", "Delete"  # New columns for buttons
-        ])
-        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        # Set fixed width for button columns
-        self.table.setColumnWidth(12, 80)  # Update button column
-        self.table.setColumnWidth(13, 80)  # Delete button column
+        # Table (rows are paged in by the model as the view scrolls)
+        self.table_model = CustomerTableModel(self.service, parent=self)
+        self.table_model.load_failed.connect(self.on_load_failed)
+        self.table_model.page_loaded.connect(self.on_page_loaded)
+        self.table = CustomerTableView()
+        self.table.setModel(self.table_model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        header = self.table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.Stretch)
+        # Header clicks re-query in the database (ORDER BY an indexed column)
+        # rather than sorting the loaded rows
+        header.setSectionsClickable(True)
+        header.setSortIndicatorShown(True)
+        header.setSortIndicator(*self.table_model.sort_order())
+        header.sortIndicatorChanged.connect(self.sort_customers)
+        # Update/Delete are row actions instead of per-row button widgets
+        self.table.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.table.customContextMenuRequested.connect(self.show_table_context_menu)
+        self.table.doubleClicked.connect(lambda index: self.update_customer(self.selected_customer_id()))
+        QShortcut(QKeySequence.Delete, self.table, activated=lambda: self.delete_customer(self.selected_customer_id()))
         layout.addWidget(self.table)
 
         # Buttons
         button_layout = QHBoxLayout()
         add_button = QPushButton("Add New Customer")
         add_button.clicked.connect(self.show_add_customer_form)
-        import_button = QPushButton("Import from Excel")
-        import_button.clicked.connect(self.import_from_excel)
+        update_button = QPushButton("Update Selected")
+        update_button.clicked.connect(lambda: self.update_customer(self.selected_customer_id()))
+        delete_button = QPushButton("Delete Selected")
+        delete_button.clicked.connect(lambda: self.delete_customer(self.selected_customer_id()))
+        history_button = QPushButton("Customer History")
+        history_button.clicked.connect(lambda: self.show_customer_history(self.selected_customer_id()))
+        phone_button = QPushButton("Find by Phone (Ctrl+L)")
+        phone_button.clicked.connect(self.find_by_phone)
+        self.import_button = import_button = QPushButton("Import from Excel")
+        import_menu = QMenu(import_button)
+        import_menu.addAction("Files...", self.import_from_excel)
+        import_menu.addAction("Folder...", self.import_folder)
+        import_button.setMenu(import_menu)
         button_layout.addWidget(add_button)
+        button_layout.addWidget(update_button)
+        button_layout.addWidget(delete_button)
+        button_layout.addWidget(history_button)
+        button_layout.addWidget(phone_button)
+        export_button = QPushButton("Export...")
+        export_button.clicked.connect(self.export_customers)
+        if self.server_url:
+            # Exports read the database file, which only the server has
+            export_button.setEnabled(False)
+            export_button.setToolTip("Run exports on the server: python -m src.cli export")
         button_layout.addWidget(import_button)
+        button_layout.addWidget(export_button)
         layout.addLayout(button_layout)
 
+        QShortcut(QKeySequence("Ctrl+L"), self, activated=self.find_by_phone)
+        QShortcut(QKeySequence("Ctrl+Shift+D"), self, activated=self.show_diagnostics)
+
     def load_customers(self):
-        session = self.get_db_session()
-        try:
-            customers = session.query(Customer).all()
-            self.table.setRowCount(len(customers))
-            
-            for row, customer in enumerate(customers):
-                # Add customer data
-                self.table.setItem(row, 0, QTableWidgetItem(str(customer.id)))
-                self.table.setItem(row, 1, QTableWidgetItem(customer.customer_name))
-                self.table.setItem(row, 2, QTableWidgetItem(customer.phone_number or ""))
-                self.table.setItem(row, 3, QTableWidgetItem(customer.email or ""))
-                self.table.setItem(row, 4, QTableWidgetItem(customer.address or ""))
-                self.table.setItem(row, 5, QTableWidgetItem(customer.state or ""))
-                self.table.setItem(row, 6, QTableWidgetItem(customer.gold_type or ""))
-                self.table.setItem(row, 7, QTableWidgetItem(customer.gold_quality or ""))
-                self.table.setItem(row, 8, QTableWidgetItem(f"{customer.gold_weight:.3f}"))
-                self.table.setItem(row, 9, QTableWidgetItem(f"{customer.price_per_gram:.2f}"))
-                self.table.setItem(row, 10, QTableWidgetItem(f"{customer.total_amount:.2f}"))
-                self.table.setItem(row, 11, QTableWidgetItem(f"{customer.final_amount:.2f}"))
-                
-                # Add update button
-                update_btn = QPushButton("Update")
-                update_btn.clicked.connect(lambda checked, c=customer: self.update_customer(c))
-                self.table.setCellWidget(row, 12, update_btn)
-                
-                # Add delete button
-                delete_btn = QPushButton("Delete")
-                delete_btn.clicked.connect(lambda checked, c=customer: self.delete_customer(c))
-                self.table.setCellWidget(row, 13, delete_btn)
-        finally:
-            session.close()
+        # Rows arrive when the first page has loaded; timed as 'load_customers'
+        self.table_model.refresh()
 
     def search_customers(self):
-        search_text = self.search_input.text().lower()
-        for row in range(self.table.rowCount()):
-            show_row = False
-            # Search in name, phone, and email columns
-            for col in range(3):
-                item = self.table.item(row, col)
-                if item and search_text in item.text().lower():
-                    show_row = True
-                    break
-            self.table.setRowHidden(row, not show_row)
+        # A keystroke that arrives while the last one's page is still loading supersedes it
+        self.service.cancel('similar')
+        self.suggestion_label.setVisible(False)
+        self.table_model.set_search(self.search_input.text())
+
+    def on_page_loaded(self, rows):
+        search = self.search_input.text().strip()
+        if rows or not search:
+            return
+        # Nothing matched as typed; look for names spelled differently
+        self.service.call('similar_customers', search, SUGGESTIONS * 4, key='similar', name='similar_customers',
+                          on_done=self.show_suggestions)
+
+    def show_suggestions(self, matches):
+        names = list(dict.fromkeys(customer.customer_name for customer, _ in matches if customer.customer_name))
+        if not names:
+            return
+        links = ', '.join(f'<a href="{html.escape(name)}">{html.escape(name)}</a>' for name in names[:SUGGESTIONS])
+        self.suggestion_label.setText(f"No matches. Did you mean {links}?")
+        self.suggestion_label.setVisible(True)
+
+    def on_load_failed(self, message):
+        # e.g. the purchase server went away; keep the window alive
+        logger.error(f"Loading customers failed: {message}")
+        self.statusBar().showMessage(f"Loading customers failed: {message}")
+
+    def sort_customers(self, column, order):
+        header = self.table.horizontalHeader()
+        if not self.table_model.is_sortable(column):
+            # Only indexed columns sort; put the indicator back
+            header.blockSignals(True)
+            header.setSortIndicator(*self.table_model.sort_order())
+            header.blockSignals(False)
+            return
+        self.table_model.sort(column, order)
+
+    def selected_customer_id(self):
+        rows = self.table.selectionModel().selectedRows()
+        if not rows:
+            return None
+        customer = self.table_model.customer_at(rows[0].row())
+        return customer.id if customer else None
+
+    def show_table_context_menu(self, pos):
+        index = self.table.indexAt(pos)
+        if not index.isValid():
+            return
+        self.table.selectRow(index.row())
+        customer_id = self.selected_customer_id()
+        menu = QMenu(self)
+        update_action = menu.addAction("Update")
+        delete_action = menu.addAction("Delete")
+        history_action = menu.addAction("Customer History")
+        action = menu.exec_(self.table.viewport().mapToGlobal(pos))
+        if action == update_action:
+            self.update_customer(customer_id)
+        elif action == delete_action:
+            self.delete_customer(customer_id)
+        elif action == history_action:
+            self.show_customer_history(customer_id)
+
+    def show_error(self, message, error):
+        QMessageBox.critical(self, "Error", f"{message}: {str(error)}")
 
     def show_add_customer_form(self):
         try:
             form = CustomerForm(self)
             if form.exec_():
-                try:
-                    # Get the customer data from the form
-                    customer_data = form.get_customer_data()
-                    if customer_data:
-                        # Create new customer using the main window's session
-                        session = self.get_db_session()
-                        try:
-                            customer = Customer(**customer_data)
-                            session.add(customer)
-                            session.commit()
-                            self.load_customers()  # Refresh the table
-                        except Exception as e:
-                            session.rollback()
-                            raise e
-                        finally:
-                            session.close()
-                except Exception as e:
-                    QMessageBox.critical(self, "Error", f"Failed to create customer: {str(e)}")
+                # Get the customer data from the form
+                customer_data = form.get_customer_data()
+                if customer_data:
+                    # The table model picks up the new row from the repository event
+                    self.service.call('add', customer_data, name='save',
+                                      on_error=partial(self.show_error, "Failed to create customer"))
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to show customer form: {str(e)}")
 
     def import_from_excel(self):
         try:
-            # Open file dialog to select Excel or CSV file
-            file_name, _ = QFileDialog.getOpenFileName(
+            # Open file dialog to select Excel or CSV files; several can be picked
+            file_names, _ = QFileDialog.getOpenFileNames(
                 self,
-                "Select File",
+                "Select Files",
                 "",
                 "All Supported Files (*.xlsx *.xls *.csv);;Excel Files (*.xlsx *.xls);;CSV Files (*.csv)"
             )
             
-            if not file_name:
+            if not file_names:
                 logger.info("No file selected")
                 return
 
-            logger.info(f"Selected file: {file_name}")
-
-            # Read file based on extension
-            file_ext = os.path.splitext(file_name)[1].lower()
-            try:
-                if file_ext == '.csv':
-                    logger.info("Reading CSV file...")
-                    df = pd.read_csv(file_name)
-                else:
-                    logger.info("Reading Excel file...")
-                    df = pd.read_excel(file_name)
-                
-                logger.info(f"Successfully read file. Found {len(df)} rows")
-                logger.info(f"Columns in file: {df.columns.tolist()}")
-                
-            except Exception as e:
-                logger.error(f"Error reading file: {str(e)}")
-                QMessageBox.critical(self, "File Read Error", f"Could not read file: {str(e)}")
-                return
-            
-            # Validate required columns
-            required_columns = ['customer_name', 'phone_number', 'email', 'address', 'state',
-                              'purchase_date', 'gold_type', 'gold_quality', 'gold_weight',
-                              'price_per_gram', 'total_amount', 'discount_percentage',
-                              'discount_amount', 'final_amount', 'payment_mode']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            
-            if missing_columns:
-                logger.error(f"Missing columns: {missing_columns}")
-                QMessageBox.warning(
-                    self,
-                    "Invalid File Format",
-                    f"File must contain these columns: {', '.join(required_columns)}\n"
-                    f"Missing columns: {', '.join(missing_columns)}"
-                )
-                return
-
-            # Process each row silently
-            session = self.get_db_session()
-            try:
-                success_count = 0
-                error_count = 0
-                for index, row in df.iterrows():
-                    try:
-                        # Convert row to dictionary and handle NaN values
-                        customer_data = {k: (v if pd.notna(v) else '') for k, v in row.items()}
-                        
-                        # Convert date string to datetime if needed
-                        if isinstance(customer_data.get('purchase_date'), str):
-                            try:
-                                customer_data['purchase_date'] = pd.to_datetime(customer_data['purchase_date'])
-                            except:
-                                customer_data['purchase_date'] = datetime.now()
-                        
-                        # Convert numeric fields
-                        for field in ['gold_weight', 'price_per_gram', 'total_amount', 
-                                    'discount_percentage', 'discount_amount', 'final_amount']:
-                            if field in customer_data and customer_data[field]:
-                                try:
-                                    customer_data[field] = float(customer_data[field])
-                                except:
-                                    customer_data[field] = 0.0
-                        
-                        # Create new customer record
-                        customer = Customer(**customer_data)
-                        session.add(customer)
-                        success_count += 1
-                        
-                        # Commit every 100 records to avoid memory issues
-                        if success_count % 100 == 0:
-                            logger.info(f"Committed {success_count} records so far...")
-                            session.commit()
-                            
-                    except Exception as e:
-                        error_count += 1
-                        logger.error(f"Error importing row {index + 1}: {str(e)}")
-                        session.rollback()
-                        continue
-
-                # Final commit for remaining records
-                session.commit()
-                logger.info(f"Import completed. Successfully imported {success_count} records. Failed: {error_count}")
-                
-                # Show a brief message about the import
-                if error_count > 0:
-                    QMessageBox.information(self, "Import Complete", 
-                        f"Successfully imported {success_count} records.\n"
-                        f"Failed to import {error_count} records.\n"
-                        "Check the logs for details.")
-                else:
-                    QMessageBox.information(self, "Import Complete", 
-                        f"Successfully imported {success_count} records.")
-                
-                # Refresh the table to show new data
-                self.load_customers()
-                
-            finally:
-                session.close()
+            logger.info(f"Selected files: {', '.join(file_names)}")
+            self.start_import(file_names)
 
         except Exception as e:
             logger.error(f"Import failed: {str(e)}")
             QMessageBox.critical(self, "Import Error", f"Failed to import file: {str(e)}")
 
-    def update_customer(self, customer):
+    def import_folder(self):
+        # Every branch file of the month, dropped into one folder
+        from src.importer.batch import import_file_names
+        folder = QFileDialog.getExistingDirectory(self, "Select Folder")
+        if not folder:
+            return
+        file_names = import_file_names([folder])
+        if not file_names:
+            QMessageBox.information(self, "Import", "The folder has no .csv, .xlsx or .xls files.")
+            return
+        self.start_import(file_names)
+
+    def start_import(self, file_names, force=False):
+        # The import runs on a worker thread; the window stays usable meanwhile
+        self.import_button.setEnabled(False)
+        self.import_dialog = ImportProgressDialog(file_names, self, force=force, server_url=self.server_url)
+        self.import_dialog.import_finished.connect(self.on_import_finished)
+        self.import_dialog.import_failed.connect(self.on_import_failed)
+        self.import_dialog.start()
+
+    def on_import_finished(self, batch):
+        self.import_button.setEnabled(True)
+        skipped = [result for result in batch.results if result.already_imported is not None]
+        if len(batch.results) == 1:
+            result = batch.results[0]
+            if result.error:
+                self.on_import_failed(result.error)
+                return
+            if skipped:
+                self._ask_import_again(
+                    skipped, f"This file was already imported on {result.already_imported:%Y-%m-%d %H:%M}.\n"
+                    "Import it again? Records that are already present will be skipped.")
+                return
+
+            # Show a brief message about the import
+            summary = f"Successfully imported {result.inserted} records."
+            if result.cancelled:
+                summary = f"Import cancelled. {result.inserted} records were imported before cancelling."
+            if result.duplicates > 0:
+                summary += f"\n{result.duplicates} records were already present and were skipped."
+            if result.repriced > 0:
+                summary += f"\n{result.repriced} records had amounts that did not match their weight, price and discount; they were recalculated."
+            if result.rejected > 0:
+                summary += f"\nFailed to import {result.rejected} records; they are listed in {result.reject_file}."
+            QMessageBox.information(self, "Import Complete", summary)
+        elif len(skipped) == len(batch.results):
+            self._ask_import_again(skipped, f"All {len(skipped)} files were already imported.\n"
+                                   "Import them again? Records that are already present will be skipped.")
+            return
+        else:
+            summary = (f"Imported {batch.inserted} records from {len(batch.results)} files "
+                       f"in {batch.elapsed:.0f}s.")
+            if batch.cancelled:
+                summary = f"Import cancelled. {batch.inserted} records were imported before cancelling."
+            if batch.rejected > 0:
+                summary += (f"\nFailed to import {batch.rejected} records; each file's are listed in a "
+                            "reject file in the rejects folder next to it.")
+            if batch.failed:
+                summary += (f"\n{len(batch.failed)} file{'s' if len(batch.failed) != 1 else ''} "
+                            "could not be imported.")
+            if skipped:
+                summary += (f"\n{len(skipped)} file{'s were' if len(skipped) != 1 else ' was'} "
+                            "already imported and skipped.")
+            # The per-file counts, throughput and reject files are under Show Details
+            from src.importer.batch import summary_lines
+            box = QMessageBox(QMessageBox.Information, "Import Complete", summary, QMessageBox.Ok, self)
+            box.setDetailedText("\n".join(summary_lines(batch)))
+            box.exec_()
+            if skipped:
+                self._ask_import_again(skipped, f"Import the {len(skipped)} already imported "
+                                       f"file{'s' if len(skipped) != 1 else ''} again? "
+                                       "Records that are already present will be skipped.")
+
+        # Imported rows are appended after the loaded ones; no reload needed
+        self.table_model.load_new_rows()
+
+    def _ask_import_again(self, skipped, question):
+        reply = QMessageBox.question(self, "Already Imported", question,
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply == QMessageBox.Yes:
+            self.start_import([result.file_name for result in skipped], force=True)
+
+    def export_customers(self):
         try:
-            # Get a fresh session and customer instance
-            session = self.get_db_session()
-            try:
-                # Get a fresh instance of the customer
-                customer_to_update = session.query(Customer).get(customer.id)
-                if not customer_to_update:
-                    QMessageBox.critical(self, "Error", "Customer not found in database")
-                    return
-
-                # Create and show the form with the fresh customer instance
-                form = CustomerForm(self, customer_to_update)
-                if form.exec_():
-                    try:
-                        # Get the updated data from the form
-                        updated_data = form.get_customer_data()
-                        if updated_data:
-                            # Update the customer in the current session
-                            for key, value in updated_data.items():
-                                setattr(customer_to_update, key, value)
-                            session.commit()
-                            self.load_customers()  # Refresh the table
-                    except Exception as e:
-                        session.rollback()
-                        raise e
-                else:
-                    # Form was cancelled, rollback any changes
-                    session.rollback()
-            finally:
-                session.close()
+            if self.export_dialog is not None and self.export_dialog.isVisible():
+                self.export_dialog.raise_()
+                return
+            # The export runs on a worker thread; the window stays usable meanwhile
+            self.export_dialog = ExportDialog(self)
+            self.export_dialog.show()
         except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to update customer: {str(e)}")
+            logger.error(f"Export failed: {str(e)}")
+            QMessageBox.critical(self, "Export Error", f"Failed to export customers: {str(e)}")
+
+    def show_diagnostics(self):
+        # Timings, slow queries and query plans; see src/diagnostics.py
+        if self.diagnostics_dialog is None:
+            self.diagnostics_dialog = DiagnosticsDialog(self)
+        self.diagnostics_dialog.show()
+        self.diagnostics_dialog.raise_()
+
+    def show_customer_history(self, customer_id):
+        # Every purchase of the selected row's customer; see CustomerRepository.customer_history
+        if customer_id is None:
+            return
+        self.service.call('get', customer_id, name='get', on_done=self._show_history,
+                          on_error=partial(self.show_error, "Failed to load customer history"))
+
+    def _show_history(self, purchase):
+        if not purchase:
+            QMessageBox.critical(self, "Error", "Customer not found in database")
+            return
+        CustomerHistoryDialog(self.service, purchase.customer, self).exec_()
+
+    def find_by_phone(self):
+        # The counter's most common lookup: one seek of the phone_key index
+        phone, ok = QInputDialog.getText(self, "Find by Phone", "Phone number:")
+        if not ok or not phone.strip():
+            return
+        self.service.call('find_by_phone', phone.strip(), name='find_by_phone',
+                          on_done=partial(self._show_phone_match, phone.strip()),
+                          on_error=partial(self.show_error, "Failed to look up the phone number"))
+
+    def _show_phone_match(self, phone, customer):
+        if customer is None:
+            QMessageBox.information(self, "Find by Phone", f"No customer has the phone number {phone}.")
+            return
+        CustomerHistoryDialog(self.service, customer, self).exec_()
+
+    def on_import_failed(self, message):
+        self.import_button.setEnabled(True)
+        logger.error(f"Cannot import file: {message}")
+        QMessageBox.warning(self, "Import Error", message)
+
+    def _updated(self, found):
+        # False when someone else deleted the purchase first
+        if not found:
+            QMessageBox.critical(self, "Error", "Customer not found in database")
+
+    def update_customer(self, customer_id):
+        if customer_id is None:
+            return
+        # Get a fresh instance of the customer
+        self.service.call('get', customer_id, name='get', on_done=partial(self._edit, customer_id),
+                          on_error=partial(self.show_error, "Failed to update customer"))
+
+    def _edit(self, customer_id, customer_to_update):
+        if not customer_to_update:
+            QMessageBox.critical(self, "Error", "Customer not found in database")
+            return
+        # Create and show the form with the fresh customer instance
+        form = CustomerForm(self, customer_to_update)
+        if form.exec_():
+            # Get the updated data from the form
+            updated_data = form.get_customer_data()
+            if updated_data:
+                self.service.call('update', customer_id, updated_data, name='save', on_done=self._updated,
+                                  on_error=partial(self.show_error, "Failed to update customer"))
+
+    def delete_customer(self, customer_id):
+        if customer_id is None:
+            return
+        # Get a fresh instance of the customer
+        self.service.call('get', customer_id, name='get', on_done=partial(self._confirm_delete, customer_id),
+                          on_error=partial(self.show_error, "Failed to delete customer"))
+
+    def _confirm_delete(self, customer_id, customer_to_delete):
+        if not customer_to_delete:
+            QMessageBox.critical(self, "Error", "Customer not found in database")
+            return
 
-    def delete_customer(self, customer):
         reply = QMessageBox.question(
             self,
             "Confirm Delete",
-            f"Are you sure you want to delete customer {customer.customer_name}?",
+            f"Are you sure you want to delete this purchase by {customer_to_delete.customer_name}?",
             QMessageBox.Yes | QMessageBox.No,
             QMessageBox.No
         )
-        
+
         if reply == QMessageBox.Yes:
-            session = self.get_db_session()
-            try:
-                # Get a fresh instance of the customer
-                customer_to_delete = session.query(Customer).get(customer.id)
-                if customer_to_delete:
-                    session.delete(customer_to_delete)
-                    session.commit()
-                    self.load_customers()  # Refresh the table
-                else:
-                    QMessageBox.critical(self, "Error", "Customer not found in database")
-            except Exception as e:
-                session.rollback()
-                QMessageBox.critical(self, "Error", f"Failed to delete customer: {str(e)}")
-            finally:
-                session.close()
+            self.service.call('delete', customer_id, name='save',
+                              on_error=partial(self.show_error, "Failed to delete customer"))
 
     def closeEvent(self, event):
+        # Let a running import stop at a chunk boundary before exiting
+        if self.import_dialog is not None and self.import_dialog.is_running():
+            self.import_dialog.cancel()
+            self.import_dialog.wait()
+        if self.export_dialog is not None and self.export_dialog.is_running():
+            self.export_dialog.cancel()
+            self.export_dialog.wait()
+        # Drop queries still loading and let a save that is under way finish
+        self.service.shutdown()
         event.accept() 
\ No newline at end of file
@@ -0,0 +1,31 @@
+import os
+import tempfile
+import pytest
+
+# The application engine in models.py is created at import time; point it
+# at a scratch file so no test can touch gold_purchases.db
+os.environ.setdefault('GOLD_DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'default.db')}")
+
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from src.database.config import create_configured_engine  # noqa: E402
+from src.database.migrations import migrate  # noqa: E402
+from src.database.repository import CustomerRepository  # noqa: E402
+
+
+@pytest.fixture
+def database_path(tmp_path):
+    return str(tmp_path / 'gold.db')
+
+
+@pytest.fixture
+def engine(database_path):
+    """A fully migrated, empty database"""
+    engine = create_configured_engine(f'sqlite:///{database_path}')
+    migrate(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def repository(engine):
+    return CustomerRepository(session_factory=sessionmaker(bind=engine))
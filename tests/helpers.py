@@ -0,0 +1,43 @@
+"""Builders and queries shared by the tests"""
+import csv
+from src.importer.engine import REQUIRED_COLUMNS
+from src.pricing import calculate_amounts
+
+FILE_COLUMNS = REQUIRED_COLUMNS + ['notes']
+
+
+def purchase_row(**values):
+    """One import file row, with consistent amounts unless given"""
+    row = {
+        'customer_name': 'Asha Rao', 'phone_number': '9845012345', 'email': 'asha@example.com',
+        'address': '12 MG Road, Bengaluru', 'state': 'Karnataka', 'purchase_date': '2024-05-18',
+        'gold_type': '22K', 'gold_quality': 'Standard', 'gold_weight': 10.0, 'price_per_gram': 6000.0,
+        'discount_percentage': 2.0, 'payment_mode': 'UPI', 'notes': '',
+    }
+    row.update(values)
+    try:
+        amounts = calculate_amounts(float(row['gold_weight']), float(row['price_per_gram']),
+                                    float(row['discount_percentage']))
+    except ValueError:
+        amounts = ('', '', '')  # a row meant to be rejected
+    for column, amount in zip(['total_amount', 'discount_amount', 'final_amount'], amounts):
+        row.setdefault(column, amount)
+    return row
+
+
+def write_csv(path, rows, columns=FILE_COLUMNS):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, columns, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+
+def scalar(engine, sql, *params):
+    with engine.connect() as conn:
+        return conn.exec_driver_sql(sql, params).scalar()
+
+
+def rows(engine, sql, *params):
+    with engine.connect() as conn:
+        return conn.exec_driver_sql(sql, params).fetchall()
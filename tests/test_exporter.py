@@ -0,0 +1,54 @@
+import csv
+import os
+import pytest
+from src.archive.engine import archive_purchases
+from src.exporter.engine import export_customers
+from src.importer.engine import import_file
+from tests.helpers import purchase_row, write_csv
+
+FILE_ROWS = [
+    purchase_row(purchase_date='2024-02-14', state='Kerala'),
+    purchase_row(purchase_date='2023-03-05'),
+    purchase_row(purchase_date='2023-11-20', state='Kerala', gold_type='24K'),
+    purchase_row(purchase_date='2024-01-02', gold_type='24K'),
+]
+
+
+@pytest.fixture
+def imported(engine, tmp_path):
+    import_file(write_csv(tmp_path / 'purchases.csv', FILE_ROWS), engine=engine)
+    return engine
+
+
+def _exported(file_name):
+    with open(file_name, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+def test_export_writes_the_matching_rows_oldest_first(imported, tmp_path):
+    file_name = str(tmp_path / 'export.csv')
+    result = export_customers(file_name, start='2023-06-01', states=['Kerala'], engine=imported)
+
+    assert (result.total, result.written) == (2, 2)
+    assert [(row['purchase_date'][:10], row['gold_type']) for row in _exported(file_name)] == [
+        ('2023-11-20', '24K'), ('2024-02-14', '22K')]
+
+
+def test_exports_include_archived_purchases(imported, tmp_path, monkeypatch):
+    monkeypatch.setenv('GOLD_ARCHIVE_DIR', str(tmp_path / 'archive'))
+    archive_purchases(before='2024-01-01', engine=imported)
+    file_name = str(tmp_path / 'export.csv')
+    result = export_customers(file_name, engine=imported)
+
+    assert result.written == len(FILE_ROWS)
+    # Archived purchases are the oldest, and come first
+    assert [row['purchase_date'][:10] for row in _exported(file_name)] == sorted(
+        row['purchase_date'] for row in FILE_ROWS)
+
+
+def test_cancelled_export_leaves_no_file(imported, tmp_path):
+    file_name = str(tmp_path / 'export.csv')
+    result = export_customers(file_name, engine=imported, cancelled=lambda: True)
+
+    assert result.cancelled
+    assert not os.path.exists(file_name)
@@ -0,0 +1,204 @@
+import csv
+import pytest
+from src.database.bulk import suspend_indexes
+from src.database.migrations import migrate
+from src.database.models import Purchase
+from src.importer.batch import import_files, reject_file_name
+from src.importer.engine import ON_DUPLICATE_UPDATE, import_file, previous_import
+from src.importer.readers import ImportFileError
+from tests.helpers import FILE_COLUMNS, purchase_row, rows, scalar, write_csv
+
+
+def test_import_inserts_rows_and_groups_customers(engine, tmp_path):
+    file_name = write_csv(tmp_path / 'purchases.csv', [
+        purchase_row(),
+        purchase_row(phone_number='098450 12345', purchase_date='2024-06-01'),
+        purchase_row(customer_name='Ravi Kumar', phone_number='9000000001', email='ravi@example.com'),
+    ])
+    result = import_file(file_name, engine=engine, chunk_size=2)
+
+    assert (result.rows_read, result.inserted, result.rejected, result.duplicates) == (3, 3, 0, 0)
+    assert scalar(engine, "SELECT count(*) FROM customers") == 2
+    assert previous_import(engine, result.file_hash) is not None
+
+
+def test_bad_rows_are_rejected_with_their_row_and_column(engine, tmp_path):
+    file_name = write_csv(tmp_path / 'purchases.csv', [
+        purchase_row(),
+        purchase_row(customer_name='', purchase_date='2024-06-01'),
+        purchase_row(gold_weight='ten', purchase_date='2024-06-02'),
+        purchase_row(purchase_date='someday'),
+    ])
+    result = import_file(file_name, engine=engine)
+
+    assert (result.inserted, result.rejected) == (1, 3)
+    # Row numbers count the header as row 1, as a spreadsheet does
+    assert sorted((reject.row_number, reject.column) for reject in result.rejects) == [
+        (3, 'customer_name'), (4, 'gold_weight'), (5, 'purchase_date')]
+    assert scalar(engine, "SELECT count(*) FROM purchases") == 1
+
+
+def test_file_amounts_are_recomputed(engine, tmp_path):
+    file_name = write_csv(tmp_path / 'purchases.csv', [purchase_row(final_amount=1.0)])
+    result = import_file(file_name, engine=engine)
+
+    assert result.repriced == 1
+    assert scalar(engine, "SELECT final_amount FROM purchases") == pytest.approx(58800.0)
+
+
+def test_same_file_is_not_imported_twice(engine, tmp_path):
+    file_name = write_csv(tmp_path / 'purchases.csv', [purchase_row()])
+    import_file(file_name, engine=engine)
+    again = import_file(file_name, engine=engine)
+
+    assert again.already_imported is not None
+    assert again.rows_read == 0
+
+
+def test_reimported_rows_are_duplicates_however_the_phone_is_written(engine, tmp_path):
+    import_file(write_csv(tmp_path / 'first.csv', [purchase_row(phone_number='098450 12345')]), engine=engine)
+    result = import_file(write_csv(tmp_path / 'second.csv', [
+        purchase_row(phone_number='+91 98450 12345', customer_name=' asha  RAO'),
+        purchase_row(phone_number='+91 98450 12345', purchase_date='2024-06-01'),
+    ]), engine=engine)
+
+    assert (result.inserted, result.duplicates) == (1, 1)
+    assert scalar(engine, "SELECT count(*) FROM purchases") == 2
+
+
+def test_repeated_rows_within_a_file_are_duplicates(engine, tmp_path):
+    result = import_file(write_csv(tmp_path / 'purchases.csv', [purchase_row(), purchase_row()]), engine=engine)
+
+    assert (result.inserted, result.duplicates) == (1, 1)
+
+
+def test_duplicates_can_update_the_stored_row(engine, tmp_path):
+    import_file(write_csv(tmp_path / 'first.csv', [purchase_row()]), engine=engine)
+    result = import_file(write_csv(tmp_path / 'second.csv', [purchase_row(payment_mode='Cash', notes='paid')]),
+                         engine=engine, on_duplicate=ON_DUPLICATE_UPDATE)
+
+    assert (result.inserted, result.duplicates, result.updated) == (0, 1, 1)
+    assert rows(engine, "SELECT payment_mode, notes FROM purchases") == [('Cash', 'paid')]
+
+
+def test_failing_row_is_retried_alone(engine, tmp_path):
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TRIGGER refuse_13_grams BEFORE INSERT ON purchases "
+                             "WHEN new.gold_weight = 13 BEGIN SELECT RAISE(ABORT, 'refused'); END")
+    file_name = write_csv(tmp_path / 'purchases.csv', [
+        purchase_row(),
+        purchase_row(customer_name='Ravi Kumar', phone_number='9000000001', email='ravi@example.com',
+                     gold_weight=13),
+        purchase_row(purchase_date='2024-06-01'),
+    ])
+    result = import_file(file_name, engine=engine)
+
+    assert (result.inserted, result.rejected) == (2, 1)
+    assert [(reject.row_number, reject.reason) for reject in result.rejects] == [(3, 'refused')]
+    # The refused row's new customer went with it
+    assert rows(engine, "SELECT customer_name FROM customers") == [('Asha Rao',)]
+
+
+def test_imported_rows_are_searchable(engine, repository, tmp_path):
+    import_file(write_csv(tmp_path / 'purchases.csv', [
+        purchase_row(),
+        purchase_row(customer_name='Ravi Kumar', phone_number='9000000001', email='ravi@example.com'),
+    ]), engine=engine)
+
+    assert [row.customer_name for row in repository.fetch_page(search='ravi')] == ['Ravi Kumar']
+
+
+def test_cancelled_import_keeps_only_whole_chunks(engine, tmp_path):
+    file_name = write_csv(tmp_path / 'purchases.csv',
+                          [purchase_row(purchase_date=f'2024-06-0{day}') for day in range(1, 6)])
+    progressed = []
+    result = import_file(file_name, engine=engine, chunk_size=2,
+                         progress=lambda result: progressed.append(result.rows_read),
+                         cancelled=lambda: len(progressed) == 1)
+
+    assert result.cancelled
+    assert progressed == [2]
+    assert scalar(engine, "SELECT count(*) FROM purchases") == 2
+
+
+def _purchase_indexes(engine):
+    return [name for (name,) in rows(engine, "SELECT name FROM sqlite_master WHERE type = 'index' "
+                                             "AND tbl_name = 'purchases' AND sql IS NOT NULL ORDER BY name")]
+
+
+ALL_PURCHASE_INDEXES = sorted(index.name for index in Purchase.__table__.indexes)
+
+
+@pytest.mark.parametrize('cancel', [False, True])
+def test_large_import_builds_its_indexes_once_at_the_end(engine, tmp_path, monkeypatch, cancel):
+    monkeypatch.setattr('src.database.bulk.BULK_LOAD_ROWS', 2)
+    file_name = write_csv(tmp_path / 'purchases.csv',
+                          [purchase_row(purchase_date=f'2024-06-0{day}') for day in range(1, 6)])
+    during = []
+    import_file(file_name, engine=engine, chunk_size=2, progress=lambda result: during.append(
+        _purchase_indexes(engine)), cancelled=lambda: cancel and len(during) == 1)
+
+    # Finding duplicates needs the fingerprint index throughout
+    assert during[0] == ['ix_purchases_row_hash']
+    assert _purchase_indexes(engine) == ALL_PURCHASE_INDEXES
+    assert scalar(engine, "SELECT count(*) FROM purchases") == (2 if cancel else 5)
+
+
+def test_indexes_a_killed_load_left_suspended_are_restored_at_start(engine):
+    with engine.begin() as conn:
+        suspend_indexes(conn, Purchase.__table__.indexes)
+    migrate(engine)
+
+    assert _purchase_indexes(engine) == ALL_PURCHASE_INDEXES
+    assert scalar(engine, "SELECT count(*) FROM sqlite_master WHERE name LIKE 'customer_names_a_'") == 3
+
+
+def test_excel_rows_are_read_in_batches_with_their_row_numbers(engine, tmp_path):
+    from openpyxl import Workbook
+    workbook = Workbook()
+    workbook.active.append(FILE_COLUMNS)
+    for row in [purchase_row(), purchase_row(purchase_date='2024-06-01'), purchase_row(gold_weight='ten')]:
+        workbook.active.append([row[column] for column in FILE_COLUMNS])
+    file_name = str(tmp_path / 'purchases.xlsx')
+    workbook.save(file_name)
+    result = import_file(file_name, engine=engine, chunk_size=2)
+
+    assert (result.rows_read, result.inserted) == (3, 2)
+    assert [(reject.row_number, reject.column) for reject in result.rejects] == [(4, 'gold_weight')]
+
+
+@pytest.mark.parametrize('header', [['a', 'b'], []])
+def test_file_without_valid_header_is_not_recorded(engine, tmp_path, header):
+    file_name = tmp_path / 'empty.csv'
+    file_name.write_text(','.join(header) + '\n' if header else '')
+
+    with pytest.raises(ImportFileError):
+        import_file(str(file_name), engine=engine)
+    assert scalar(engine, "SELECT count(*) FROM imported_files") == 0
+
+
+def test_excel_header_without_rows_is_checked(engine, tmp_path):
+    from openpyxl import Workbook
+    workbook = Workbook()
+    workbook.active.append(['customer_name', 'phone_number'])
+    file_name = str(tmp_path / 'empty.xlsx')
+    workbook.save(file_name)
+
+    with pytest.raises(ImportFileError):
+        import_file(file_name, engine=engine)
+    assert scalar(engine, "SELECT count(*) FROM imported_files") == 0
+
+
+def test_batch_import_writes_a_reject_file_per_file(engine, tmp_path):
+    good = write_csv(tmp_path / 'good.csv', [purchase_row()])
+    bad = write_csv(tmp_path / 'bad.csv', [purchase_row(purchase_date='2024-06-01'),
+                                           purchase_row(gold_weight='x', purchase_date='2024-06-02')])
+    missing = str(tmp_path / 'missing.csv')
+    batch = import_files([good, bad, missing], engine=engine, workers=0)
+
+    assert [result.inserted for result in batch.results] == [1, 1, 0]
+    assert batch.results[2].error
+    assert batch.results[0].reject_file is None
+    assert batch.results[1].reject_file == reject_file_name(bad)
+    with open(batch.results[1].reject_file, newline='') as f:
+        assert list(csv.reader(f)) == [['row_number', 'column', 'reason'], ['3', 'gold_weight', "not a number: 'x'"]]
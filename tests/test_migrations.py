@@ -0,0 +1,159 @@
+import sqlite3
+import pytest
+from sqlalchemy.orm import Session, sessionmaker
+from src.database.config import create_configured_engine
+from src.database.fingerprint import _DIGITS_NORMALIZERS, HASH_COLUMNS, purchase_fingerprint
+from src.database.migrations import MIGRATIONS, migrate
+from src.database.models import Base
+from src.database.reports import sales_summary
+from src.importer.engine import import_file
+from src.database.repository import CustomerRepository
+from tests.helpers import FILE_COLUMNS, purchase_row, rows, scalar, write_csv
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# The single customers table the application started with
+BASELINE_SCHEMA = """
+CREATE TABLE customers (
+    id INTEGER NOT NULL,
+    customer_name VARCHAR(100) NOT NULL,
+    phone_number VARCHAR(20),
+    email VARCHAR(100),
+    address TEXT,
+    state VARCHAR(50),
+    purchase_date DATETIME,
+    gold_type VARCHAR(50),
+    gold_quality VARCHAR(50),
+    gold_weight FLOAT,
+    price_per_gram FLOAT,
+    total_amount FLOAT,
+    discount_percentage FLOAT,
+    discount_amount FLOAT,
+    final_amount FLOAT,
+    payment_mode VARCHAR(50),
+    notes TEXT,
+    PRIMARY KEY (id)
+)
+"""
+
+BASELINE_ROWS = [
+    purchase_row(),
+    # The same customer, written differently and with other details
+    purchase_row(customer_name='Asha R', phone_number='+91 98450 12345', address='New address',
+                 purchase_date='2024-06-01', gold_weight=5.0),
+    purchase_row(customer_name='Ravi Kumar', phone_number='09000000001', email='ravi@example.com',
+                 state='Kerala', gold_type='24K', purchase_date='2024-06-02', payment_mode='Cash'),
+    purchase_row(customer_name='Ravi K', phone_number='', email='RAVI@example.com ', state='Kerala',
+                 purchase_date='2024-07-03'),
+    purchase_row(customer_name='Meera Nair', phone_number='9111111111', email='', purchase_date='2023-01-15',
+                 discount_percentage=0.0),
+]
+
+
+def create_baseline_database(path, file_rows=BASELINE_ROWS):
+    conn = sqlite3.connect(path)
+    conn.execute(BASELINE_SCHEMA)
+    conn.executemany(
+        f"INSERT INTO customers ({', '.join(FILE_COLUMNS)}) VALUES ({', '.join('?' * len(FILE_COLUMNS))})",
+        [[f"{row[column]} 00:00:00.000000" if column == 'purchase_date' else (row[column] or None)
+          for column in FILE_COLUMNS] for row in file_rows])
+    conn.commit()
+    conn.close()
+
+
+def test_new_database_is_created_at_the_latest_version(engine):
+    assert scalar(engine, "PRAGMA user_version") == LATEST_VERSION
+    assert migrate(engine) == []
+
+
+def test_migrations_resume_from_an_intermediate_version(database_path):
+    engine = create_configured_engine(f'sqlite:///{database_path}')
+    assert migrate(engine, target=2) == [1, 2]
+    assert scalar(engine, "PRAGMA user_version") == 2
+    assert migrate(engine) == list(range(3, LATEST_VERSION + 1))
+
+
+def _schema(engine):
+    return rows(engine, "SELECT type, name, tbl_name, sql FROM sqlite_master ORDER BY type, name")
+
+
+def test_every_database_replays_the_same_migrations(engine, tmp_path):
+    # Released migrations build the single-table layout; migration 8 replaces it
+    stopped = create_configured_engine(f"sqlite:///{tmp_path / 'stopped.db'}")
+    migrate(stopped, target=7)
+    assert rows(stopped, "SELECT name FROM pragma_table_info('customers') WHERE name = 'purchase_date'")
+    migrate(stopped)
+    create_baseline_database(tmp_path / 'baseline.db')
+    baseline = create_configured_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    migrate(baseline)
+
+    assert _schema(stopped) == _schema(engine)
+    assert _schema(baseline) == _schema(engine)
+    for table in Base.metadata.sorted_tables:
+        assert [name for (name,) in rows(engine, f"SELECT name FROM pragma_table_info('{table.name}')")] == [
+            column.name for column in table.columns]
+
+
+def test_baseline_database_is_split_into_customers_and_purchases(database_path):
+    create_baseline_database(database_path)
+    engine = create_configured_engine(f'sqlite:///{database_path}')
+    migrate(engine)
+
+    assert scalar(engine, "PRAGMA user_version") == LATEST_VERSION
+    # Purchases keep their ids; rows sharing a phone number or email are one customer
+    purchases = rows(engine, "SELECT id, customer_id FROM purchases ORDER BY id")
+    assert [id for id, _ in purchases] == [1, 2, 3, 4, 5]
+    customer_of = dict(purchases)
+    assert customer_of[1] == customer_of[2]
+    assert customer_of[3] == customer_of[4]
+    assert scalar(engine, "SELECT count(*) FROM customers") == 3
+    # The customer keeps the details of its earliest purchase
+    assert rows(engine, "SELECT customer_name, phone_key FROM customers WHERE id = ?", customer_of[1]) == [
+        ('Asha Rao', '9845012345')]
+    assert scalar(engine, "SELECT count(*) FROM purchases WHERE row_hash IS NULL") == 0
+    # Rows that predate the search index are found by it
+    repository = CustomerRepository(session_factory=sessionmaker(bind=engine))
+    assert [row.customer_name for row in repository.fetch_page(search='meera')] == ['Meera Nair']
+
+
+def test_baseline_upgrade_keeps_sales_totals(database_path):
+    create_baseline_database(database_path)
+    engine = create_configured_engine(f'sqlite:///{database_path}')
+    migrate(engine)
+
+    with Session(bind=engine) as session:
+        by_state = {row['state']: row for row in sales_summary('month', group_by=['state'], session=session)}
+    assert {state: row['transactions'] for state, row in by_state.items()} == {'Karnataka': 3, 'Kerala': 2}
+    assert sum(row['final_amount'] for row in by_state.values()) == pytest.approx(
+        sum(row['final_amount'] for row in BASELINE_ROWS))
+
+
+def test_baseline_rows_reimported_after_the_upgrade_are_duplicates(database_path, tmp_path):
+    create_baseline_database(database_path)
+    engine = create_configured_engine(f'sqlite:///{database_path}')
+    migrate(engine)
+
+    result = import_file(write_csv(tmp_path / 'baseline.csv', BASELINE_ROWS), engine=engine)
+    assert (result.inserted, result.duplicates) == (0, len(BASELINE_ROWS))
+
+
+def test_canonical_phone_keys_rehash_digit_fingerprints(database_path):
+    engine = create_configured_engine(f'sqlite:///{database_path}')
+    migrate(engine, target=9)
+    row = purchase_row(phone_number='+91 98450 12345')
+    values = [row[column] for column in HASH_COLUMNS]
+    values[HASH_COLUMNS.index('purchase_date')] = '2024-05-18 00:00:00'
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO customers (id, customer_name, phone_number, phone_key, email, email_key, address) "
+            "VALUES (1, ?, ?, '919845012345', ?, ?, ?)",
+            (row['customer_name'], row['phone_number'], row['email'], row['email'], row['address']))
+        conn.exec_driver_sql(
+            "INSERT INTO purchases (id, customer_id, state, purchase_date, gold_type, gold_quality, gold_weight, "
+            "price_per_gram, row_hash) VALUES (1, 1, ?, '2024-05-18 00:00:00.000000', ?, ?, ?, ?, ?)",
+            (row['state'], row['gold_type'], row['gold_quality'], row['gold_weight'], row['price_per_gram'],
+             purchase_fingerprint(values, _DIGITS_NORMALIZERS)))
+    migrate(engine)
+
+    assert scalar(engine, "SELECT phone_key FROM customers WHERE id = 1") == '9845012345'
+    assert scalar(engine, "SELECT row_hash FROM purchases WHERE id = 1") == purchase_fingerprint(values)
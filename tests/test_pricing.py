@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from src.database.reconcile import find_mismatches, reconcile_amounts
+from src.importer.engine import import_file
+from src.pricing import amounts_differ, calculate_amounts, calculate_amounts_array
+from tests.helpers import purchase_row, rows, write_csv
+
+# Inputs where Python's round(x, 2) and np.round(x, 2) used to disagree
+ROUNDING_EDGES = [(748.5, 6942.63, 0.05), (1.3, 5488.25, 3.52)]
+
+
+def _random_inputs(rng, size):
+    """Form-like inputs (grams to 3 decimals, rupees and percent to 2), then arbitrary floats"""
+    form = [np.round(rng.uniform(0, 1000, size), 3), np.round(rng.uniform(1, 10000, size), 2),
+            np.round(rng.uniform(0, 100, size), 2)]
+    floats = [rng.uniform(0, 1000, size), rng.uniform(1, 10000, size), rng.uniform(0, 100, size)]
+    return [np.concatenate(pair) for pair in zip(form, floats)]
+
+
+def test_form_and_batch_amounts_are_identical():
+    weight, price, discount = _random_inputs(np.random.default_rng(0), 100000)
+    batch = np.column_stack(calculate_amounts_array(weight, price, discount))
+    single = np.array([calculate_amounts(*values) for values in zip(weight.tolist(), price.tolist(),
+                                                                    discount.tolist())])
+
+    assert np.array_equal(single, batch)
+
+
+@pytest.mark.parametrize('values', ROUNDING_EDGES)
+def test_form_amounts_are_not_mismatches(values):
+    stored = calculate_amounts(*values)
+    ids, _ = find_mismatches([(1, *values, *stored)])
+
+    assert stored == tuple(amounts[0] for amounts in calculate_amounts_array(*[[value] for value in values]))
+    assert len(ids) == 0
+
+
+def test_one_paisa_is_within_tolerance_despite_float_noise():
+    assert 5193960.32 - 5193960.31 > 0.01  # as floats
+    assert not amounts_differ(5193960.32, 5193960.31)
+    assert amounts_differ(5193960.33, 5193960.31)
+
+
+def test_reconcile_finds_and_fixes_wrong_amounts(engine, tmp_path):
+    import_file(write_csv(tmp_path / 'purchases.csv', [
+        purchase_row(), purchase_row(purchase_date='2024-06-01'), purchase_row(purchase_date='2024-06-02')]),
+        engine=engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE purchases SET final_amount = 1.0 WHERE id = 2")
+        conn.exec_driver_sql("UPDATE purchases SET total_amount = NULL WHERE id = 3")
+
+    checked = reconcile_amounts(engine=engine)
+    assert (checked.checked, checked.mismatched_ids, checked.fixed) == (3, [2, 3], 0)
+
+    fixed = reconcile_amounts(engine=engine, fix=True)
+    assert fixed.fixed == 2
+    assert rows(engine, "SELECT DISTINCT total_amount, final_amount FROM purchases") == [(60000.0, 58800.0)]
+    assert reconcile_amounts(engine=engine).mismatched == 0
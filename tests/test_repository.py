@@ -0,0 +1,105 @@
+from datetime import datetime
+import pytest
+from src.database.repository import DELETED, INSERTED, SORT_COLUMNS, UPDATED
+
+CUSTOMERS = [
+    ('Asha Rao', '9845012345', 'asha@example.com'),
+    ('Ravi Kumar', '9000000001', 'ravi@example.com'),
+    ('Meera Nair', None, 'meera@example.com'),  # sorts with the NULL phone numbers
+    ('Zoya Khan', '9111111111', None),
+]
+
+
+@pytest.fixture
+def purchases(engine, repository):
+    """Purchase ids: several per customer, with NULL amounts and dates among them"""
+    ids = []
+    for number in range(14):
+        name, phone, email = CUSTOMERS[number % len(CUSTOMERS)]
+        ids.append(repository.add({
+            'customer_name': name, 'phone_number': phone, 'email': email, 'state': 'Karnataka',
+            'purchase_date': datetime(2024, 1 + number % 3, 1 + number),
+            'gold_type': '22K', 'gold_quality': 'Standard', 'gold_weight': float(number),
+            'price_per_gram': 6000.0,
+            # Repeated amounts, so ties are broken by id
+            'final_amount': None if number % 4 == 3 else float(number % 3) * 1000,
+        }))
+    with engine.begin() as conn:
+        # A new purchase gets the current time; older databases have rows without one
+        conn.exec_driver_sql("UPDATE purchases SET purchase_date = NULL WHERE id % 5 = 0")
+    return ids
+
+
+def _expected(rows, sort_by, descending):
+    # NULLs first, ties by id; descending is the exact reverse
+    ordered = sorted(rows, key=lambda row: (getattr(row, sort_by) is not None, getattr(row, sort_by), row.id))
+    return [row.id for row in (reversed(ordered) if descending else ordered)]
+
+
+def _walk(repository, sort_by='id', descending=False, limit=3, search=None):
+    ids, last = [], None
+    while True:
+        page = repository.fetch_page(None if last is None else last.id, limit, search, sort_by, descending,
+                                     None if last is None else getattr(last, sort_by))
+        ids.extend(row.id for row in page)
+        if len(page) < limit:
+            return ids
+        last = page[-1]
+
+
+@pytest.mark.parametrize('descending', [False, True])
+@pytest.mark.parametrize('sort_by', SORT_COLUMNS)
+def test_keyset_pages_follow_the_sort_order(repository, purchases, sort_by, descending):
+    everything = repository.fetch_page(limit=len(purchases) + 1)
+
+    assert _walk(repository, sort_by, descending) == _expected(everything, sort_by, descending)
+
+
+def test_unknown_sort_column_is_refused(repository):
+    with pytest.raises(ValueError):
+        repository.fetch_page(sort_by='notes')
+
+
+@pytest.mark.parametrize('search, customer', [
+    ('Asha', 'Asha Rao'),
+    ('meera@example', 'Meera Nair'),
+    ('kum', 'Ravi Kumar'),  # words match by prefix
+    ('+91 90000 00001', 'Ravi Kumar'),
+])
+def test_search_pages_only_matching_rows(repository, purchases, search, customer):
+    ids = _walk(repository, 'customer_name', search=search)
+
+    assert ids
+    assert {row.customer_name for row in repository.fetch_by_ids(ids)} == {customer}
+    assert len(ids) == len([row for row in repository.fetch_page(limit=100) if row.customer_name == customer])
+
+
+def test_find_by_phone_accepts_any_form(repository, purchases):
+    assert repository.find_by_phone('+91 98450 12345').customer_name == 'Asha Rao'
+    assert repository.find_by_phone('098450-12345').customer_name == 'Asha Rao'
+    assert repository.find_by_phone('9999999999') is None
+
+
+def test_changed_details_notify_every_purchase_of_the_customer(repository, purchases):
+    events = []
+    repository.subscribe(lambda event, purchase_id: events.append((event, purchase_id)))
+    asha = [row.id for row in repository.fetch_page(limit=100) if row.customer_name == 'Asha Rao']
+
+    repository.update(asha[0], {'customer_name': 'Asha R. Rao'})
+    assert sorted(events) == [(UPDATED, purchase_id) for purchase_id in sorted(asha)]
+    assert {row.customer_name for row in repository.fetch_by_ids(asha)} == {'Asha R. Rao'}
+
+    events.clear()
+    repository.update(asha[0], {'notes': 'engraved'})
+    assert events == [(UPDATED, asha[0])]
+
+
+def test_add_and_delete_notify_the_purchase(repository):
+    events = []
+    repository.subscribe(lambda event, purchase_id: events.append((event, purchase_id)))
+    purchase_id = repository.add({'customer_name': 'Asha Rao', 'phone_number': '9845012345'})
+
+    assert repository.delete(purchase_id)
+    assert not repository.delete(purchase_id)
+    assert events == [(INSERTED, purchase_id), (DELETED, purchase_id)]
+    assert repository.fetch_page() == []
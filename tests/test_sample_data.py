@@ -0,0 +1,16 @@
+import pytest
+from generate_sample_data import generate_chunks, write_sqlite
+from src.database.models import Purchase
+from tests.helpers import rows, scalar
+
+
+def test_interrupted_load_rebuilds_the_purchase_indexes(engine):
+    def chunks():
+        yield from generate_chunks(20, chunk_size=10, workers=1)
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        write_sqlite(chunks(), engine)
+    assert scalar(engine, "SELECT count(*) FROM purchases") == 20
+    indexes = {name for name, in rows(engine, "SELECT name FROM sqlite_master WHERE tbl_name = 'purchases'")}
+    assert {index.name for index in Purchase.__table__.indexes} <= indexes
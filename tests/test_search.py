@@ -0,0 +1,53 @@
+from src.database.search import rebuild_name_index
+from src.importer.engine import import_file
+from tests.helpers import purchase_row, rows, write_csv
+
+
+def _name_index(engine):
+    return (rows(engine, "SELECT word, grams, customers FROM customer_name_words ORDER BY word"),
+            rows(engine, "SELECT trigram, word FROM customer_name_trigrams ORDER BY trigram, word"))
+
+
+def test_misspelled_names_find_similar_customers(repository):
+    kashyap = repository.add({'customer_name': 'Arjun Kashyap', 'phone_number': '9845012345'})
+    repository.add({'customer_name': 'Meera Nair', 'phone_number': '9111111111'})
+
+    matches = repository.similar_customers('Kasyap')
+    assert [customer.id for customer, _ in matches] == [kashyap]
+
+
+def test_maintained_name_index_matches_a_rebuild(engine, repository, tmp_path):
+    import_file(write_csv(tmp_path / 'purchases.csv', [
+        purchase_row(customer_name='Arjun Kashyap'),
+        purchase_row(customer_name='Anna Kurian', phone_number='9000000001', email='anna@example.com'),
+    ]), engine=engine)
+    meera = repository.add({'customer_name': 'Meera Nair', 'phone_number': '9111111111'})
+    repository.update(meera, {'customer_name': 'Meera Kurien'})
+    # Arjun's only purchase, and with it the customer
+    repository.delete(repository.fetch_page(search='arjun')[0].id)
+    maintained = _name_index(engine)
+
+    with engine.begin() as conn:
+        rebuild_name_index(conn)
+    assert _name_index(engine) == maintained
+    assert 'arjun' not in [word for word, _, _ in maintained[0]]
+
+
+def test_name_index_rebuilt_after_a_large_import_matches_a_maintained_one(engine, repository, tmp_path,
+                                                                        monkeypatch):
+    repository.add({'customer_name': 'Anna Kurian', 'phone_number': '9000000001'})
+    maintained = _name_index(engine)
+    monkeypatch.setattr('src.database.bulk.BULK_LOAD_ROWS', 2)
+    import_file(write_csv(tmp_path / 'purchases.csv', [
+        purchase_row(customer_name='Arjun Kashyap'),
+        purchase_row(customer_name='Arjun Kashyap', phone_number='9000000002', email='arjun@example.com'),
+        purchase_row(customer_name='Meera Nair', phone_number='9111111111', email='meera@example.com'),
+    ]), engine=engine, chunk_size=1)
+    imported = _name_index(engine)
+
+    with engine.begin() as conn:
+        rebuild_name_index(conn)
+    assert _name_index(engine) == imported != maintained
+    assert ('arjun', 6, 2) in imported[0]
+    assert [customer.customer_name for customer, _ in repository.similar_customers('Kasyap')] == [
+        'Arjun Kashyap'] * 2
@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from src.database.repository import UPDATED
+from src.server.app import create_app
+from src.server.client import RemoteCustomerRepository
+from src.server.pool import DatabasePool
+from tests.helpers import rows
+
+
+def _add_customer(name):
+    def write(conn):
+        conn.exec_driver_sql("INSERT INTO customers (customer_name) VALUES (?)", (name,))
+        if name == 'fails':
+            raise ValueError("refused")
+        return conn.get_transaction()
+    return write
+
+
+def test_queued_writes_commit_together_and_fail_alone(engine):
+    async def run():
+        pool = DatabasePool(engine, readers=1)
+        release = threading.Event()
+        # Hold the writer, so that the next writes queue up behind it
+        blocker = asyncio.ensure_future(pool.exclusive(lambda engine, drain: release.wait()))
+        writes = [asyncio.ensure_future(pool.write(_add_customer(name))) for name in ['a', 'fails', 'b', 'c']]
+        await asyncio.sleep(0.1)
+        release.set()
+        await blocker
+        outcomes = await asyncio.gather(*writes, return_exceptions=True)
+        pool.close()
+        return outcomes
+
+    outcomes = asyncio.run(run())
+    assert isinstance(outcomes[1], ValueError)
+    # One transaction, i.e. one COMMIT, for the whole batch
+    assert len({id(transaction) for transaction in outcomes if not isinstance(transaction, Exception)}) == 1
+    assert rows(engine, "SELECT customer_name FROM customers ORDER BY id") == [('a',), ('b',), ('c',)]
+
+
+def test_batches_are_capped(engine):
+    async def run():
+        pool = DatabasePool(engine, readers=1, max_batch=2)
+        release = threading.Event()
+        blocker = asyncio.ensure_future(pool.exclusive(lambda engine, drain: release.wait()))
+        writes = [asyncio.ensure_future(pool.write(_add_customer(str(number)))) for number in range(5)]
+        await asyncio.sleep(0.1)
+        release.set()
+        await blocker
+        transactions = await asyncio.gather(*writes)
+        pool.close()
+        return transactions
+
+    assert len({id(transaction) for transaction in asyncio.run(run())}) == 3
+
+
+@pytest.fixture
+def purchase():
+    return {'customer_name': 'Asha Rao', 'phone_number': '9845012345', 'state': 'Karnataka',
+            'purchase_date': '2024-05-18T00:00:00', 'gold_type': '22K', 'gold_weight': 10.0}
+
+
+def test_server_reads_and_writes_its_own_database(engine, purchase):
+    async def run():
+        async with TestClient(TestServer(create_app(engine=engine, readers=1))) as client:
+            response = await client.post('/customers', json=purchase)
+            purchase_id = (await response.json())['id']
+            listed = await (await client.get('/customers')).json()
+            found = await (await client.get('/phone-lookup', params={'phone': '+91 98450 12345'})).json()
+            report = await (await client.get('/reports/sales')).json()
+            return purchase_id, listed, found, report
+
+    purchase_id, listed, found, report = asyncio.run(run())
+    assert [row['id'] for row in listed] == [purchase_id]
+    assert found['customer_name'] == 'Asha Rao'
+    assert [(row['period'], row['transactions']) for row in report] == [('2024-05-18', 1)]
+    assert rows(engine, "SELECT count(*) FROM purchases") == [(1,)]
+
+
+def test_remote_update_notifies_every_purchase_of_the_customer(engine, purchase):
+    async def run():
+        async with TestServer(create_app(engine=engine, readers=1)) as server:
+            repository = RemoteCustomerRepository(str(server.make_url('')))
+            events = []
+            repository.subscribe(lambda event, purchase_id: events.append((event, purchase_id)))
+
+            def edit():
+                # The client blocks, so it runs off the server's event loop
+                first = repository.add(purchase)
+                second = repository.add(dict(purchase, gold_weight=5.0))
+                events.clear()
+                repository.update(first, dict(purchase, customer_name='Asha R. Rao'))
+                return first, second
+            first, second = await asyncio.get_running_loop().run_in_executor(None, edit)
+            return events, first, second
+
+    events, first, second = asyncio.run(run())
+    assert sorted(events) == [(UPDATED, first), (UPDATED, second)]